@@ -1,11 +1,14 @@
+import sys
+
 import requests
 
+from http_client import default_client
+
 def get_random_zenquote():
     """Fetches and returns a random quote from ZenQuotes.io."""
     try:
-        response = requests.get("https://zenquotes.io/api/random")
-        response.raise_for_status()  # Raise an exception for bad status codes
-        data = response.json()
+        # Random quotes must not come from the cache; the shared session still reuses connections
+        data = default_client().get_json("https://zenquotes.io/api/random", cache=False)
 
         if data and len(data) > 0:
             quote = data[0]['q']
@@ -19,4 +22,6 @@ def get_random_zenquote():
 
 if __name__ == "__main__":
     random_quote = get_random_zenquote()
-    print(random_quote)
\ No newline at end of file
+    print(random_quote)
+    if "--stats" in sys.argv:
+        print(default_client().stats())
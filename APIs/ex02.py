@@ -1,15 +1,12 @@
-from pycoingecko import CoinGeckoAPI
+from price_client import PriceClient
 
-    # Instantiate the CoinGeckoAPI client
-cg = CoinGeckoAPI()
+    # Instantiate the cached, rate-limited price client
+client = PriceClient()
 
     # Get the current price of Bitcoin in USD
 try:
-    price_data = cg.get_price(ids='bitcoin', vs_currencies='usd')
-
-        # Extract and print the Bitcoin price
-    bitcoin_price = price_data['bitcoin']['usd']
+    bitcoin_price = client.get_price('bitcoin', 'usd')
     print(f"The current price of Bitcoin is ${bitcoin_price}")
 
 except Exception as e:
-    print(f"An error occurred: {e}")
\ No newline at end of file
+    print(f"An error occurred: {e}")
@@ -1,43 +1,43 @@
-from pycoingecko import CoinGeckoAPI
-
-    # Instantiate the CoinGeckoAPI client
-cg = CoinGeckoAPI()
-
-print("Enter the cryptocurrency in small letters (bitocin/litecoin/ethereum):")
-crypto = input()
-
-if (crypto == "bitcoin"):
-    try:
-        price_data = cg.get_price(ids='bitcoin', vs_currencies='usd')
-
-        # Extract and print the Bitcoin price
-        bitcoin_price = price_data['bitcoin']['usd']
-        print(f"The current price of Bitcoin is ${bitcoin_price}")
-
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        
-elif (crypto == "litecoin"):
-    try:
-        price_data = cg.get_price(ids='litecoin', vs_currencies='usd')
-
-        # Extract and print the Litecoin price
-        bitcoin_price = price_data['litecoin']['usd']
-        print(f"The current price of Litecoin is ${bitcoin_price}")
-
-    except Exception as e:
-        print(f"An error occurred: {e}")
-
-elif (crypto == "ethereum"):
-    try:
-        price_data = cg.get_price(ids='ethereum', vs_currencies='usd')
-
-        # Extract and print the Ethereum price
-        bitcoin_price = price_data['ethereum']['usd']
-        print(f"The current price of Ethereum is ${bitcoin_price}")
-
-    except Exception as e:
-        print(f"An error occurred: {e}")
-
+import sys
+
+from price_client import PriceClient
+
+    # Instantiate the cached, rate-limited price client
+client = PriceClient()
+
+# Coins can be given on the command line (python ex03.py bitcoin litecoin --vs usd,eur)
+# or typed in when asked
+args = sys.argv[1:]
+vs_currencies = ["usd"]
+if "--vs" in args:
+    position = args.index("--vs")
+    if position + 1 == len(args):
+        print("Please give the currencies after --vs (e.g. --vs usd,eur).")
+        sys.exit(1)
+    vs_currencies = args[position + 1].split(",")
+    del args[position:position + 2]
+
+if args:
+    coins = [coin for arg in args for coin in arg.split(",")]
 else:
-    print("Sorry, an error occurred. Please try again.")
\ No newline at end of file
+    print("Enter the cryptocurrencies in small letters, separated by commas (e.g. bitcoin,litecoin,ethereum):")
+    coins = input().split(",")
+
+coins = [coin.strip().lower() for coin in coins if coin.strip()]
+if not coins:
+    print("Sorry, an error occurred. Please try again.")
+    sys.exit(1)
+
+try:
+    # One request for every coin and currency
+    prices = client.get_prices(coins, vs_currencies)
+except Exception as e:
+    print(f"An error occurred: {e}")
+    sys.exit(1)
+
+for coin in coins:
+    if coin not in prices:
+        print(f"Sorry, CoinGecko doesn't know a coin called '{coin}'.")
+        continue
+    for currency, price in prices[coin].items():
+        print(f"The current price of {coin.capitalize()} is {price} {currency.upper()}")
@@ -1,25 +1,36 @@
+import sys
+
 import requests
 
-# Replace with your own NewsAPI key
-API_KEY = "2e0ebb19013d4e06bc4eaa5cd8d9d465"
+from http_client import default_client
+from news_ingest import DEFAULT_DB_PATH, ArticleStore, NewsAPIError, ingest_query
+
+# Headlines are ingested into a local SQLite store (see news_ingest.py): each run only adds
+# the articles published since the last one, and the store can be read without a network
+HEADLINES_DB_PATH = DEFAULT_DB_PATH
 
-def get_top_headlines(country="us", page_size=10):
-    url = "https://newsapi.org/v2/everything?q=Apple&from=2025-09-29&sortBy=popularity&apiKey=API_KEY"
-    params = {
-        "country": country,   # 'my' is Malaysia
-        "pageSize": page_size,
-        "apiKey": API_KEY
-    }
-    response = requests.get(url, params=params)
-    data = response.json()
-    
-    if response.status_code != 200 or data.get("status") != "ok":
-        print("Error fetching news:", data.get("message", "Unknown error"))
-        return []
+def headlines_query(country):
+    return {"endpoint": "top-headlines", "country": country}   # 'my' is Malaysia
 
-    return data["articles"]
+def get_top_headlines(country="us", page_size=10, store=None):
+    """Fetches new top headlines into the store and returns the newest page_size of them."""
+    if store is None:
+        with ArticleStore(HEADLINES_DB_PATH) as store:
+            return get_top_headlines(country, page_size, store)
+    try:
+        ingest_query(headlines_query(country), store)
+    except NewsAPIError as e:
+        print("Error fetching news:", e)
+    except requests.exceptions.RequestException as e:
+        print("Error fetching news:", e)
+    # Whatever was stored before still gets shown when the fetch fails
+    return store.latest(headlines_query(country), limit=page_size)
 
-def display_headlines(articles):
+def display_headlines(articles=None, country="us", limit=10):
+    """Prints articles; without any, reads the latest stored headlines (no network calls)."""
+    if articles is None:
+        with ArticleStore(HEADLINES_DB_PATH) as store:
+            articles = store.latest(headlines_query(country), limit=limit)
     for i, article in enumerate(articles, start=1):
         print(f"{i}. {article['title']}")
         if article.get("source"):
@@ -29,5 +40,10 @@ def display_headlines(articles):
         print()
 
 if __name__ == "__main__":
-    headlines = get_top_headlines()
-    display_headlines(headlines)
+    if "--offline" in sys.argv:
+        display_headlines()
+    else:
+        headlines = get_top_headlines()
+        display_headlines(headlines)
+    if "--stats" in sys.argv:
+        print(default_client().stats())
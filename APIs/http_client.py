@@ -0,0 +1,130 @@
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Retried with exponential backoff (honouring Retry-After) before giving up
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class HttpClient:
+    """A shared requests.Session with connection pooling, timeouts, retries and a disk cache.
+
+    Responses are cached on disk with their ETag / Last-Modified validators; later requests
+    for the same URL and params are sent as conditional requests, and a 304 Not Modified is
+    answered from the cache. With max_age, a cached response that young is returned without
+    any request at all.
+    """
+
+    def __init__(self, cache_dir=Path(__file__).parent / ".http_cache", timeout=(3.05, 10), retries=3,
+                 backoff_factor=0.5, pool_size=10):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.timeout = timeout
+        self.session = requests.Session()
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods={"GET", "HEAD"},
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.requests = 0
+        self.fresh_hits = 0
+        self.revalidated = 0
+        self.latencies = []
+        self._lock = threading.Lock()
+
+    def _cache_path(self, url, params):
+        raw = url + "?" + json.dumps(params or {}, sort_keys=True)
+        return self.cache_dir / (hashlib.sha256(raw.encode("utf-8")).hexdigest() + ".json")
+
+    def get_json(self, url, params=None, headers=None, max_age=0, cache=True):
+        """GETs url and returns the decoded JSON body, from the cache when it is still valid.
+
+        Raises requests.HTTPError for error statuses (after retries) like raise_for_status.
+        """
+        path = self._cache_path(url, params)
+        entry = None
+        if cache and path.exists():
+            try:
+                entry = json.loads(path.read_text(encoding="utf-8"))
+            except ValueError:
+                entry = None # A half-written entry; just refetch
+        if entry is not None and max_age and time.time() - entry["fetched_at"] < max_age:
+            with self._lock:
+                self.fresh_hits += 1
+            return entry["body"]
+
+        headers = dict(headers or {})
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        start = time.perf_counter()
+        response = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+        with self._lock:
+            self.requests += 1
+            self.latencies.append(time.perf_counter() - start)
+
+        if response.status_code == 304 and entry is not None:
+            with self._lock:
+                self.revalidated += 1
+            entry["fetched_at"] = time.time()
+            self._write(path, entry)
+            return entry["body"]
+
+        response.raise_for_status()
+        body = response.json()
+        etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+        if cache and (etag or last_modified or max_age):
+            self._write(path, {"etag": etag, "last_modified": last_modified, "fetched_at": time.time(), "body": body})
+        return body
+
+    def _write(self, path, entry):
+        partial = path.with_suffix(f".{threading.get_ident()}.tmp")
+        partial.write_text(json.dumps(entry), encoding="utf-8")
+        partial.replace(path)
+
+    def stats(self):
+        """Returns request counts, cache hits (fresh or revalidated with a 304) and latency percentiles."""
+        with self._lock:
+            latencies = sorted(self.latencies)
+            lookups = self.requests + self.fresh_hits
+            hits = self.fresh_hits + self.revalidated
+
+            def pct(p):
+                return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))] * 1000 if latencies else 0.0
+
+            return {
+                "requests": self.requests,
+                "fresh_hits": self.fresh_hits,
+                "revalidated": self.revalidated,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "latency_p50_ms": pct(50),
+                "latency_p95_ms": pct(95),
+            }
+
+
+_default_client = None
+_default_lock = threading.Lock()
+
+
+def default_client():
+    """Returns the process-wide client, so every caller shares one connection pool."""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = HttpClient()
+        return _default_client
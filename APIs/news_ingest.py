@@ -0,0 +1,259 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+from http_client import default_client
+
+# Point this at a local stub server (see stub_newsapi.py) to run without the real API
+NEWSAPI_BASE_URL = os.environ.get("NEWSAPI_BASE_URL", "https://newsapi.org/v2")
+API_KEY = os.environ.get("NEWSAPI_KEY", "2e0ebb19013d4e06bc4eaa5cd8d9d465")
+
+# NewsAPI serves at most 100 articles per page
+MAX_PAGE_SIZE = 100
+
+DEFAULT_DB_PATH = Path(__file__).parent / "news.db"
+
+
+class NewsAPIError(Exception):
+    """NewsAPI answered with status "error" (bad key, rate limited, too many results, ...)."""
+
+    def __init__(self, code, message):
+        super().__init__(f"{code}: {message}")
+        self.code = code
+
+
+def query_key(query):
+    """Returns a stable name for a query dict, e.g. {"endpoint": "top-headlines", "country": "us"}."""
+    return json.dumps(query, sort_keys=True, separators=(",", ":"))
+
+
+def content_hash(article):
+    """Hashes an article's normalized title and description, to catch the same story under another URL."""
+    text = " ".join(re.findall(r"\w+", f"{article.get('title') or ''} {article.get('description') or ''}".lower()))
+    if not text:
+        text = article.get("url") or "" # Nothing to compare: only the URL can tell it apart
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+# --- Fetching ---
+
+
+def _error_details(response):
+    """Returns (code, message) from a NewsAPI error response."""
+    try:
+        body = response.json()
+    except ValueError:
+        return response.status_code, response.text or response.reason
+    return body.get("code", response.status_code), body.get("message", "Unknown error")
+
+
+def iter_articles(query, client=None, page_size=MAX_PAGE_SIZE, max_pages=5, base_url=NEWSAPI_BASE_URL,
+                  api_key=API_KEY):
+    """Yields a query's articles one page at a time, until the results run out or max_pages.
+
+    Only one page is held in memory. The API key goes in the X-Api-Key header, so it is not
+    part of the URL (or the HTTP cache key).
+    """
+    client = client or default_client()
+    params = {name: value for name, value in query.items() if name != "endpoint"}
+    url = f"{base_url}/{query.get('endpoint', 'top-headlines')}"
+    received = 0
+    for page in range(1, max_pages + 1):
+        try:
+            data = client.get_json(url, params={**params, "page": page, "pageSize": page_size},
+                                   headers={"X-Api-Key": api_key})
+        except requests.exceptions.HTTPError as e:
+            raise NewsAPIError(*_error_details(e.response)) from e
+        if data.get("status") != "ok":
+            raise NewsAPIError(data.get("code", "unknown"), data.get("message", "Unknown error"))
+
+        articles = data.get("articles") or []
+        yield articles
+        received += len(articles)
+        if len(articles) < page_size or received >= data.get("totalResults", 0):
+            return
+
+
+# --- Storage ---
+
+
+class ArticleStore:
+    """A compact SQLite store of articles, deduplicated by URL and by content hash.
+
+    Each query keeps a high-water mark (the newest publishedAt it has stored), so a rerun
+    can stop paging once it reaches articles it has already seen. Reading needs no network.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS articles ("
+            "url TEXT PRIMARY KEY, content_hash TEXT NOT NULL UNIQUE, title TEXT, source TEXT, author TEXT, "
+            "description TEXT, published_at TEXT, fetched_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS query_articles ("
+            "query TEXT NOT NULL, url TEXT NOT NULL, PRIMARY KEY (query, url)) WITHOUT ROWID"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS high_water (query TEXT PRIMARY KEY, published_at TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS articles_published ON articles (published_at)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def high_water_mark(self, query):
+        """Returns the newest publishedAt stored for a query, or None before its first run."""
+        with self._lock:
+            row = self._conn.execute("SELECT published_at FROM high_water WHERE query = ?", (query_key(query),)).fetchone()
+        return row[0] if row else None
+
+    def add(self, query, articles):
+        """Appends a page of articles in one transaction; returns how many were new."""
+        key = query_key(query)
+        now = time.time()
+        new = 0
+        with self._lock, self._conn:
+            for article in articles:
+                if not article.get("url"):
+                    continue
+                digest = content_hash(article)
+                # The same story under another URL is filed under the URL already stored
+                row = self._conn.execute("SELECT url FROM articles WHERE content_hash = ?", (digest,)).fetchone()
+                url = row[0] if row else article["url"]
+                inserted = self._conn.execute(
+                    "INSERT OR IGNORE INTO articles "
+                    "(url, content_hash, title, source, author, description, published_at, fetched_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (url, digest, article.get("title"), (article.get("source") or {}).get("name"),
+                     article.get("author"), article.get("description"), article.get("publishedAt"), now),
+                ).rowcount
+                new += inserted
+                self._conn.execute("INSERT OR IGNORE INTO query_articles (query, url) VALUES (?, ?)", (key, url))
+            newest = max((article.get("publishedAt") or "" for article in articles), default="")
+            if newest:
+                self._conn.execute(
+                    "INSERT INTO high_water (query, published_at) VALUES (?, ?) "
+                    "ON CONFLICT (query) DO UPDATE SET published_at = MAX(published_at, excluded.published_at)",
+                    (key, newest),
+                )
+        return new
+
+    def latest(self, query=None, limit=10):
+        """Returns the newest stored articles (of one query, or all), shaped like NewsAPI articles."""
+        with self._lock:
+            if query is None:
+                rows = self._conn.execute(
+                    "SELECT url, title, source, author, description, published_at FROM articles "
+                    "ORDER BY published_at DESC LIMIT ?", (limit,)
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT a.url, a.title, a.source, a.author, a.description, a.published_at "
+                    "FROM query_articles q JOIN articles a ON a.url = q.url WHERE q.query = ? "
+                    "ORDER BY a.published_at DESC LIMIT ?", (query_key(query), limit)
+                ).fetchall()
+        return [
+            {"url": url, "title": title, "source": {"name": source} if source else None, "author": author,
+             "description": description, "publishedAt": published_at}
+            for url, title, source, author, description, published_at in rows
+        ]
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# --- Ingestion ---
+
+
+def ingest_query(query, store, client=None, page_size=MAX_PAGE_SIZE, max_pages=5, base_url=NEWSAPI_BASE_URL,
+                 api_key=API_KEY):
+    """Pages through one query, storing each page as it arrives; returns its counts.
+
+    Results come newest first, so paging stops at the first page that reaches past the
+    query's high-water mark; articles from the mark's own second are kept in case they are
+    new, and the URL check drops the ones that aren't. /everything searches also ask the
+    API for newer articles only.
+    """
+    mark = store.high_water_mark(query)
+    request = query
+    if mark and query.get("endpoint") == "everything":
+        request = {**query, "from": mark, "sortBy": "publishedAt"}
+    stats = {"pages": 0, "fetched": 0, "new": 0, "duplicates": 0}
+    for articles in iter_articles(request, client, page_size, max_pages, base_url, api_key):
+        fresh = [article for article in articles if not mark or (article.get("publishedAt") or "") >= mark]
+        new = store.add(query, fresh)
+        stats["pages"] += 1
+        stats["fetched"] += len(articles)
+        stats["new"] += new
+        stats["duplicates"] += len(fresh) - new
+        if len(fresh) < len(articles):
+            break # Everything after this is older still
+    return stats
+
+
+async def ingest_async(queries, store, client=None, concurrency=4, **kwargs):
+    """Ingests several queries concurrently; returns {query key: counts or the exception raised}.
+
+    Requests go through the shared, pooled HttpClient on worker threads, at most
+    concurrency queries at a time.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(query):
+        async with semaphore:
+            return await asyncio.to_thread(ingest_query, query, store, client, **kwargs)
+
+    results = await asyncio.gather(*(run(query) for query in queries), return_exceptions=True)
+    return {query_key(query): result for query, result in zip(queries, results)}
+
+
+def ingest(queries, store, client=None, concurrency=4, **kwargs):
+    """Synchronous wrapper around ingest_async."""
+    return asyncio.run(ingest_async(queries, store, client, concurrency, **kwargs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch new NewsAPI articles into the local store.")
+    parser.add_argument("--country", action="append", default=[], help="top headlines for a country (repeatable)")
+    parser.add_argument("--search", action="append", default=[], help="search all articles for a phrase (repeatable)")
+    parser.add_argument("--db", default=str(DEFAULT_DB_PATH), help="SQLite store")
+    parser.add_argument("--max-pages", type=int, default=5, help="pages per query")
+    parser.add_argument("--concurrency", type=int, default=4, help="queries fetched at once")
+    args = parser.parse_args()
+
+    queries = [{"endpoint": "top-headlines", "country": country} for country in args.country or ["us"]]
+    queries += [{"endpoint": "everything", "q": phrase} for phrase in args.search]
+    with ArticleStore(args.db) as store:
+        for key, result in ingest(queries, store, concurrency=args.concurrency, max_pages=args.max_pages).items():
+            if isinstance(result, Exception):
+                print(f"{key}: failed ({result})")
+            else:
+                print(f"{key}: {result['new']} new of {result['fetched']} fetched in {result['pages']} page(s), "
+                      f"{result['duplicates']} duplicates")
+        print(f"{len(store)} articles stored in {args.db}")
+
+
+if __name__ == "__main__":
+    main()
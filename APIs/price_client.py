@@ -0,0 +1,113 @@
+import threading
+import time
+from concurrent.futures import Future
+
+from pycoingecko import CoinGeckoAPI
+
+
+class TokenBucket:
+    """Thread-safe token bucket: rate tokens per second, bursts of up to capacity."""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Waits until a token is available and takes it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class PriceClient:
+    """Fetches CoinGecko prices for any number of coins and currencies in one request.
+
+    Prices are cached for ttl seconds, identical lookups running at the same time share one
+    request, and requests are paced by a token bucket to stay under CoinGecko's rate limit
+    (about 30 calls per minute on the free tier). Pass api_base_url to point the client at
+    a local stub server (see stub_coingecko.py).
+    """
+
+    def __init__(self, ttl=30, calls_per_minute=30, api_base_url=None, api=None):
+        if api is None:
+            api = CoinGeckoAPI()
+            if api_base_url:
+                api.api_base_url = api_base_url.rstrip("/") + "/"
+        self.api = api
+        self.ttl = ttl
+        self.bucket = TokenBucket(calls_per_minute / 60, capacity=1)
+        self.requests = 0
+        self.cache_hits = 0
+        self.coalesced = 0
+        self._cache = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def get_prices(self, ids, vs_currencies=("usd",)):
+        """Returns {coin: {currency: price}}; coins CoinGecko doesn't know are left out."""
+        ids = sorted({coin.strip().lower() for coin in ids if coin.strip()})
+        vs_currencies = sorted({currency.strip().lower() for currency in vs_currencies if currency.strip()})
+        now = time.monotonic()
+
+        prices, missing = {}, set()
+        with self._lock:
+            for coin in ids:
+                for currency in vs_currencies:
+                    entry = self._cache.get((coin, currency))
+                    if entry is not None and entry[0] > now:
+                        prices.setdefault(coin, {})[currency] = entry[1]
+                        self.cache_hits += 1
+                    else:
+                        missing.add(coin)
+
+        if missing:
+            fetched = self._fetch(tuple(sorted(missing)), tuple(vs_currencies))
+            for coin, quotes in fetched.items():
+                prices.setdefault(coin, {}).update(quotes)
+        return prices
+
+    def get_price(self, coin, vs_currency="usd"):
+        """Returns one coin's price, or None if CoinGecko doesn't know the coin."""
+        return self.get_prices([coin], [vs_currency]).get(coin.strip().lower(), {}).get(vs_currency.lower())
+
+    def _fetch(self, ids, vs_currencies):
+        """Runs one batched request, or waits for the identical one already running."""
+        key = (ids, vs_currencies)
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            self.bucket.acquire()
+            with self._lock:
+                self.requests += 1
+            data = self.api.get_price(ids=",".join(ids), vs_currencies=",".join(vs_currencies))
+            expires_at = time.monotonic() + self.ttl
+            with self._lock:
+                for coin, quotes in data.items():
+                    for currency, price in quotes.items():
+                        self._cache[(coin, currency)] = (expires_at, price)
+            future.set_result(data)
+            return data
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
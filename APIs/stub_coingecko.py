@@ -0,0 +1,90 @@
+"""A local stand-in for CoinGecko's /simple/price.
+
+The stub serves /api/v3/simple/price from an in-memory price table, leaving out coins it
+doesn't know like CoinGecko does, and can be told to answer slowly or with a 429. The
+price_client tests (tests/test_price_client.py) run against it.
+
+Run with: python stub_coingecko.py
+and point PriceClient(api_base_url=...) at the URL it prints.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+PRICES = {
+    "bitcoin": {"usd": 67000.0, "eur": 61500.0},
+    "ethereum": {"usd": 3100.0, "eur": 2850.0},
+    "litecoin": {"usd": 72.5, "eur": 66.6},
+}
+
+
+class StubCoinGecko:
+    """Holds the stub's prices and runs its HTTP server on a free local port."""
+
+    def __init__(self, prices=PRICES):
+        self.prices = prices
+        self.requests = 0
+        self.latency = 0.0
+        self.fail_next = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}/api/v3/"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests += 1
+                    status, body = stub.respond(self.path)
+                time.sleep(stub.latency)
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def respond(self, path):
+        """Returns (status, JSON body) for one request, the way CoinGecko would."""
+        url = urlparse(path)
+        params = {name: values[0] for name, values in parse_qs(url.query).items()}
+        if self.fail_next:
+            self.fail_next -= 1
+            return 429, {"status": {"error_code": 429, "error_message": "You've exceeded the Rate Limit."}}
+        if url.path != "/api/v3/simple/price":
+            return 404, {"error": "Not found"}
+        currencies = params.get("vs_currencies", "").split(",")
+        return 200, {
+            coin: {currency: self.prices[coin][currency] for currency in currencies if currency in self.prices[coin]}
+            for coin in params.get("ids", "").split(",") if coin in self.prices
+        }
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    stub = StubCoinGecko().start()
+    print(f"Serving stub prices at {stub.base_url} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""A local stand-in for NewsAPI.
+
+The stub serves /v2/top-headlines and /v2/everything from an in-memory list of articles,
+newest first, with NewsAPI's paging, error bodies and X-Api-Key check. Some stories are
+syndicated: the same URL under several countries, or the same text under a second URL.
+The news_ingest tests (tests/test_news_ingest.py) run against it.
+
+Run with: python stub_newsapi.py
+and pass the URL and key it prints as base_url and api_key to news_ingest.
+"""
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+API_KEY = "stub-key"
+
+
+class StubNewsAPI:
+    """Holds the stub's articles and runs its HTTP server on a free local port."""
+
+    def __init__(self):
+        self.articles = [] # (country, article), newest first
+        self.published = 0
+        self.requests = 0
+        self._clock = datetime(2026, 10, 1, tzinfo=timezone.utc)
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}/v2"
+
+    def publish(self, count, countries=("us",), syndicated=0):
+        """Adds count new articles for each country; the first syndicated ones reappear under a second URL."""
+        with self._lock:
+            for n in range(count):
+                self._clock += timedelta(minutes=1)
+                number = self.published
+                self.published += 1
+                article = {
+                    "source": {"id": None, "name": f"Wire {number % 3}"},
+                    "author": "Stub Reporter",
+                    "title": f"Story {number}: markets, weather and film",
+                    "description": f"Everything about story {number}.",
+                    "url": f"https://news.example/{number}",
+                    "publishedAt": self._clock.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                }
+                for country in countries:
+                    self.articles.insert(0, (country, article))
+                if n < syndicated:
+                    mirror = dict(article, url=f"https://mirror.example/{number}", source={"id": None, "name": "Mirror"})
+                    self.articles.insert(0, (countries[0], mirror))
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests += 1
+                    status, body = stub.respond(self.path, self.headers.get("X-Api-Key"))
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def respond(self, path, api_key):
+        """Returns (status, JSON body) for one request, the way NewsAPI would."""
+        url = urlparse(path)
+        params = {name: values[0] for name, values in parse_qs(url.query).items()}
+        if api_key != API_KEY:
+            return 401, {"status": "error", "code": "apiKeyInvalid", "message": "Your API key is invalid."}
+        if url.path == "/v2/top-headlines":
+            matches = [article for country, article in self.articles if country == params.get("country", "us")]
+        elif url.path == "/v2/everything":
+            words = params.get("q", "").lower().split()
+            matches = list({article["url"]: article for _, article in self.articles
+                            if all(word in article["title"].lower() for word in words)}.values())
+            if "from" in params:
+                matches = [article for article in matches if article["publishedAt"] >= params["from"]]
+        else:
+            return 404, {"status": "error", "code": "notFound", "message": "Unknown endpoint."}
+        page, page_size = int(params.get("page", 1)), int(params.get("pageSize", 20))
+        window = matches[(page - 1) * page_size:page * page_size]
+        return 200, {"status": "ok", "totalResults": len(matches), "articles": window}
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    stub = StubNewsAPI().start()
+    stub.publish(45, countries=("us", "gb"), syndicated=5)
+    print(f"Serving {stub.published} stub stories at {stub.base_url} with API key {API_KEY!r} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The API examples are flat scripts imported as siblings, like they import each other
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from stub_coingecko import StubCoinGecko  # noqa: E402
+from stub_newsapi import StubNewsAPI  # noqa: E402
+
+
+@pytest.fixture
+def coingecko():
+    """A stub CoinGecko server running on a free local port."""
+    stub = StubCoinGecko().start()
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture
+def newsapi():
+    """A stub NewsAPI server running on a free local port."""
+    stub = StubNewsAPI().start()
+    yield stub
+    stub.stop()
@@ -0,0 +1,88 @@
+import pytest
+
+import ex04
+from http_client import HttpClient
+from news_ingest import ArticleStore, NewsAPIError, ingest, iter_articles
+from stub_newsapi import API_KEY
+
+QUERIES = [
+    {"endpoint": "top-headlines", "country": "us"},
+    {"endpoint": "top-headlines", "country": "gb"},
+    {"endpoint": "everything", "q": "film"},
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    with ArticleStore(tmp_path / "news.db") as store:
+        yield store
+
+
+@pytest.fixture
+def options(newsapi, tmp_path):
+    client = HttpClient(cache_dir=tmp_path / "http_cache")
+    return {"client": client, "page_size": 20, "base_url": newsapi.base_url, "api_key": API_KEY}
+
+
+def test_syndicated_stories_are_stored_once(newsapi, store, options):
+    # 45 stories in both countries, 5 of them also mirrored under another URL
+    newsapi.publish(45, countries=("us", "gb"), syndicated=5)
+    results = ingest(QUERIES, store, **options)
+    assert not any(isinstance(result, Exception) for result in results.values())
+    assert len(store) == 45
+
+
+def test_a_rerun_reads_one_page_per_query_and_stores_nothing(newsapi, store, options):
+    newsapi.publish(45, countries=("us", "gb"), syndicated=5)
+    ingest(QUERIES, store, **options)
+    requests_before = newsapi.requests
+    results = ingest(QUERIES, store, **options)
+    assert all(result["new"] == 0 for result in results.values())
+    assert newsapi.requests - requests_before == len(QUERIES)
+
+
+def test_only_new_stories_are_stored(newsapi, store, options):
+    newsapi.publish(45, countries=("us", "gb"), syndicated=5)
+    ingest(QUERIES, store, **options)
+    newsapi.publish(7, countries=("us",))
+    results = ingest(QUERIES, store, **options)
+    assert len(store) == 52 and sum(result["new"] for result in results.values()) == 7
+
+
+def test_a_bad_key_raises(newsapi, options):
+    options["api_key"] = "wrong"
+    with pytest.raises(NewsAPIError) as raised:
+        list(iter_articles(QUERIES[0], **options))
+    assert raised.value.code == "apiKeyInvalid"
+
+
+def test_the_store_is_readable_without_the_server(newsapi, store, options):
+    newsapi.publish(52, countries=("us",))
+    ingest(QUERIES[:1], store, **options)
+    newsapi.stop()
+    with ArticleStore(store.path) as reopened:
+        headlines = reopened.latest(QUERIES[0], limit=5)
+    assert [article["url"] for article in headlines] == [f"https://news.example/{n}" for n in range(51, 46, -1)]
+
+
+def test_get_top_headlines_closes_the_store_it_opens(monkeypatch, tmp_path):
+    opened = []
+
+    class TrackedStore(ArticleStore):
+        def __init__(self, path):
+            super().__init__(path)
+            self.closed = False
+            opened.append(self)
+
+        def close(self):
+            self.closed = True
+            super().close()
+
+    def offline(query, store):
+        raise NewsAPIError("offline", "no network in tests")
+
+    monkeypatch.setattr(ex04, "ArticleStore", TrackedStore)
+    monkeypatch.setattr(ex04, "HEADLINES_DB_PATH", tmp_path / "headlines.db")
+    monkeypatch.setattr(ex04, "ingest_query", offline)
+    assert ex04.get_top_headlines() == []
+    assert len(opened) == 1 and opened[0].closed
@@ -0,0 +1,70 @@
+import threading
+import time
+
+import pytest
+
+from price_client import PriceClient
+
+
+def make_client(stub, **kwargs):
+    kwargs.setdefault("calls_per_minute", 6000)
+    return PriceClient(api_base_url=stub.base_url, **kwargs)
+
+
+def test_several_coins_and_currencies_take_one_request(coingecko):
+    client = make_client(coingecko)
+    prices = client.get_prices(["Bitcoin", "ethereum", "dogecoin-classic"], ["usd", "eur"])
+    assert coingecko.requests == 1 and client.requests == 1
+    # Coins CoinGecko doesn't know are left out
+    assert set(prices) == {"bitcoin", "ethereum"} and prices["bitcoin"]["eur"] == 61500.0
+
+
+def test_a_repeat_is_answered_from_the_cache(coingecko):
+    client = make_client(coingecko)
+    client.get_prices(["bitcoin", "ethereum"], ["usd"])
+    assert client.get_price("ethereum", "USD") == 3100.0
+    assert coingecko.requests == 1 and client.cache_hits == 1
+
+
+def test_expired_prices_are_fetched_again(coingecko):
+    client = make_client(coingecko, ttl=0)
+    client.get_price("bitcoin")
+    client.get_price("bitcoin")
+    assert coingecko.requests == 2 and client.cache_hits == 0
+
+
+def test_identical_concurrent_lookups_share_one_request(coingecko):
+    client = make_client(coingecko)
+    coingecko.latency = 0.3
+    barrier = threading.Barrier(8)
+    results = []
+
+    def lookup():
+        barrier.wait()
+        results.append(client.get_prices(["litecoin", "bitcoin"]))
+
+    threads = [threading.Thread(target=lookup) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert coingecko.requests == 1 and client.requests == 1 and client.coalesced == 7
+    assert len(results) == 8 and all(result["litecoin"]["usd"] == 72.5 for result in results)
+
+
+def test_requests_are_paced_by_the_token_bucket(coingecko):
+    # Two requests per second and no cache: five lookups need four waits of half a second
+    client = make_client(coingecko, ttl=0, calls_per_minute=120)
+    start = time.monotonic()
+    for _ in range(5):
+        client.get_price("bitcoin")
+    elapsed = time.monotonic() - start
+    assert 1.9 <= elapsed < 3.0 and client.requests == 5
+
+
+def test_a_failed_request_does_not_block_the_next_one(coingecko):
+    client = make_client(coingecko)
+    coingecko.fail_next = 1
+    with pytest.raises(Exception, match="429"):
+        client.get_price("bitcoin")
+    assert client.get_price("bitcoin") == 67000.0 and not client._in_flight
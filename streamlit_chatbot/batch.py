@@ -0,0 +1,247 @@
+"""Headless batch recommendations for the Blockbuster Bot.
+
+Runs a file of prompts (JSONL or CSV with prompt, optional mood and id columns), or the
+mood x genre grid the UI exposes, through the same persona, catalog grounding and
+recommendation parser as the chat. Requests run concurrently under a requests-per-minute
+limit, and results are streamed to JSONL (or Parquet, written once the run completes).
+Rerunning the same command resumes: prompts already answered in the output are skipped,
+and ones that failed, or whose reply had to be repaired, are tried again.
+
+Run with: python batch.py prompts.jsonl results.jsonl --concurrency 8 --rpm 120
+          python batch.py --grid newsletter.parquet
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from catalog import MovieCatalog, format_candidates
+from fake_gemini import FakeModel
+from gemini_client import GeminiClient, GeminiError
+from prefetch import MOODS
+from prompts import STRUCTURED_GENERATION_CONFIG, PromptBuilder, select_persona
+from rate_limit import TokenBucket
+from recommendations import parse_response
+from response_cache import make_cache_key
+
+CATALOG_PATH = Path(__file__).parent / "data" / "movies.csv"
+CATALOG_CANDIDATES = 8
+
+
+# --- Inputs ---
+
+
+def read_prompts(path):
+    """Yields {"id", "prompt", "mood"} rows from a JSONL or CSV file."""
+    path = Path(path)
+    with path.open(encoding="utf-8", newline="") as f:
+        rows = csv.DictReader(f) if path.suffix.lower() == ".csv" else (json.loads(line) for line in f if line.strip())
+        for row in rows:
+            yield normalize_row(row)
+
+
+def grid_prompts(catalog):
+    """Yields one prompt per mood x catalog genre combination."""
+    for mood in MOODS:
+        for genre in sorted(catalog.genre_index):
+            yield normalize_row({"prompt": f"Recommend something {genre.lower()}!", "mood": mood, "genre": genre})
+
+
+def normalize_row(row):
+    """Fills in the default mood and a stable id (so a rerun can tell which prompts are done)."""
+    row = dict(row)
+    row["mood"] = row.get("mood") or "Okay"
+    row["id"] = row.get("id") or make_cache_key(row["prompt"], row["mood"])[:16]
+    return row
+
+
+# --- Outputs ---
+
+
+def checkpoint_path(output):
+    """Returns the JSONL file results are streamed to; Parquet outputs are converted from it at the end."""
+    output = Path(output)
+    return output if output.suffix.lower() == ".jsonl" else output.with_suffix(output.suffix + ".partial.jsonl")
+
+
+def succeeded(result):
+    """Returns True for a result whose reply parsed cleanly; errors and repaired replies are run again."""
+    return result.get("error") is None and not result.get("repaired", False)
+
+
+def latest_results(path):
+    """Returns a checkpoint's results by id: the latest successful one, else the latest failure."""
+    results = {}
+    if not path.exists():
+        return results
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+                row_id = result["id"]
+            except (ValueError, KeyError):
+                continue # A line cut short by an interrupted run; that prompt is simply redone
+            if row_id not in results or succeeded(result) or not succeeded(results[row_id]):
+                results[row_id] = result
+    return results
+
+
+def completed_ids(path):
+    """Returns the ids with a successful result in a checkpoint file; failed prompts are run again."""
+    return {row_id for row_id, result in latest_results(path).items() if succeeded(result)}
+
+
+def compact_checkpoint(path):
+    """Rewrites a checkpoint with one result per id (see latest_results) and returns them.
+
+    Resumed runs append retries after the failures they replace; the file is swapped in
+    atomically, so an interrupted rewrite leaves the old checkpoint intact.
+    """
+    results = latest_results(path)
+    temp = path.with_suffix(path.suffix + ".tmp")
+    with temp.open("w", encoding="utf-8") as f:
+        for result in results.values():
+            f.write(json.dumps(result) + "\n")
+    os.replace(temp, path)
+    return results
+
+
+def write_parquet(results, output):
+    """Writes results to a Parquet file, one row per recommendation."""
+    import pandas as pd
+
+    rows = []
+    for result in results:
+        base = {key: value for key, value in result.items() if key != "recommendations"}
+        for rank, rec in enumerate(result["recommendations"], 1):
+            rows.append({**base, "rank": rank, **rec})
+        if not result["recommendations"]:
+            rows.append(base)
+    pd.DataFrame(rows).to_parquet(output, index=False)
+
+
+# --- Running ---
+
+
+class BatchRunner:
+    """Runs prompts through the model with a concurrency cap and a requests-per-minute limit."""
+
+    def __init__(self, model, builder, catalog=None, concurrency=8, rpm=120, structured=True, timeout=60.0):
+        self.model = model
+        self.builder = builder
+        self.catalog = catalog
+        self.structured = structured
+        # Every attempt, retries included, takes a token; a batch waits for its quota instead of failing
+        self.limiter = TokenBucket(rpm / 60.0, capacity=max(1, concurrency))
+        self.client = GeminiClient(max_in_flight=concurrency, timeout=timeout, queue_timeout=None, limiter=self.limiter)
+        self.concurrency = concurrency
+
+    def build_prompt(self, row):
+        candidates = ""
+        if self.catalog is not None:
+            frame = self.catalog.candidates_for_prompt(row["prompt"], limit=CATALOG_CANDIDATES)
+            candidates = format_candidates(frame) if len(frame) else ""
+        return self.builder.build(row["prompt"], row["mood"], candidates, is_first_turn=True).text
+
+    def run_one(self, row):
+        """Returns the result dict for one prompt row (errors are recorded, not raised)."""
+        start = time.perf_counter()
+        kwargs = {"generation_config": STRUCTURED_GENERATION_CONFIG} if self.structured else {}
+        result = dict(row)
+        try:
+            response = self.client.generate_content(self.model, self.build_prompt(row), **kwargs)
+        except GeminiError as e:
+            return {**result, "intro": "", "recommendations": [], "error": str(e), "repaired": False,
+                    "latency_ms": round((time.perf_counter() - start) * 1000, 1)}
+
+        record = parse_response(response.text)
+        if self.catalog is not None:
+            for rec in record.recommendations:
+                self.catalog.ground(rec)
+        return {
+            **result,
+            "intro": record.intro,
+            "recommendations": [rec.to_dict() for rec in record.recommendations],
+            "error": record.error,
+            "repaired": record.repaired,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+
+    def run(self, rows, out):
+        """Runs rows, writing each result to the out file as soon as it is done; returns the count."""
+        lock = threading.Lock()
+        written = 0
+
+        def work(row):
+            nonlocal written
+            result = self.run_one(row)
+            with lock:
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+                written += 1
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for future in [pool.submit(work, row) for row in rows]:
+                future.result()
+        return written
+
+
+def make_model(fake, system_instruction=None):
+    if fake:
+        return FakeModel(latency=0.2, system_instruction=system_instruction)
+    import google.generativeai as genai
+
+    genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
+    return genai.GenerativeModel("gemini-2.5-flash", system_instruction=system_instruction)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+", metavar="[input] output",
+                        help="prompts file (.jsonl or .csv) and results file (.jsonl or .parquet)")
+    parser.add_argument("--grid", action="store_true", help="run every mood x catalog genre instead of an input file")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight")
+    parser.add_argument("--rpm", type=float, default=120, help="requests per minute")
+    parser.add_argument("--fenced", action="store_true", help="use the fenced-JSON persona instead of structured output")
+    parser.add_argument("--fake", action="store_true", help="run against the offline fake model")
+    args = parser.parse_args()
+    if len(args.paths) != (1 if args.grid else 2):
+        parser.error("give an input and an output file, or --grid and an output file")
+    input_path, output = (None, args.paths[0]) if args.grid else args.paths
+
+    catalog = MovieCatalog.load(CATALOG_PATH) if CATALOG_PATH.exists() else None
+    if args.grid and catalog is None:
+        parser.error(f"--grid needs the catalog at {CATALOG_PATH}")
+    rows = list(grid_prompts(catalog) if args.grid else read_prompts(input_path))
+
+    checkpoint = checkpoint_path(output)
+    done = completed_ids(checkpoint)
+    pending = [row for row in rows if row["id"] not in done]
+    print(f"{len(rows)} prompts, {len(rows) - len(pending)} already done, {len(pending)} to run", file=sys.stderr)
+
+    builder = PromptBuilder(select_persona(structured=not args.fenced))
+    runner = BatchRunner(make_model(args.fake, builder.system_instruction), builder, catalog, args.concurrency,
+                         args.rpm, structured=not args.fenced)
+    start = time.perf_counter()
+    with checkpoint.open("a", encoding="utf-8") as out:
+        written = runner.run(pending, out)
+    elapsed = time.perf_counter() - start
+
+    results = compact_checkpoint(checkpoint)
+    failed = sum(not succeeded(result) for result in results.values())
+    if checkpoint != Path(output):
+        write_parquet(results.values(), output)
+        if not failed:
+            checkpoint.unlink() # Kept otherwise, so a rerun retries just the failures
+    rate = written / elapsed * 60 if elapsed else 0.0
+    print(f"{written} prompts in {elapsed:.1f} s ({rate:.1f} prompts/min), {failed} failed; "
+          f"client: {runner.client.metrics.summary()}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Multi-process check: replicas sharing a coordination database respect one Gemini quota.
+
+Starts several processes, each with its own GeminiClient and several threads hammering
+the fake model, the way separate Streamlit replicas would. With "shared" limiting every
+process draws from one coordination.SharedTokenBucket; with "local" each has its own
+rate_limit.TokenBucket at the full rate, which is what the replicas did before. Every
+request is timestamped when it is sent, and the busiest window of each length is compared
+with what the quota allows (burst capacity + rate x window). It also checks that an
+identical request started by every process at once runs only once (Singleflight) and that
+a response cached by one process is a hit in another.
+
+Exits non-zero if the shared quota is exceeded or coalescing fails. The same checks run,
+at a smaller scale, in tests/test_coordination.py.
+
+Run with: python bench_coordination.py --processes 4 --threads 4 --rate 20 --seconds 5
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from coordination import SharedTokenBucket, Singleflight
+from fake_gemini import FakeModel
+from gemini_client import GeminiClient
+from rate_limit import TokenBucket
+from response_cache import ResponseCache, SQLiteBackend
+
+
+class StampedModel:
+    """Records the wall-clock time of every request before passing it to the fake model."""
+
+    def __init__(self, model):
+        self.model = model
+        self.stamps = []
+
+    def generate_content(self, contents, **kwargs):
+        self.stamps.append(time.time())
+        return self.model.generate_content(contents, **kwargs)
+
+
+def wait_until(start_at):
+    time.sleep(max(0.0, start_at - time.time()))
+
+
+def hammer(db_path, limiting, rate, capacity, threads, seconds, latency, start_at):
+    """One replica: threads send requests back to back for seconds; returns the send times."""
+    if limiting == "shared":
+        limiter = SharedTokenBucket(db_path, "gemini", rate, capacity=capacity)
+    else:
+        limiter = TokenBucket(rate, capacity=capacity)
+    model = StampedModel(FakeModel(latency=latency))
+    client = GeminiClient(max_in_flight=threads, limiter=limiter, queue_timeout=seconds + 5)
+    wait_until(start_at)
+    stop_at = start_at + seconds
+
+    def run():
+        while time.time() < stop_at:
+            client.generate_content(model, "Recommend a crime thriller!")
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return model.stamps
+
+
+def busiest_window(stamps, window):
+    """Returns the most requests sent within any window seconds."""
+    stamps = sorted(stamps)
+    most, first = 0, 0
+    for last, stamp in enumerate(stamps):
+        while stamp - stamps[first] >= window:
+            first += 1
+        most = max(most, last - first + 1)
+    return most
+
+
+def check_quota(pool, args, limiting):
+    db_path = str(Path(args.dir) / f"quota_{limiting}.db")
+    start_at = time.time() + 1.0 # Lets every process finish starting up first
+    jobs = [(db_path, limiting, args.rate, args.capacity, args.threads, args.seconds, args.latency, start_at)]
+    stamps = [stamp for replica in pool.starmap(hammer, jobs * args.processes) for stamp in replica]
+
+    ok = True
+    # Requests already waiting for a token at the deadline still go out, so use the real span
+    span = max(stamps) - min(stamps) if len(stamps) > 1 else args.seconds
+    print(f"{limiting} limiting: {len(stamps)} requests from {args.processes} processes in {span:.1f}s "
+          f"({len(stamps) / span:.1f}/s, quota {args.rate:g}/s + burst {args.capacity:g})")
+    for window in sorted({1.0, args.seconds / 2, args.seconds}):
+        busiest = busiest_window(stamps, window)
+        allowed = args.capacity + args.rate * window
+        within = busiest <= allowed + 1 # One request of slack for clock granularity
+        ok = ok and within
+        print(f"  busiest {window:4.1f}s window: {busiest:5d} requests, allowed {allowed:7.1f}  "
+              f"{'ok' if within else 'OVER QUOTA'}")
+    return ok
+
+
+def lead_or_follow(db_path, start_at):
+    """One replica asking for the same slow reply as every other replica at the same moment."""
+    singleflight = Singleflight(db_path, poll_interval=0.01)
+
+    def slow_reply():
+        time.sleep(0.5)
+        return f"reply generated by process {os.getpid()}"
+
+    wait_until(start_at)
+    return singleflight.do("crime thriller|okay", slow_reply, timeout=10)
+
+
+def check_singleflight(pool, args):
+    db_path = str(Path(args.dir) / "singleflight.db")
+    results = pool.starmap(lead_or_follow, [(db_path, time.time() + 1.0)] * args.processes)
+    leaders = sum(not shared for _, shared in results)
+    ok = leaders == 1 and len({value for value, _ in results}) == 1
+    print(f"singleflight: {args.processes} identical requests, {leaders} model call(s)  {'ok' if ok else 'FAILED'}")
+    return ok
+
+
+def cache_reply(db_path):
+    ResponseCache(SQLiteBackend(db_path)).set("Recommend a crime thriller!", "Okay", "Heat, Se7en, Zodiac")
+
+
+def check_shared_cache(pool, args):
+    db_path = str(Path(args.dir) / "cache.db")
+    pool.apply(cache_reply, (db_path,))
+    ok = ResponseCache(SQLiteBackend(db_path)).get("recommend a crime thriller", "okay") is not None
+    print(f"shared cache: reply cached by another process {'found' if ok else 'MISSING'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=4, help="replicas to simulate")
+    parser.add_argument("--threads", type=int, default=4, help="concurrent requests per replica")
+    parser.add_argument("--rate", type=float, default=20.0, help="shared quota in requests per second")
+    parser.add_argument("--capacity", type=float, default=5.0, help="burst size of the quota")
+    parser.add_argument("--seconds", type=float, default=5.0, help="how long each replica sends requests")
+    parser.add_argument("--latency", type=float, default=0.01, help="fake model latency (s)")
+    args = parser.parse_args()
+
+    # spawn, not fork: every replica opens the database from scratch like a separate server would
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as scratch, context.Pool(args.processes) as pool:
+        args.dir = scratch
+        check_quota(pool, args, "local")
+        ok = check_quota(pool, args, "shared")
+        ok = check_singleflight(pool, args) and ok
+        ok = check_shared_cache(pool, args) and ok
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
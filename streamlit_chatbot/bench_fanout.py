@@ -0,0 +1,103 @@
+"""Benchmark: single-call recommendations vs fan-out card generation.
+
+The single-call path streams one structured reply and shows a card as soon as its JSON
+object is complete; fan-out picks the titles with a short call and writes the five cards
+in parallel. Both are measured end to end and to the first complete card.
+
+Expect a trade-off rather than a win: fan-out finishes the whole reply sooner, but its
+first card arrives later (the title picks must complete before any card is started,
+while the single call's first card shows mid-stream), and it makes six model calls per
+request instead of one. With the command below the fake model gives about 865 ms vs
+523 ms to the first card and 870 ms vs 1400 ms end to end.
+
+Runs offline against the fake model by default; its output_token_latency makes long
+replies slow the way real generation does. Use --live (with GOOGLE_API_KEY set) to
+measure the real API.
+
+Run with: python bench_fanout.py --requests 10 --output-token-latency 0.004
+"""
+import argparse
+import os
+import time
+
+from fake_gemini import FakeModel
+from fanout import FanOutGenerator
+from gemini_client import GeminiClient, percentile
+from prompts import STRUCTURED_GENERATION_CONFIG, select_persona
+from recommendations import StreamingRecommendationParser
+
+REQUESTS = [
+    "Recommend a crime thriller!",
+    "Something cozy for a rainy Sunday",
+    "Any good sci-fi from the 2010s?",
+    "A comedy I can watch with my parents",
+]
+
+
+def make_model(args):
+    persona = select_persona(structured=True)
+    if not args.live:
+        return FakeModel(latency=args.latency, output_token_latency=args.output_token_latency,
+                         system_instruction=persona)
+    import google.generativeai as genai
+
+    genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
+    return genai.GenerativeModel("gemini-2.5-flash", system_instruction=persona)
+
+
+def single_call(client, model, prompt):
+    """Returns (seconds to the first complete card, seconds to the full reply)."""
+    start = time.perf_counter()
+    first_card = None
+    parser = StreamingRecommendationParser()
+    chunks = client.stream_message(model.start_chat(history=[]), prompt, generation_config=STRUCTURED_GENERATION_CONFIG)
+    for chunk in chunks:
+        if parser.feed(chunk.text) and first_card is None:
+            first_card = time.perf_counter() - start
+    parser.finish()
+    total = time.perf_counter() - start
+    return first_card if first_card is not None else total, total
+
+
+def fan_out(generator, model, prompt):
+    """Returns (seconds to the first complete card, seconds to the last card)."""
+    start = time.perf_counter()
+    first_card = None
+    _, _, picks = generator.pick(model.start_chat(history=[]), prompt)
+    for _ in generator.cards(picks, prompt):
+        if first_card is None:
+            first_card = time.perf_counter() - start
+    total = time.perf_counter() - start
+    return first_card if first_card is not None else total, total
+
+
+def report(name, samples):
+    first = [first for first, _ in samples]
+    total = [total for _, total in samples]
+    print(f"{name:<12} first card p50 {percentile(first, 50) * 1000:8.1f} ms  p95 {percentile(first, 95) * 1000:8.1f} ms"
+          f"   end to end p50 {percentile(total, 50) * 1000:8.1f} ms  p95 {percentile(total, 95) * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=8, help="requests per path")
+    parser.add_argument("--workers", type=int, default=5, help="fan-out card calls in parallel")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake model time to first byte (s)")
+    parser.add_argument("--output-token-latency", type=float, default=0.004, help="fake model seconds per output token")
+    parser.add_argument("--live", action="store_true", help="call the real Gemini API")
+    args = parser.parse_args()
+
+    model = make_model(args)
+    client = GeminiClient(max_in_flight=args.workers + 1)
+    generator = FanOutGenerator(client, model, workers=args.workers)
+    prompts = [REQUESTS[i % len(REQUESTS)] for i in range(args.requests)]
+
+    print(f"{args.requests} requests, {'live Gemini' if args.live else 'fake model'}, {args.workers} fan-out workers")
+    report("single call", [single_call(client, model, prompt) for prompt in prompts])
+    report("fan-out", [fan_out(generator, model, prompt) for prompt in prompts])
+    print(f"model calls: {client.metrics.calls} ({args.requests} single-call, "
+          f"{client.metrics.calls - args.requests} fan-out)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Offline load test for the Blockbuster Bot.
+
+Drives blockBusterBot.py headlessly through Streamlit's AppTest against the fake Gemini
+model (no network, no API key) and reports turn latency percentiles, rerun render time
+as the history grows, memory per session and throughput at N concurrent sessions.
+
+Each session runs in its own process: AppTest keeps per-script state that is not safe to
+share between threads, so concurrent sessions in one process crash Streamlit itself.
+
+Run with: python bench_load.py --sessions 8 --turns 10 --latency 0.2
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from gemini_client import percentile
+
+APP_PATH = str(Path(__file__).parent / "blockBusterBot.py")
+
+PROMPTS = [
+    "Recommend a crime thriller!",
+    "Something lighter please",
+    "More like number two",
+    "Any good sci-fi from the 2010s?",
+    "I want a cozy comedy for tonight",
+]
+
+
+def configure_fake_backend(args):
+    """Points the app at the fake model; must run before the first AppTest executes the script."""
+    os.environ["BLOCKBUSTER_FAKE_MODEL"] = "1"
+    os.environ["BLOCKBUSTER_FAKE_LATENCY"] = str(args.latency)
+    os.environ["BLOCKBUSTER_FAKE_CHUNK_DELAY"] = str(args.chunk_delay)
+    os.environ["BLOCKBUSTER_FAKE_SHAPE"] = args.shape
+
+
+def check(app, what):
+    """Raises if the last run of the script ended in an exception."""
+    if app.exception:
+        raise RuntimeError(f"{what} failed: {app.exception}")
+
+
+def new_session():
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(APP_PATH, default_timeout=120)
+    app.secrets["GOOGLE_API_KEY"] = "offline"
+    app.run()
+    check(app, "first run")
+    return app
+
+
+def start_worker(args):
+    """Process pool initializer: configures the fake backend and warms this process's resources."""
+    configure_fake_backend(args)
+    new_session()
+
+
+def run_session(session_id, turns):
+    """Runs one session; returns per-turn latencies, (history length, rerun time) pairs and its wall-clock span."""
+    app = new_session()
+    turn_latencies, rerun_times = [], []
+    started = time.time()
+    for turn in range(turns):
+        # Vary the text per session so the shared response cache doesn't answer everything
+        prompt = f"{PROMPTS[turn % len(PROMPTS)]} (session {session_id})"
+        start = time.perf_counter()
+        app.chat_input[0].set_value(prompt).run()
+        turn_latencies.append(time.perf_counter() - start)
+        check(app, f"session {session_id}, turn {turn}")
+
+        # A plain rerun (e.g. moving the mood slider) re-renders the whole history
+        start = time.perf_counter()
+        app.run()
+        rerun_times.append((len(app.session_state["messages"]), time.perf_counter() - start))
+        check(app, f"session {session_id}, rerun {turn}")
+    return turn_latencies, rerun_times, (started, time.time())
+
+
+def measure_session_memory(turns):
+    """Returns the bytes still allocated by one finished session (its session state and app)."""
+    tracemalloc.start()
+    baseline = tracemalloc.take_snapshot()
+    app = new_session()
+    for turn in range(turns):
+        app.chat_input[0].set_value(f"{PROMPTS[turn % len(PROMPTS)]} (memory probe)").run()
+        check(app, f"memory probe, turn {turn}")
+    used = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(baseline, "filename"))
+    tracemalloc.stop()
+    del app
+    return used
+
+
+def report_latency(name, samples):
+    print(f"{name:<26} p50 {percentile(samples, 50) * 1000:8.1f} ms   p95 {percentile(samples, 95) * 1000:8.1f} ms   "
+          f"p99 {percentile(samples, 99) * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=4, help="concurrent sessions")
+    parser.add_argument("--turns", type=int, default=8, help="chat turns per session")
+    parser.add_argument("--latency", type=float, default=0.0, help="fake model time to first byte (s)")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="fake model delay between chunks (s)")
+    parser.add_argument("--shape", default="recommendations", choices=["recommendations", "question", "garbled"])
+    args = parser.parse_args()
+    configure_fake_backend(args)
+
+    # Every worker warms its own process-wide resources (catalog, indexes, caches) in the
+    # initializer, so throughput is timed from the first turn sent to the last one answered.
+    # The workers are referenced through this module's import name, not __main__: AppTest
+    # runs the app as __main__ in each worker, where these functions could not be found.
+    import bench_load
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(args.sessions, mp_context=context, initializer=bench_load.start_worker,
+                             initargs=(args,)) as pool:
+        results = list(pool.map(bench_load.run_session, range(args.sessions), [args.turns] * args.sessions))
+    elapsed = max(end for _, _, (_, end) in results) - min(start for _, _, (start, _) in results)
+
+    turn_latencies = [latency for latencies, _, _ in results for latency in latencies]
+    rerun_times = [pair for _, reruns, _ in results for pair in reruns]
+    total_turns = len(turn_latencies)
+
+    print(f"{args.sessions} sessions x {args.turns} turns, fake latency {args.latency}s, shape {args.shape!r}")
+    report_latency("turn latency", turn_latencies)
+    report_latency("rerun render", [seconds for _, seconds in rerun_times])
+
+    print("rerun render time by history length:")
+    by_length = {}
+    for length, seconds in rerun_times:
+        by_length.setdefault(length, []).append(seconds)
+    for length in sorted(by_length):
+        print(f"  {length:4d} messages: {statistics.mean(by_length[length]) * 1000:8.1f} ms")
+
+    print(f"throughput: {total_turns / elapsed:.2f} turns/s ({total_turns} turns in {elapsed:.1f} s)")
+    new_session() # Warms this process before the memory probe
+    print(f"memory per session after {args.turns} turns: {measure_session_memory(args.turns) / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""A/B benchmark: persona concatenated into the first prompt vs the prompt builder.
+
+"concat" is the original approach: the full persona pasted into the first message (and so
+carried in the chat history on every later turn) with no input budget. "builder" sends
+the compact persona as the system instruction and trims each turn to the input budget.
+Both run the same scripted conversation; the report compares input tokens per turn (as
+billed in the response usage metadata) and latency.
+
+Runs offline against the fake model by default; its token_latency stands in for prompt
+processing time. Use --live (with GOOGLE_API_KEY set) to measure the real API.
+
+Run with: python bench_prompts.py --turns 12 --token-latency 0.0002
+"""
+import argparse
+import os
+import statistics
+import time
+
+from conversation_memory import ConversationMemory
+from fake_gemini import FakeModel
+from gemini_client import GeminiClient, percentile
+from prompts import STRUCTURED_GENERATION_CONFIG, PromptBuilder, model_token_counter, select_persona
+
+PROMPTS = [
+    "Recommend a crime thriller!",
+    "Something lighter please",
+    "Any good sci-fi from the 2010s?",
+    "I want a cozy comedy for tonight",
+    "More like the second one",
+    "What about a miniseries I can finish this weekend?",
+]
+
+VARIANTS = {
+    "concat": dict(compact=False, use_system_instruction=False, budgeted=False),
+    "builder": dict(compact=True, use_system_instruction=True, budgeted=True),
+}
+
+
+def make_model(args, system_instruction):
+    if not args.live:
+        return FakeModel(latency=args.latency, token_latency=args.token_latency, system_instruction=system_instruction)
+    import google.generativeai as genai
+
+    genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
+    return genai.GenerativeModel("gemini-2.5-flash", system_instruction=system_instruction)
+
+
+def run_variant(name, args):
+    """Runs the scripted conversation; returns per-turn (billed input tokens, estimated tokens, latency)."""
+    options = VARIANTS[name]
+    persona = select_persona(structured=True, compact=options["compact"])
+    system_instruction = persona if options["use_system_instruction"] else None
+    model = make_model(args, system_instruction)
+    builder = PromptBuilder(
+        persona,
+        use_system_instruction=options["use_system_instruction"],
+        input_budget=args.budget if options["budgeted"] else float("inf"),
+        count_tokens=model_token_counter(model),
+    )
+    memory = ConversationMemory(builder.history_preamble, token_budget=args.memory_budget)
+    client = GeminiClient()
+    chat = model.start_chat(history=[])
+
+    results = []
+    for turn in range(args.turns):
+        prompt = PROMPTS[turn % len(PROMPTS)]
+        built = builder.build(prompt, "Okay", history_tokens=memory.history_tokens(), is_first_turn=turn == 0)
+        start = time.perf_counter()
+        response = client.send_message(chat, built.text, generation_config=STRUCTURED_GENERATION_CONFIG)
+        latency = time.perf_counter() - start
+        results.append((response.usage_metadata.prompt_token_count, built.total_tokens, latency))
+
+        memory.add_turn(built.turn_prompt, response.text)
+        if memory.compact():
+            chat = model.start_chat(history=memory.build_history())
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=12, help="turns in the scripted conversation")
+    parser.add_argument("--budget", type=int, default=6000, help="builder input budget (tokens)")
+    parser.add_argument("--memory-budget", type=int, default=8000, help="conversation memory budget (tokens)")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake model time to first byte (s)")
+    parser.add_argument("--token-latency", type=float, default=0.0002, help="fake model seconds per input token")
+    parser.add_argument("--live", action="store_true", help="call the real Gemini API")
+    args = parser.parse_args()
+
+    print(f"{args.turns} turns, {'live Gemini' if args.live else 'fake model'}")
+    print(f"{'variant':<9} {'input tok/turn':>15} {'total input':>12} {'estimate err':>13} "
+          f"{'p50 latency':>12} {'p95 latency':>12}")
+    for name in VARIANTS:
+        results = run_variant(name, args)
+        billed = [tokens for tokens, _, _ in results]
+        errors = [estimate - tokens for tokens, estimate, _ in results]
+        latencies = [latency for _, _, latency in results]
+        print(f"{name:<9} {statistics.mean(billed):15.0f} {sum(billed):12d} {statistics.mean(errors):+13.0f} "
+              f"{percentile(latencies, 50) * 1000:9.1f} ms {percentile(latencies, 95) * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Compares "more like X" latency: similarity index vs. a full Gemini generation.
+
+Run with: python bench_similarity.py [runs]
+The LLM path only runs when GOOGLE_API_KEY is set in the environment.
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from catalog import MovieCatalog
+from similarity import SimilarityIndex, build_embeddings
+
+CATALOG_PATH = Path(__file__).parent / "data" / "movies.csv"
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def report(name, samples):
+    print(f"{name:<28} p50 {percentile(samples, 50) * 1000:9.3f} ms   "
+          f"p95 {percentile(samples, 95) * 1000:9.3f} ms   mean {statistics.mean(samples) * 1000:9.3f} ms")
+
+
+def bench_index(runs):
+    catalog = MovieCatalog.load(CATALOG_PATH)
+    with tempfile.TemporaryDirectory() as tmp:
+        index_path = Path(tmp) / "embeddings.npy"
+        start = time.perf_counter()
+        build_embeddings(catalog, index_path)
+        print(f"Offline build: {(time.perf_counter() - start) * 1000:.1f} ms for {len(catalog)} titles")
+
+        index = SimilarityIndex.load(index_path)
+        titles = index.titles
+        single, batched = [], []
+        for run in range(runs):
+            title = titles[run % len(titles)]
+            start = time.perf_counter()
+            index.more_like([title])
+            single.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            index.more_like(titles)
+            batched.append((time.perf_counter() - start) / len(titles))
+        report("index, one query", single)
+        report("index, batched (per query)", batched)
+
+
+def bench_llm(runs):
+    import google.generativeai as genai
+
+    genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
+    model = genai.GenerativeModel("gemini-2.5-flash")
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        model.generate_content(
+            "Recommend 5 movies or TV shows like Dune: Part Two. For each give the title, "
+            "IMDb rating, a synopsis and a witty 2-3 sentence critic review, as JSON."
+        )
+        samples.append(time.perf_counter() - start)
+    report("pure LLM generation", samples)
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    bench_index(runs)
+    if os.environ.get("GOOGLE_API_KEY"):
+        bench_llm(min(runs, 5))
+    else:
+        print("Set GOOGLE_API_KEY to also time the pure-LLM path.")
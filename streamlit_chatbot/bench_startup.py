@@ -0,0 +1,103 @@
+"""Cold-start and rerun benchmark for the Blockbuster Bot.
+
+Measures how long the bot's third-party imports take in a fresh interpreter, how long the
+first script run of a new session takes, and the per-rerun overhead once the process-wide
+resources are warm. Runs offline against the fake Gemini model.
+
+To compare before and after a change, run it on both revisions:
+    git stash; python bench_startup.py; git stash pop; python bench_startup.py
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from gemini_client import percentile
+
+APP_PATH = str(Path(__file__).parent / "blockBusterBot.py")
+
+# Imports the bot used to pay at the top of every cold start, and the ones it still does
+HEAVY_IMPORTS = [
+    "streamlit",
+    "pandas",
+    "numpy",
+    "requests",
+    "PIL.Image",
+    "google.generativeai",
+    "google.genai.types",
+]
+
+
+def import_seconds(module, repeat):
+    """Returns the median wall time of importing module in a fresh interpreter (None if missing)."""
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    samples = []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+        if result.returncode != 0:
+            return None
+        samples.append(float(result.stdout.strip()))
+    return statistics.median(samples)
+
+
+def eager_imports():
+    """Returns the heavy modules the bot pulls in on a fake-model run (imported at load time)."""
+    code = (
+        "import sys, os; os.environ['BLOCKBUSTER_FAKE_MODEL'] = '1';"
+        f"from streamlit.testing.v1 import AppTest; AppTest.from_file({APP_PATH!r}).run();"
+        f"print(' '.join(m for m in {HEAVY_IMPORTS!r} if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=Path(__file__).parent)
+    return result.stdout.split() if result.returncode == 0 else None
+
+
+def measure_reruns(reruns):
+    """Returns the first-run time of a new session and the times of its plain reruns."""
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(APP_PATH, default_timeout=120)
+    start = time.perf_counter()
+    app.run()
+    first = time.perf_counter() - start
+    if app.exception:
+        raise RuntimeError(f"app failed: {app.exception}")
+
+    times = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        app.run()
+        times.append(time.perf_counter() - start)
+    return first, times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per import measurement")
+    parser.add_argument("--reruns", type=int, default=30, help="plain reruns to time per session")
+    args = parser.parse_args()
+    os.environ["BLOCKBUSTER_FAKE_MODEL"] = "1"
+
+    print("cold import time (fresh interpreter, median):")
+    for module in HEAVY_IMPORTS:
+        seconds = import_seconds(module, args.repeat)
+        shown = "not installed" if seconds is None else f"{seconds * 1000:8.1f} ms"
+        print(f"  {module:<22} {shown}")
+
+    loaded = eager_imports()
+    if loaded is not None:
+        print(f"heavy modules loaded by a session: {', '.join(loaded) or 'none'}")
+
+    # The first session pays for the process-wide resources; the second shows a warm process
+    cold_first, _ = measure_reruns(0)
+    warm_first, reruns = measure_reruns(args.reruns)
+    print(f"first run, cold process: {cold_first * 1000:8.1f} ms")
+    print(f"first run, warm process: {warm_first * 1000:8.1f} ms")
+    print(f"rerun overhead           p50 {percentile(reruns, 50) * 1000:8.1f} ms   "
+          f"p95 {percentile(reruns, 95) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,35 @@
-import streamlit as st
-import pandas as pd
-import google.generativeai as genai 
-from google.genai import types # Keep this import, it's used elsewhere
 import json
+import os
+import time
+import uuid
+from contextlib import nullcontext
+from dataclasses import replace
+from pathlib import Path
+
+import streamlit as st
+from catalog import MovieCatalog, format_candidates
+from coordination import SharedTokenBucket, Singleflight
+from conversation_memory import ConversationMemory, estimate_tokens
+from fake_gemini import FakeModel
+from fanout import GARBLED_PICKS_INTRO, FanOutGenerator
+from gemini_client import GeminiClient, GeminiError
+from posters import PosterCache
+from prefetch import PrefetchScheduler, follow_up_prompts, predict_follow_ups
+from prompts import (
+    CRITIC_REVIEWS_GENERATION_CONFIG, REPROMPT_MESSAGE, STRUCTURED_GENERATION_CONFIG, PromptBuilder,
+    critic_reviews_prompt, model_token_counter, select_persona,
+)
+from recommendations import (
+    GARBLED_JSON_ERROR, Recommendation, RecommendationRecord, StreamingRecommendationParser, build_record,
+    parse_response,
+)
+from response_cache import MemoryBackend, ResponseCache, SQLiteBackend, make_cache_key
+from router import Router
+from seen_titles import SeenTitles
+from session_store import SessionStore
+from similarity import SimilarityIndex, build_embeddings, parse_more_like
+from telemetry import Telemetry, TurnTrace
+from warm_cache import WarmCache
 
 # --- Configuration ---
 
@@ -13,167 +40,911 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Configure Gemini API
-try:
-    GOOGLE_API_KEY = st.secrets["GOOGLE_API_KEY"]
-except KeyError:
-    st.error("Please set your GOOGLE_API_KEY in Streamlit secrets or as an environment variable.")
-    st.stop()
-    
-# Initialize the API configuration
-genai.configure(api_key=GOOGLE_API_KEY) 
+# Set BLOCKBUSTER_FAKE_MODEL=1 to run offline against the deterministic fake model
+# (benchmarks and CI); BLOCKBUSTER_FAKE_LATENCY, _CHUNK_DELAY and _SHAPE tune its replies
+USE_FAKE_MODEL = os.environ.get("BLOCKBUSTER_FAKE_MODEL") == "1"
+
+if not USE_FAKE_MODEL:
+    # Configure Gemini API (the model itself is built once per process by get_model)
+    try:
+        GOOGLE_API_KEY = st.secrets["GOOGLE_API_KEY"]
+    except KeyError:
+        st.error("Please set your GOOGLE_API_KEY in Streamlit secrets or as an environment variable.")
+        st.stop()
+
+GEMINI_MODEL_NAME = "gemini-2.5-flash"
+GEMINI_LITE_MODEL_NAME = "gemini-2.5-flash-lite"
+
+# Gemini client limits: requests in flight per server process, per-attempt deadline and retries
+GEMINI_MAX_IN_FLIGHT = 8
+GEMINI_TIMEOUT_SECONDS = 30
+GEMINI_MAX_RETRIES = 3
+
+# Several server processes behind a load balancer: point BLOCKBUSTER_COORDINATION_DB at one
+# SQLite file on the host and every replica draws from a shared Gemini request quota, shares
+# the response cache and coalesces identical first-turn requests in flight. Unset, each
+# process only limits itself through GEMINI_MAX_IN_FLIGHT.
+COORDINATION_DB_PATH = os.environ.get("BLOCKBUSTER_COORDINATION_DB")
+GEMINI_REQUESTS_PER_MINUTE = 60
+GEMINI_REQUEST_BURST = 10
+
+# Intent routing: greetings and thanks get canned replies, short chit-chat goes to the lite
+# model tier, and only recommendation requests use the main model. Routes are "canned",
+# "lite" or "main".
+ROUTING_ENABLED = True
+ROUTING_TABLE = {"greeting": "canned", "thanks": "canned", "chit_chat": "lite", "recommendation": "main"}
+
+# Ask Gemini for JSON matching a response schema instead of prose plus a fenced ```json block
+STRUCTURED_OUTPUT = True
+# A reply whose JSON had to be repaired (e.g. cut off mid-card) with fewer cards than the
+# prompts ask for is reprompted once, like a garbled one, and never cached
+EXPECTED_CARDS = 5
+
+# Prompt size: send the (compact) persona through the model's system-instruction channel
+# instead of the first message, and keep each turn's estimated input under the budget by
+# trimming catalog candidates. Exact per-component counts with the model's tokenizer cost
+# an API call per new text, so they are off by default.
+USE_SYSTEM_INSTRUCTION = True
+COMPACT_PERSONA = True
+PROMPT_INPUT_BUDGET = 6000
+COUNT_TOKENS_WITH_MODEL = False
+
+# Stream replies into the chat bubble as they arrive instead of waiting for the full answer
+STREAM_RESPONSES = True
+
+# Fan-out mode: a short call picks the titles, then each card is written by its own call in
+# parallel and shown as soon as it is done. The whole reply is faster (870 ms vs 1400 ms end
+# to end in bench_fanout.py), but the first card is slower (865 ms vs 523 ms, since the
+# picks must finish before any card starts, while a streamed single call shows its first
+# card mid-stream) and each turn costs six model calls instead of one. Off by default.
+FANOUT_CARDS = False
+FANOUT_WORKERS = 5
+
+# First-turn response cache: "session" (per browser session), "shared" (all sessions in
+# this server process) or "sqlite" (on disk, survives restarts)
+CACHE_BACKEND = "shared"
+CACHE_TTL_SECONDS = 6 * 60 * 60
+CACHE_MAX_ENTRIES = 512
+CACHE_DB_PATH = "response_cache.db"
+
+# Conversation memory: keep the last few turns verbatim and fold older ones into a
+# summary once the estimated history size goes over the token budget
+MEMORY_TOKEN_BUDGET = 8000
+MEMORY_KEEP_TURNS = 3
+
+# Chat sessions are saved to SQLite under the ?sid= query parameter, so a browser refresh or a
+# server restart resumes them; reconnecting loads the most recent messages one page at a time
+SESSION_DB_PATH = "sessions.db"
+SESSION_PAGE_SIZE = 20
+
+# Titles a user has already been shown are remembered per user (?uid= query parameter) across
+# sessions: the latest ones are listed in the prompt as exclusions, and repeats that slip
+# through are dropped before the cards are rendered. Past SEEN_TITLES_MAX_EXACT titles the
+# index switches from an exact set to a Bloom filter.
+SEEN_TITLES_ENABLED = True
+SEEN_TITLES_IN_PROMPT = 20
+SEEN_TITLES_MAX_EXACT = 1000
+
+# Warm set of precomputed first-turn replies for every mood x these genres ("recommend a
+# comedy" in any mood is answered instantly), regenerated in the background before it expires.
+# Off by default: filling it costs a model call per mood x genre every refresh. Replicas
+# sharing COORDINATION_DB_PATH take turns holding the refresh lease, so only one of them
+# calls the model and the rest read the file it writes.
+WARM_CACHE_ENABLED = False
+WARM_CACHE_GENRES = ["Action", "Animation", "Comedy", "Crime", "Drama", "Horror", "Romance", "Sci-Fi", "Thriller"]
+WARM_CACHE_PATH = Path(__file__).parent / "data" / "warm_cache.json"
+WARM_CACHE_MAX_AGE_SECONDS = 24 * 60 * 60
+
+# Speculatively prefetch the likeliest follow-ups (suggested follow-ups, next mood step) while
+# the user reads the cards; each session gets PREFETCH_BUDGET background calls per turn.
+# Off by default: every turn then costs up to PREFETCH_BUDGET extra model calls, most of
+# them never used, which eats into the shared quota
+PREFETCH_FOLLOW_UPS = False
+PREFETCH_BUDGET = 3
+PREFETCH_TTL_SECONDS = 120
+
+# Only the last few turns are rendered in full on each rerun; older replies with cards are
+# collapsed to a one-line summary that expands on demand
+RENDER_FULL_TURNS = 3
+
+# Local title dataset (CSV or Parquet) used to ground recommendations and feed the sidebar
+CATALOG_PATH = Path(__file__).parent / "data" / "movies.csv"
+CATALOG_CANDIDATES = 8
 
-# Initialize the GenerativeModel object
-model = genai.GenerativeModel('gemini-2.5-flash')
+# Memory-mapped synopsis embeddings for "more like X" requests (built by similarity.py)
+SIMILARITY_INDEX_PATH = Path(__file__).parent / "data" / "embeddings.npy"
+SIMILAR_TITLES = 5
+
+# On-disk thumbnail cache for poster images
+POSTER_CACHE_DIR = Path(__file__).parent / ".poster_cache"
+POSTER_CACHE_MAX_BYTES = 100 * 1024 * 1024
+
+# Per-turn instrumentation: a JSONL log of every turn plus Prometheus-format aggregates.
+# Set BLOCKBUSTER_DEV_PANEL=1 (or open the app with ?dev=1) to show the developer panel.
+TELEMETRY_LOG_PATH = "telemetry.jsonl"
+TELEMETRY_PROMETHEUS_PATH = "metrics.prom"
+DEV_PANEL = os.environ.get("BLOCKBUSTER_DEV_PANEL") == "1"
 
 # --- Data & Prompts ---
 
-# Dummy Data for Sidebar (Replace with real data source if available)
-recent_blockbusters = [
-    {"Title": "Everything Everywhere All at Once", "IMDb": 8.0, "PosterURL": "https://m.media-amazon.com/images/M/MV5BN2QyYWI4OTctOGY3Ni00MzQxLWEzZTUtOGY4NDk0MmMwNTBlXkEyXkFqcGdeQXVyMTkxNDUyMzc5._V1_FMjpg_UX600_.jpg"},
-    {"Title": "Dune: Part Two", "IMDb": 8.3, "PosterURL": "https://m.media-amazon.com/images/M/MV5BODg1OTQxODgtMTM5YS00NWM0LTkzYjctMTM2NzI1M2Q3MDdmXkEyXkFqcGdeQXVyMTMxNTc0NDY5._V1_FMjpg_UX600_.jpg"},
-    {"Title": "The Holdovers", "IMDb": 8.0, "PosterURL": "https://m.media-amazon.com/images/M/MV5BODg1OTQxODgtMTM5YS00NWM0LTkzYjctMTM2NzI1M2Q3MDdmXkEyXkFqcGdeQXVyMTMxNTc0NDY5._V1_FMjpg_UX600_.jpg"},
-]
-
-# Persona and Instructions for Gemini - CRITICAL for structured output!
-persona_instructions = """
-You are a world-reknown film and TV show critic, whose success was built on thorough and holistic reviews of films and TV series. You are a creative person who speaks eloquently and has the sense of humour of Ryan Reynolds.
-
-Your main role is to recommend movies and TV shows to users based on their mood, preferred genre, film interests, and personality.
-
-Crucial Instruction for Recommendation Output:
-When providing recommendations (typically 5), you MUST first output a short, witty introductory sentence in plain text.
-Immediately following the introduction, you MUST output a JSON object containing a list of your recommendations.
-The JSON object must be enclosed in triple backticks (```json...```) and contain a single key: "recommendations".
-Each item in the "recommendations" list must be a dictionary with the following keys:
-- "title": The title of the movie or TV show.
-- "imdb_rating": The IMDb rating (e.g., "8.2/10").
-- "synopsis": A brief, engaging synopsis of the plot.
-- "poster_url": A public URL for the movie/show poster image.
-- "critic_review": Your own short, eloquent, and witty review (2-3 sentences).
-
-If you are unable to give a proper recommendation because of insufficient data on the user's film preferences, you should ask the user constructive questions in order to come to a more accurate list of recommendations, and you should NOT output a JSON block.
-"""
+WELCOME_MESSAGE = "Welcome! I'm The Blockbuster Bot, your world-reknown film and TV critic. Tell me, what mood are you in, or what have you watched lately? Let's get you a reel good recommendation! 😉"
+
 
 # --- Functions ---
 
+def generation_options():
+    """Returns the extra send_message arguments for the configured output mode."""
+    return {"generation_config": STRUCTURED_GENERATION_CONFIG} if STRUCTURED_OUTPUT else {}
+
+
 def initialize_session_state():
-    """Initializes chat history and the persistent chat object."""
-    global model, persona_instructions 
-    
+    """Initializes chat history and the persistent chat object, resuming a stored session if there is one."""
+    if "session_id" not in st.session_state:
+        # The sid query parameter survives a refresh, so the stored session can be found again
+        session_id = st.query_params.get("sid")
+        if not session_id:
+            session_id = st.query_params["sid"] = uuid.uuid4().hex
+        st.session_state.session_id = session_id
+        restore_session(session_id)
+
+    if "user_id" not in st.session_state:
+        # Like sid, but kept when starting a new chat, so seen titles follow the user across sessions
+        user_id = st.query_params.get("uid")
+        if not user_id:
+            user_id = st.query_params["uid"] = uuid.uuid4().hex
+        st.session_state.user_id = user_id
+        seen = get_session_store().load_seen_titles(user_id) if SEEN_TITLES_ENABLED else None
+        st.session_state.seen_titles = (
+            SeenTitles.from_dict(seen, max_exact=SEEN_TITLES_MAX_EXACT) if seen
+            else SeenTitles(max_exact=SEEN_TITLES_MAX_EXACT)
+        )
+
     if "messages" not in st.session_state:
         st.session_state.messages = [
-            {"role": "assistant", "content": "Welcome! I'm The Blockbuster Bot, your world-reknown film and TV critic. Tell me, what mood are you in, or what have you watched lately? Let's get you a reel good recommendation! 😉"}
+            {"role": "assistant", "content": WELCOME_MESSAGE, "record": parse_response(WELCOME_MESSAGE)}
         ]
     if "mood" not in st.session_state:
         st.session_state.mood = "Okay" # Default mood
+
+    if "memory" not in st.session_state:
+        st.session_state.memory = ConversationMemory(
+            get_prompt_builder().history_preamble, token_budget=MEMORY_TOKEN_BUDGET, keep_turns=MEMORY_KEEP_TURNS
+        )
+    if "last_input_tokens" not in st.session_state:
+        st.session_state.last_input_tokens = None
+    if "oldest_loaded_seq" not in st.session_state:
+        # Stored sequence number of messages[0], and of the next message to be saved
+        st.session_state.oldest_loaded_seq = 0
+        st.session_state.next_message_seq = 0
+    if "turn_trace" not in st.session_state:
+        st.session_state.turn_trace = None
         
     if "chat" not in st.session_state:
-        # FIX APPLIED HERE: Initialize chat with system instructions added to the first message, 
-        # or use the empty list and put the instruction directly into the first user prompt.
-        
-        # Since the error states 'config' is unexpected, we use the simplest form:
         try:
-            # Note: This version of start_chat() expects history first. 
-            # We initialize it with an empty list and ensure the persona_instructions are 
-            # included in the user's first prompt (which they already are in main()).
-            st.session_state.chat = model.start_chat(history=[])
+            # The persona is either the model's system instruction or prepended to the
+            # user's first prompt by the prompt builder, so the chat starts empty
+            st.session_state.chat = get_model().start_chat(history=[])
         except Exception as e:
             st.error(f"Error initializing Gemini chat session: {e}")
             st.stop()
 
 
+def restore_session(session_id):
+    """Loads a stored session's latest messages, mood and memory, and rebuilds its chat from the memory."""
+    store = get_session_store()
+    state = store.load_state(session_id)
+    if state is None:
+        return
+    mood, memory = state
+    page = store.load_messages(session_id, SESSION_PAGE_SIZE)
+    st.session_state.messages = [message for _, message in page]
+    st.session_state.oldest_loaded_seq = page[0][0] if page else 0
+    st.session_state.next_message_seq = store.message_count(session_id)
+    st.session_state.mood = mood
+    st.session_state.memory = ConversationMemory.from_dict(
+        memory, get_prompt_builder().history_preamble, token_budget=MEMORY_TOKEN_BUDGET, keep_turns=MEMORY_KEEP_TURNS
+    )
+    # The compacted history is enough context: old turns are not replayed through the model
+    st.session_state.chat = get_model().start_chat(history=st.session_state.memory.build_history())
+
+
+def load_earlier_messages():
+    """Prepends the previous page of stored messages to the chat history."""
+    page = get_session_store().load_messages(
+        st.session_state.session_id, SESSION_PAGE_SIZE, before_seq=st.session_state.oldest_loaded_seq
+    )
+    st.session_state.messages[:0] = [message for _, message in page]
+    st.session_state.oldest_loaded_seq = page[0][0] if page else 0
+
+
+def save_session():
+    """Queues the messages added since the last save, plus the mood and memory, for the session store."""
+    store = get_session_store()
+    session_id = st.session_state.session_id
+    messages = st.session_state.messages
+    first_new = st.session_state.next_message_seq - st.session_state.oldest_loaded_seq
+    for offset, message in enumerate(messages[first_new:]):
+        store.append_message(session_id, st.session_state.next_message_seq + offset, message)
+    st.session_state.next_message_seq = st.session_state.oldest_loaded_seq + len(messages)
+    store.save_state(session_id, st.session_state.mood, st.session_state.memory.to_dict())
+    if SEEN_TITLES_ENABLED:
+        store.save_seen_titles(st.session_state.user_id, st.session_state.seen_titles.to_dict())
+
+
+@st.cache_resource
+def get_session_store():
+    """Opens the session store once per server process; its writer thread batches every session's writes."""
+    return SessionStore(SESSION_DB_PATH)
+
+
+@st.cache_resource
+def get_model():
+    """Builds the Gemini model (or the offline fake) once per server process."""
+    persona = select_persona(STRUCTURED_OUTPUT, COMPACT_PERSONA)
+    system_instruction = persona if USE_SYSTEM_INSTRUCTION else None
+    if USE_FAKE_MODEL:
+        return FakeModel(
+            latency=float(os.environ.get("BLOCKBUSTER_FAKE_LATENCY", "0")),
+            chunk_delay=float(os.environ.get("BLOCKBUSTER_FAKE_CHUNK_DELAY", "0")),
+            shape=os.environ.get("BLOCKBUSTER_FAKE_SHAPE", "recommendations"),
+            system_instruction=system_instruction,
+        )
+    # Imported here so offline runs and reruns never pay for the SDK import
+    import google.generativeai as genai
+
+    genai.configure(api_key=GOOGLE_API_KEY)
+    return genai.GenerativeModel(GEMINI_MODEL_NAME, system_instruction=system_instruction)
+
+
+@st.cache_resource
+def get_lite_model():
+    """Builds the fast, cheap model tier used for chit-chat turns, once per server process."""
+    system_instruction = select_persona(STRUCTURED_OUTPUT, COMPACT_PERSONA) if USE_SYSTEM_INSTRUCTION else None
+    if USE_FAKE_MODEL:
+        return FakeModel(
+            latency=float(os.environ.get("BLOCKBUSTER_FAKE_LATENCY", "0")) / 2,
+            shape="question",
+            system_instruction=system_instruction,
+        )
+    import google.generativeai as genai
+
+    genai.configure(api_key=GOOGLE_API_KEY)
+    return genai.GenerativeModel(GEMINI_LITE_MODEL_NAME, system_instruction=system_instruction)
+
+
+@st.cache_resource
+def get_review_model():
+    """Builds a model without the persona's system instruction, whose reply format would clash with the review schema."""
+    if USE_FAKE_MODEL:
+        return FakeModel(latency=float(os.environ.get("BLOCKBUSTER_FAKE_LATENCY", "0")))
+    import google.generativeai as genai
+
+    genai.configure(api_key=GOOGLE_API_KEY)
+    return genai.GenerativeModel(GEMINI_MODEL_NAME)
+
+
+@st.cache_resource
+def get_fanout():
+    """Builds the fan-out card generator (and its worker pool) once per server process."""
+    return FanOutGenerator(get_gemini_client(), get_model(), workers=FANOUT_WORKERS)
+
+
+@st.cache_resource
+def get_router():
+    """Builds the intent router (and its per-route metrics) once per server process."""
+    catalog = get_catalog()
+    # Catalog titles let a bare "Parasite" count as a recommendation request
+    titles = catalog.frame["title"].tolist() if catalog is not None else ()
+    return Router(ROUTING_TABLE, model_names={"main": GEMINI_MODEL_NAME, "lite": GEMINI_LITE_MODEL_NAME},
+                  titles=titles)
+
+
+@st.cache_resource
+def get_prompt_builder():
+    """Builds the prompt builder (it owns the persona text) once per server process."""
+    return PromptBuilder(
+        select_persona(STRUCTURED_OUTPUT, COMPACT_PERSONA),
+        use_system_instruction=USE_SYSTEM_INSTRUCTION,
+        input_budget=PROMPT_INPUT_BUDGET,
+        count_tokens=model_token_counter(get_model()) if COUNT_TOKENS_WITH_MODEL else estimate_tokens,
+    )
+
+
+@st.cache_resource
+def get_gemini_client():
+    """Builds one Gemini client per server process so its in-flight cap covers every session."""
+    return GeminiClient(
+        max_in_flight=GEMINI_MAX_IN_FLIGHT,
+        timeout=GEMINI_TIMEOUT_SECONDS,
+        max_retries=GEMINI_MAX_RETRIES,
+        limiter=get_rate_limiter(),
+    )
+
+
+@st.cache_resource
+def get_rate_limiter():
+    """Returns the Gemini request quota shared by every replica, or None when running alone."""
+    if not COORDINATION_DB_PATH:
+        return None
+    return SharedTokenBucket(
+        COORDINATION_DB_PATH, "gemini", GEMINI_REQUESTS_PER_MINUTE / 60, capacity=GEMINI_REQUEST_BURST
+    )
+
+
+@st.cache_resource
+def get_singleflight():
+    """Returns the cross-replica request coalescer, or None when running alone."""
+    return Singleflight(COORDINATION_DB_PATH, lease_seconds=2 * GEMINI_TIMEOUT_SECONDS) if COORDINATION_DB_PATH else None
+
+
+@st.cache_resource
+def get_shared_response_cache(backend_name):
+    """Builds one response cache per server process, shared by every session."""
+    if backend_name == "sqlite":
+        backend = SQLiteBackend(COORDINATION_DB_PATH or CACHE_DB_PATH, max_entries=CACHE_MAX_ENTRIES)
+    else:
+        backend = MemoryBackend(max_entries=CACHE_MAX_ENTRIES)
+    return ResponseCache(backend, ttl_seconds=CACHE_TTL_SECONDS)
+
+
+def get_response_cache():
+    """Returns the response cache for the configured backend."""
+    if CACHE_BACKEND == "session" and not COORDINATION_DB_PATH:
+        if "response_cache" not in st.session_state:
+            st.session_state.response_cache = ResponseCache(
+                MemoryBackend(max_entries=CACHE_MAX_ENTRIES), ttl_seconds=CACHE_TTL_SECONDS
+            )
+        return st.session_state.response_cache
+    # Replicas only share what is on disk
+    return get_shared_response_cache("sqlite" if COORDINATION_DB_PATH else CACHE_BACKEND)
+
+
+@st.cache_resource
+def get_catalog():
+    """Loads the movie catalog and builds its indexes once per server process."""
+    if not CATALOG_PATH.exists():
+        return None
+    return MovieCatalog.load(CATALOG_PATH)
+
+
+@st.cache_resource
+def get_top_picks(count):
+    """Returns the sidebar's top catalog picks; the catalog is static, so once per process is enough."""
+    catalog = get_catalog()
+    return list(catalog.top_picks(count).itertuples(index=False)) if catalog is not None else []
+
+
+def ground_recommendations(recommendations):
+    """Overwrites model-provided ratings with catalog data for titles the catalog knows."""
+    catalog = get_catalog()
+    if catalog is not None:
+        for rec in recommendations:
+            catalog.ground(rec)
+    return recommendations
+
+
+@st.cache_resource
+def get_similarity_index():
+    """Opens the synopsis embeddings, (re)building them when missing or out of date with the catalog."""
+    catalog = get_catalog()
+    if catalog is None:
+        return None
+    titles = catalog.frame["title"].tolist()
+    if SIMILARITY_INDEX_PATH.exists():
+        index = SimilarityIndex.load(SIMILARITY_INDEX_PATH)
+        if index.titles == titles:
+            return index
+    build_embeddings(catalog, SIMILARITY_INDEX_PATH)
+    return SimilarityIndex.load(SIMILARITY_INDEX_PATH)
+
+
+def write_critic_reviews(recommendations):
+    """Asks Gemini only for the witty critic reviews of titles that were already picked."""
+    try:
+        response = get_gemini_client().generate_content(
+            get_review_model(), critic_reviews_prompt(recommendations),
+            generation_config=CRITIC_REVIEWS_GENERATION_CONFIG,
+        )
+        data = json.loads(response.text)
+        items = data.get("reviews") if isinstance(data, dict) else None
+        if not isinstance(items, list):
+            return recommendations
+        reviews = {
+            str(item["title"]): str(item["critic_review"])
+            for item in items if isinstance(item, dict) and item.get("title") and item.get("critic_review")
+        }
+    except Exception:
+        # The cards are still useful without the flavour text
+        return recommendations
+    for rec in recommendations:
+        if reviews.get(rec.title):
+            rec.critic_review = reviews[rec.title]
+    return recommendations
+
+
+def answer_more_like(prompt):
+    """Answers "more like X" requests from the similarity index, or returns None if it can't."""
+    title_text = parse_more_like(prompt)
+    index = get_similarity_index() if title_text else None
+    title = index.find_title(title_text) if index is not None else None
+    if title is None:
+        return None
+
+    catalog = get_catalog()
+    seen = st.session_state.seen_titles if SEEN_TITLES_ENABLED else None
+    # Ask for extra neighbours so titles the user has already seen can be skipped
+    similar = index.more_like([title], k=SIMILAR_TITLES * 2 if seen is not None else SIMILAR_TITLES)[0]
+    fresh = [similar_title for similar_title, _ in similar if seen is None or similar_title not in seen]
+    recommendations = []
+    for similar_title in (fresh or [similar_title for similar_title, _ in similar])[:SIMILAR_TITLES]:
+        row = catalog.lookup(similar_title)
+        recommendations.append(Recommendation(
+            title=row["title"],
+            imdb_rating=f"{row['imdb_rating']:.1f}/10",
+            synopsis=row["synopsis"],
+            poster_url=row["poster_url"],
+        ))
+    write_critic_reviews(recommendations)
+    return build_record(f"Loved *{title}*? Then these share more than a little of its DNA:", recommendations)
+
+
+@st.cache_resource
+def get_poster_cache():
+    """Builds one poster thumbnail cache (and its fetch thread pool) per server process."""
+    return PosterCache(POSTER_CACHE_DIR, max_bytes=POSTER_CACHE_MAX_BYTES, offline=USE_FAKE_MODEL)
+
+
+@st.cache_resource
+def get_telemetry():
+    """Builds one telemetry collector per server process."""
+    return Telemetry(TELEMETRY_LOG_PATH, TELEMETRY_PROMETHEUS_PATH)
+
+
+def trace_stage(name):
+    """Times a block as a stage of the current turn (a no-op outside of a turn)."""
+    trace = st.session_state.get("turn_trace")
+    return trace.stage(name) if trace is not None else nullcontext()
+
+
+def rebuild_chat():
+    """Restarts the chat from the bounded history kept by the conversation memory."""
+    st.session_state.chat = get_model().start_chat(history=st.session_state.memory.build_history())
+
+
+def record_usage(response):
+    """Records the token counts reported in the response usage metadata, if any."""
+    usage = getattr(response, "usage_metadata", None)
+    st.session_state.last_input_tokens = getattr(usage, "prompt_token_count", None)
+    if st.session_state.turn_trace is not None:
+        st.session_state.turn_trace.record_usage(response)
+
+
+def catalog_candidates(prompt, catalog, seen=None):
+    """Returns the catalog candidate section grounding a request, or '' without matches.
+
+    Titles in seen (a SeenTitles index) are left out, so the model isn't steered back to them.
+    """
+    if catalog is None:
+        return ""
+    candidates = catalog.candidates_for_prompt(prompt, limit=CATALOG_CANDIDATES)
+    if seen is not None and len(seen) and len(candidates):
+        candidates = candidates[[title not in seen for title in candidates["title"]]]
+    return format_candidates(candidates) if len(candidates) else ""
+
+
+def build_prompt(prompt, mood, is_first_turn, history_tokens=0):
+    """Builds one turn's prompt, grounded in the catalog, within the per-turn input budget."""
+    seen = st.session_state.seen_titles if SEEN_TITLES_ENABLED else None
+    return get_prompt_builder().build(
+        prompt, mood, catalog_candidates(prompt, get_catalog(), seen), history_tokens=history_tokens,
+        is_first_turn=is_first_turn, exclude=seen.exclusions(SEEN_TITLES_IN_PROMPT) if seen is not None else (),
+    )
+
+
+def drop_seen(recommendations):
+    """Drops recommendations the user has already been shown; repeats count toward the turn's trace."""
+    if not SEEN_TITLES_ENABLED:
+        return recommendations
+    fresh, dropped = st.session_state.seen_titles.drop_seen(recommendations)
+    trace = st.session_state.turn_trace
+    if dropped and trace is not None:
+        trace.repeats_filtered += dropped
+        trace.regeneration_saved = True
+    return fresh
+
+
+def needs_reprompt(record):
+    """True for a garbled reply, or a repaired one that lost some of its cards."""
+    return record.error is not None or (record.repaired and len(record.recommendations) < EXPECTED_CARDS)
+
+
+def drop_seen_titles(record):
+    """Returns record without the repeated cards (a copy, since cached records are shared)."""
+    fresh = drop_seen(record.recommendations)
+    return record if len(fresh) == len(record.recommendations) else replace(record, recommendations=fresh)
+
+
+def fetch_prefetched_reply(model, client, history, full_prompt):
+    """Runs a speculative turn on a throwaway chat (called off the script thread, so no session state)."""
+    chat = model.start_chat(history=history)
+    return client.send_message(chat, full_prompt, **generation_options()).text
+
+
+@st.cache_resource
+def get_warm_cache():
+    """Loads the warm mood x genre set and starts its background refresh job, once per server process."""
+    model, client, catalog, builder = get_model(), get_gemini_client(), get_catalog(), get_prompt_builder()
+
+    def fetch(prompt, mood):
+        # Runs on the refresh thread, so everything it needs was captured up front
+        full_prompt = builder.build(prompt, mood, catalog_candidates(prompt, catalog), is_first_turn=True).text
+        record = parse_response(client.generate_content(model, full_prompt, **generation_options()).text)
+        if catalog is not None:
+            for rec in record.recommendations:
+                catalog.ground(rec)
+        return record
+
+    singleflight = None
+    if COORDINATION_DB_PATH:
+        # The lease outlasts a whole pass of model calls, so a slow pass keeps its ownership
+        singleflight = Singleflight(COORDINATION_DB_PATH, lease_seconds=6 * GEMINI_TIMEOUT_SECONDS)
+    warm_cache = WarmCache(fetch, WARM_CACHE_GENRES, path=WARM_CACHE_PATH, max_age=WARM_CACHE_MAX_AGE_SECONDS,
+                           refresh_age=WARM_CACHE_MAX_AGE_SECONDS / 2, singleflight=singleflight)
+    warm_cache.start()
+    return warm_cache
+
+
+@st.cache_resource
+def get_prefetcher():
+    """Builds one prefetch scheduler (and its worker pool) per server process."""
+    return PrefetchScheduler(fetch_prefetched_reply, budget=PREFETCH_BUDGET, ttl_seconds=PREFETCH_TTL_SECONDS)
+
+
+def schedule_follow_ups(prompt, record):
+    """Suggests follow-ups for a reply with cards and prefetches the likeliest next requests."""
+    top_title = record.recommendations[0].title
+    st.session_state.follow_ups = follow_up_prompts(top_title)
+
+    # The history snapshot already holds this turn, just like the real chat will next turn
+    memory = st.session_state.memory
+    history = memory.build_history()
+    model, client, index = get_model(), get_gemini_client(), get_similarity_index()
+    for next_prompt, mood in predict_follow_ups(prompt, st.session_state.mood, top_title):
+        title_text = parse_more_like(next_prompt)
+        if title_text and index is not None and index.find_title(title_text):
+            continue # Answered locally from the similarity index anyway
+        full_prompt = build_prompt(next_prompt, mood, is_first_turn=False, history_tokens=memory.history_tokens()).text
+        get_prefetcher().schedule(st.session_state.session_id, next_prompt, mood, model, client, history, full_prompt)
+
+
+def render_follow_ups():
+    """Shows the suggested follow-ups as buttons; returns the clicked one, if any."""
+    follow_ups = st.session_state.get("follow_ups")
+    if not follow_ups:
+        return None
+    clicked = None
+    for column, follow_up in zip(st.columns(len(follow_ups)), follow_ups):
+        if column.button(follow_up, key=f"follow_up_{follow_up}"):
+            clicked = follow_up
+    return clicked
+
+
+def get_lite_response(prompt):
+    """Answers a light turn with the lite model tier, on a throwaway chat rebuilt from memory."""
+    chat = get_lite_model().start_chat(history=st.session_state.memory.build_history())
+    with trace_stage("model"):
+        response = get_gemini_client().send_message(chat, prompt, **generation_options())
+    record_usage(response)
+    return response.text
+
+
 def get_gemini_response(prompt):
     """Generates a response from the Gemini model using the persistent chat object."""
     # The chat object automatically manages history and configuration
-    response = st.session_state.chat.send_message(prompt)
+    with trace_stage("model"):
+        response = get_gemini_client().send_message(st.session_state.chat, prompt, **generation_options())
+    record_usage(response)
     return response.text
 
-def display_recommendations(text):
-    """Parses text for the JSON block and displays recommendations beautifully."""
-    if "```json" not in text:
+def stream_gemini_response(prompt):
+    """Yields the Gemini response text chunk by chunk as it is generated."""
+    # The chat history is only updated once the stream has been fully consumed
+    chunks = get_gemini_client().stream_message(st.session_state.chat, prompt, **generation_options())
+    started = time.perf_counter()
+    last_chunk = None
+    while True:
+        with trace_stage("model"):
+            chunk = next(chunks, None)
+        if chunk is None:
+            break
+        if last_chunk is None and st.session_state.turn_trace is not None:
+            st.session_state.turn_trace.add("time_to_first_chunk", time.perf_counter() - started)
+        last_chunk = chunk
+        yield chunk.text
+    record_usage(last_chunk)
+
+def render_recommendation(rec, poster=None):
+    """Displays a single recommendation card with its poster and details."""
+    st.divider() # Separator for each recommendation
+
+    # Use columns for layout: Poster (col1) and Details (col2)
+    col1, col2 = st.columns([1, 3], gap="large") 
+
+    with col1:
+        # Display the cached poster thumbnail (or the local placeholder if it couldn't be fetched)
+        if poster is None:
+            poster = get_poster_cache().get(rec.poster_url)
+        st.image(poster, 
+                 caption=f"IMDb: {rec.imdb_rating}", 
+                 use_container_width="auto")
+
+    with col2:
+        st.markdown(f"## {rec.title}")
+        st.markdown(f"**IMDb Rating:** {rec.imdb_rating}")
+        st.markdown(f"**Synopsis:** {rec.synopsis}")
+        st.markdown("---")
+        # Ensure the critic review text is bold for emphasis
+        st.markdown(f"**Critic's Review:** *{rec.critic_review}*")
+
+def display_record_error(record):
+    """Shows the parse failure for a record along with the raw model output."""
+    if record.error == GARBLED_JSON_ERROR:
+        st.error("🤖 Bot Error: I tried to provide a structured recommendation but the data was garbled. Sorry about that! Here is the raw output:")
+    else:
+        st.error(f"An unexpected error occurred: {record.error}. Here is the raw output:")
+    st.code(record.raw)
+
+def display_recommendations(record):
+    """Displays an already-parsed reply: intro text followed by the recommendation cards."""
+    if not record.has_json:
         # If no JSON block, treat it as a conversational message (e.g., asking a question)
-        st.write(text)
+        st.write(record.intro)
+        return
+
+    if record.error:
+        display_record_error(record)
         return
 
+    # Display the introductory text first
+    st.markdown(record.intro)
+
+    st.subheader("🎬 Your Blockbuster Recommendations 🍿")
+
+    # Fetch any missing posters in parallel, then display each recommendation in columns
+    posters = get_poster_cache().get_many([rec.poster_url for rec in record.recommendations])
+    for rec, poster in zip(record.recommendations, posters):
+        render_recommendation(rec, poster)
+
+def summarize_record(record, max_intro_chars=120):
+    """Returns a one-line summary of a reply with cards: a trimmed intro and the titles."""
+    intro = " ".join(record.intro.split())
+    if len(intro) > max_intro_chars:
+        intro = intro[:max_intro_chars - 3] + "..."
+    titles = " · ".join(f"**{rec.title}**" for rec in record.recommendations)
+    return f"{intro}  \n🎬 {titles}" if intro else f"🎬 {titles}"
+
+
+@st.fragment
+def display_collapsed_recommendations(record, seq):
+    """Displays an older reply as its summary; the cards are only rendered once expanded.
+
+    Runs as a fragment, so expanding or collapsing reruns just this message, not the page.
+    """
+    st.markdown(summarize_record(record))
+    if st.toggle(f"Show {len(record.recommendations)} cards", key=f"expand_message_{seq}"):
+        display_recommendations(record)
+
+
+def display_fanout_recommendations(prompt, request):
+    """Picks titles, then renders each card as its own parallel call completes; returns the merged record."""
+    generator = get_fanout()
+    with trace_stage("model"):
+        response, intro, picks = generator.pick(st.session_state.chat, prompt)
+    record_usage(response)
+    if intro is None:
+        # Garbled picks: apologise, and flag the record so it is never cached, shared or remembered
+        record = RecommendationRecord(raw=GARBLED_PICKS_INTRO, intro=GARBLED_PICKS_INTRO, error=GARBLED_JSON_ERROR)
+        display_recommendations(record)
+        return record
+    if not picks:
+        # The model asked the user a question instead
+        record = parse_response(intro)
+        display_recommendations(record)
+        return record
+
+    # Repeats are dropped before their cards are written, saving those calls too
+    picks = drop_seen(picks)
+    st.markdown(intro)
+    st.subheader("🎬 Your Blockbuster Recommendations 🍿")
+    slots = [st.empty() for _ in picks]
+    started = time.perf_counter()
+    for count, (index, rec) in enumerate(generator.cards(picks, request)):
+        if count == 0 and st.session_state.turn_trace is not None:
+            st.session_state.turn_trace.add("time_to_first_card", time.perf_counter() - started)
+        ground_recommendations([rec])
+        with slots[index].container(), trace_stage("render"):
+            render_recommendation(rec)
+    return build_record(intro, picks)
+
+
+def display_streaming_recommendations(chunks, show_errors=True):
+    """Renders a streamed response incrementally and returns it as a parsed record.
+
+    With show_errors=False a parse failure is left for the caller, e.g. to reprompt.
+    """
+    parser = StreamingRecommendationParser()
+    # Reserve the slot above the cards so the intro keeps growing in place
+    intro_placeholder = st.empty()
+    showed_header = False
+
+    seen = st.session_state.seen_titles if SEEN_TITLES_ENABLED else None
+    repeats = []
+
+    def show_cards(recommendations, skip_seen=True):
+        nonlocal showed_header
+        for rec in ground_recommendations(recommendations):
+            if skip_seen and seen is not None and rec.title in seen:
+                repeats.append(rec) # Dropped from the record by the caller too
+                continue
+            if not showed_header:
+                st.subheader("🎬 Your Blockbuster Recommendations 🍿")
+                showed_header = True
+            render_recommendation(rec)
+
     try:
-        # Split the text into the intro and the JSON block
-        intro_text, json_block = text.split("```json", 1)
-        json_string = json_block.split("```")[0].strip()
-        
-        # Display the introductory text first
-        st.markdown(intro_text)
-        
-        # Parse the JSON
-        data = json.loads(json_string)
-        recommendations = data.get("recommendations", [])
+        for chunk in chunks:
+            with trace_stage("parse"):
+                completed = parser.feed(chunk)
+            with trace_stage("render"):
+                intro_placeholder.markdown(parser.intro)
+                show_cards(completed)
 
-        st.subheader("🎬 Your Blockbuster Recommendations 🍿")
-        
-        # Iterate and display each recommendation in columns
-        for rec in recommendations:
-            st.divider() # Separator for each recommendation
-            
-            # Use columns for layout: Poster (col1) and Details (col2)
-            col1, col2 = st.columns([1, 3], gap="large") 
-            
-            with col1:
-                # Display the poster image (must be a public URL)
-                st.image(rec.get("poster_url", "[https://via.placeholder.com/200x300?text=Poster+Missing](https://via.placeholder.com/200x300?text=Poster+Missing)"), 
-                         caption=f"IMDb: {rec.get('imdb_rating', 'N/A')}", 
-                         use_container_width="auto")
-            
-            with col2:
-                st.markdown(f"## {rec.get('title', 'Unknown Title')}")
-                st.markdown(f"**IMDb Rating:** {rec.get('imdb_rating', 'N/A')}")
-                st.markdown(f"**Synopsis:** {rec.get('synopsis', 'No synopsis provided.')}")
-                st.markdown("---")
-                # Ensure the critic review text is bold for emphasis
-                st.markdown(f"**Critic's Review:** *{rec.get('critic_review', 'The critic remains silent... for now.')}*")
-        
-    except json.JSONDecodeError:
-        st.error("🤖 Bot Error: I tried to provide a structured recommendation but the data was garbled. Sorry about that! Here is the raw output:")
-        st.code(text)
+        with trace_stage("parse"):
+            remaining = parser.finish()
+            record = parser.to_record()
+        with trace_stage("render"):
+            show_cards(remaining)
+            if repeats and not showed_header:
+                # Nothing but repeats: showing them beats an empty list (drop_seen keeps them too)
+                show_cards(repeats, skip_seen=False)
+            intro_placeholder.markdown(parser.intro)
+    except GeminiError:
+        raise
     except Exception as e:
-        st.error(f"An unexpected error occurred: {e}. Here is the raw output:")
-        st.code(text)
+        record = parser.to_record()
+        record.error = str(e)
+
+    if record.error and show_errors:
+        display_record_error(record)
+    return record
+
+
+def finish_turn():
+    """Closes the current turn's trace and hands it to telemetry."""
+    trace = st.session_state.turn_trace
+    st.session_state.turn_trace = None
+    st.session_state.last_trace = trace.to_dict()
+    get_telemetry().record(trace)
+    if trace.route is not None:
+        get_router().record(trace.route, time.time() - trace.started_at, trace.input_tokens, trace.output_tokens)
+    save_session()
+
+
+def render_dev_panel():
+    """Shows per-turn timings, token counts and cache/client stats for developers."""
+    with st.expander("🛠️ Developer panel"):
+        last_trace = st.session_state.get("last_trace")
+        if last_trace:
+            st.markdown("**Last turn (ms)**")
+            st.table({stage: [f"{ms:.1f}"] for stage, ms in last_trace["stages_ms"].items()})
+            if last_trace["prompt_tokens"]:
+                st.caption("Estimated input tokens by component: " + " · ".join(
+                    f"{component} {tokens}" for component, tokens in last_trace["prompt_tokens"].items()))
+            st.caption(f"Input tokens: {last_trace['input_tokens']} · output tokens: {last_trace['output_tokens']} · "
+                       f"cache hit: {last_trace['cache_hit']} · parse failure: {last_trace['parse_failure']}")
+
+        cache_stats = get_response_cache().stats()
+        st.caption(f"Cache hit rate: {cache_stats['hit_rate']:.0%} "
+                   f"({cache_stats['hits']} hits / {cache_stats['misses']} misses)")
+
+        if WARM_CACHE_ENABLED:
+            warm_stats = get_warm_cache().stats()
+            st.caption(f"Warm set: {warm_stats['served_rate']:.0%} of first turns served · "
+                       f"{warm_stats['fresh_entries']}/{warm_stats['total_slots']} fresh · "
+                       f"{warm_stats['refreshed']} refreshed · {warm_stats['failed']} failed")
+
+        if ROUTING_ENABLED and get_router().stats():
+            st.markdown("**Routes**")
+            st.table({
+                route: [stats["turns"], f"{stats['latency_p50_ms']:.0f}", f"{stats['latency_p95_ms']:.0f}",
+                        stats["tokens"], f"${stats['cost_usd']:.4f}"]
+                for route, stats in get_router().stats().items()
+            })
+            st.caption("Per route: turns · p50 ms · p95 ms · tokens · estimated cost")
+
+        prefetch_stats = get_prefetcher().stats()
+        st.caption(f"Prefetch hit rate: {prefetch_stats['hit_rate']:.0%} · "
+                   f"{prefetch_stats['scheduled']} prefetched · {prefetch_stats['wasted']} wasted "
+                   f"({prefetch_stats['waste_rate']:.0%}) · {prefetch_stats['failed']} failed")
+
+        if SEEN_TITLES_ENABLED:
+            seen = st.session_state.seen_titles
+            st.caption(f"Seen titles: {len(seen)} ({'Bloom filter' if seen.bloom is not None else 'exact'}) · "
+                       f"{seen.filtered} repeats dropped · {seen.regenerations_saved} regenerations saved")
+
+        memory = st.session_state.memory
+        st.caption(f"History ≈ {memory.history_tokens()} tokens · {memory.folded_turns} turns summarized")
+        input_tokens = memory.input_token_counts()
+        if any(count is not None for count in input_tokens):
+            st.markdown("**Input tokens per turn**")
+            st.line_chart({"input tokens": input_tokens})
+
+        client_stats = get_gemini_client().metrics.summary()
+        st.caption(f"Gemini p50 latency: {client_stats['latency_p50_ms']:.0f} ms · "
+                   f"queue wait p95: {client_stats['queue_wait_p95_ms']:.0f} ms · "
+                   f"{client_stats['retries']} retries · {client_stats['failures']} failures")
+
+        counters = get_telemetry().counters
+        st.caption(f"Process totals: {counters['turns_total']} turns · "
+                   f"{counters['parse_failures_total']} parse failures · {counters['errors_total']} errors · "
+                   f"{counters['regenerations_saved_total']} regenerations saved · "
+                   f"{counters['coalesced_total']} coalesced across replicas")
 
 
 def main():
     st.title("The Blockbuster Bot")
 
     # Initialization now creates the chat object
-    # NOTE: Since system instructions can't be passed at init, 
-    # we rely on the very first prompt to contain the persona_instructions.
     initialize_session_state()
 
     # ---------------- Sidebar (Recent Blockbusters & Mood) ----------------
     with st.sidebar:
         st.title("Top Picks Now Showing")
         
-        # Display mock recent blockbusters
-        for movie in recent_blockbusters:
+        # Display the newest, best-rated titles from the catalog
+        top_picks = get_top_picks(3)
+        posters = get_poster_cache().get_many([movie.poster_url for movie in top_picks])
+        for movie, poster in zip(top_picks, posters):
             st.markdown("---")
-            st.subheader(movie["Title"])
-            st.image(movie["PosterURL"], caption=f"IMDb: {movie['IMDb']}/10", use_container_width=True)
+            st.subheader(movie.title)
+            st.image(poster, caption=f"IMDb: {movie.imdb_rating:.1f}/10", use_container_width=True)
         
         st.markdown("---")
         # Keep the mood slider to provide context to the bot
         current_mood = st.select_slider("My Current Mood is:", 
                                         options=["Very Sad", "Sad", "Okay", "Happy", "Very Happy"], 
                                         value=st.session_state.get("mood", "Okay"))
+        mood_changed = current_mood != st.session_state.mood
         st.session_state.mood = current_mood # Update session state
+        if mood_changed and st.session_state.next_message_seq:
+            save_session()
+
+        if DEV_PANEL or st.query_params.get("dev") == "1":
+            render_dev_panel()
 
     # ---------------- Chat History Display ----------------
     user_emoji = "👤"
     robot_img = "🎬"
 
-    for message in st.session_state.messages:
+    # Reconnected sessions only load their latest messages; older ones are fetched on demand
+    if st.session_state.oldest_loaded_seq > 0 and st.button("Show earlier messages"):
+        load_earlier_messages()
+
+    messages = st.session_state.messages
+    full_from = len(messages) - 2 * RENDER_FULL_TURNS
+    for i, message in enumerate(messages):
         # Determine if the message role is 'assistant' and needs structured display
         if message["role"] == "assistant":
             with st.chat_message("assistant", avatar=robot_img):
-                # Pass the content to the smart display function
-                display_recommendations(message["content"])
+                # Replies are parsed once when they arrive; older entries are parsed on first display
+                record = message.get("record")
+                if record is None:
+                    record = message["record"] = parse_response(message["content"])
+                if i < full_from and record.recommendations and not record.error:
+                    # Keyed by the stored sequence number so loading earlier pages keeps the toggles
+                    display_collapsed_recommendations(record, st.session_state.oldest_loaded_seq + i)
+                else:
+                    display_recommendations(record)
         else:
             with st.chat_message("user", avatar=user_emoji):
                 st.write(message["content"])
@@ -181,16 +952,41 @@ def main():
     # ---------------- Chat Input ----------------
     # Use the current mood to suggest a starting prompt
     input_placeholder = f"I'm feeling {st.session_state.mood}. Recommend a crime thriller!"
-    if prompt := st.chat_input(input_placeholder):
-        
-        # ***CRITICAL FIX HERE***: Prepend the persona instructions to the *first* prompt
-        # if the chat is new. This acts as the System Instruction substitute.
+    follow_up_slot = st.empty()
+    with follow_up_slot.container():
+        follow_up = render_follow_ups()
+    if prompt := st.chat_input(input_placeholder) or follow_up:
+        # The suggestions belong to the previous reply
+        follow_up_slot.empty()
+        st.session_state.follow_ups = []
         
-        full_prompt = f"My current mood is '{st.session_state.mood}'. User request: {prompt}"
-        
-        # Only prepend persona instructions if this is the first real user message
-        if len(st.session_state.messages) == 1 and st.session_state.messages[0]["role"] == "assistant":
-             full_prompt = persona_instructions + "\n\n---START OF USER REQUEST---\n\n" + full_prompt
+        # Time every stage of this turn for the telemetry log
+        trace = st.session_state.turn_trace = TurnTrace(st.session_state.session_id)
+        prompt_started = time.perf_counter()
+
+        memory = st.session_state.memory
+        is_first_turn = not memory.turns and not memory.folded_turns
+        # A canned greeting or thank-you before it doesn't change the reply, so the first request
+        # after one can still come from (and go into) the first-turn caches. Anything a model
+        # answered (chit-chat, a clarifying question) does, so it ends the first request.
+        is_first_request = memory.model_turns == 0
+        built = build_prompt(prompt, st.session_state.mood, is_first_turn, history_tokens=memory.history_tokens())
+        turn_prompt, full_prompt = built.turn_prompt, built.text
+        trace.prompt_tokens = built.tokens
+        trace.add("prompt_build", time.perf_counter() - prompt_started)
+
+        # First requests don't depend on earlier history, so they can come from the warm set or share a reply
+        warm_record = None
+        if is_first_request and WARM_CACHE_ENABLED:
+            with trace.stage("warm_lookup"):
+                warm_record = get_warm_cache().get(prompt, st.session_state.mood)
+        trace.warm_hit = warm_record is not None
+        response_cache = get_response_cache()
+        with trace.stage("cache_lookup"):
+            cached_response = (
+                response_cache.get(prompt, st.session_state.mood) if is_first_request and warm_record is None else None
+            )
+        trace.cache_hit = cached_response is not None
 
         # 1. Show user’s message (using the original prompt text for clarity)
         with st.chat_message("user", avatar=user_emoji):
@@ -199,17 +995,153 @@ def main():
         # 2. Add user message to history (original prompt)
         st.session_state.messages.append({"role": "user", "content": prompt})
 
-        # 3. Generate bot response
-        with st.spinner('Thinking up some critically-acclaimed genius...'):
-            # Pass the augmented (or regular) prompt to the chat session
-            response = get_gemini_response(full_prompt)
+        # 3. Generate and show bot response, answering locally when the caches or index can
+        if warm_record is not None:
+            local_record = warm_record
+        elif cached_response is not None:
+            with trace.stage("parse"):
+                local_record = parse_response(cached_response)
+                ground_recommendations(local_record.recommendations)
+        else:
+            with st.spinner('Digging through the archives...'), trace.stage("similarity"):
+                local_record = answer_more_like(prompt)
+        if local_record is None and PREFETCH_FOLLOW_UPS:
+            # A follow-up predicted last turn may already be answered (or on its way)
+            with trace.stage("prefetch_lookup"):
+                prefetched = get_prefetcher().take(
+                    st.session_state.session_id, prompt, st.session_state.mood, timeout=GEMINI_TIMEOUT_SECONDS
+                )
+            if prefetched is not None:
+                trace.prefetch_hit = True
+                with trace.stage("parse"):
+                    local_record = parse_response(prefetched)
+                    ground_recommendations(local_record.recommendations)
+        if PREFETCH_FOLLOW_UPS:
+            get_prefetcher().discard(st.session_state.session_id)
+
+        if local_record is None and ROUTING_ENABLED:
+            # Only recommendation requests need the main model
+            intent, trace.route = get_router().route(prompt)
+            if trace.route == "canned":
+                local_record = parse_response(get_router().canned_reply(intent))
+            elif trace.route == "lite":
+                try:
+                    with st.spinner('Thinking...'):
+                        local_record = parse_response(get_lite_response(full_prompt))
+                except GeminiError:
+                    trace.route = "main" # Fall back to the main model below
+
+        # The same first request arriving at several replicas at once is answered by one model call
+        flight_key = None
+        if local_record is None and is_first_request and get_singleflight() is not None:
+            key = make_cache_key(prompt, st.session_state.mood)
+            with st.spinner('Digging through the archives...'), trace.stage("singleflight"):
+                leader, shared_response = get_singleflight().join(key, timeout=GEMINI_TIMEOUT_SECONDS)
+            if leader:
+                flight_key = key
+            elif shared_response is not None:
+                trace.coalesced = True
+                with trace.stage("parse"):
+                    local_record = parse_response(shared_response)
+                    ground_recommendations(local_record.recommendations)
+
+        parsed = None # The model's reply before repeats were dropped, when it can be reprompted
+        streamed = None # The slot a streamed reply was rendered into, cleared if it is reprompted
+        try:
+            if local_record is not None:
+                record = drop_seen_titles(local_record)
+                if trace.route != "lite":
+                    st.session_state.last_input_tokens = trace.input_tokens = 0
+
+                # 4. Show assistant’s message without a chat round trip
+                with st.chat_message("assistant", avatar=robot_img), trace.stage("render"):
+                    display_recommendations(record)
+            elif FANOUT_CARDS:
+                # 4. Pick titles, then fill in every card in parallel
+                with st.chat_message("assistant", avatar=robot_img):
+                    record = display_fanout_recommendations(full_prompt, prompt)
+            elif STREAM_RESPONSES:
+                # 4. Stream the assistant’s message into the bubble as it is generated
+                streamed = st.empty()
+                with streamed.container(), st.chat_message("assistant", avatar=robot_img):
+                    parsed = display_streaming_recommendations(
+                        stream_gemini_response(full_prompt), show_errors=not STRUCTURED_OUTPUT
+                    )
+                record = drop_seen_titles(parsed)
+            else:
+                with st.spinner('Thinking up some critically-acclaimed genius...'):
+                    # Pass the augmented (or regular) prompt to the chat session
+                    response_text = get_gemini_response(full_prompt)
+                with trace.stage("parse"):
+                    parsed = parse_response(response_text)
+                    record = drop_seen_titles(parsed)
+                    ground_recommendations(record.recommendations)
+
+                # 4. Show assistant’s message (a garbled structured reply is reprompted below instead)
+                if not (STRUCTURED_OUTPUT and needs_reprompt(parsed)):
+                    with st.chat_message("assistant", avatar=robot_img), trace.stage("render"):
+                        display_recommendations(record)
+
+            if STRUCTURED_OUTPUT and parsed is not None and needs_reprompt(parsed):
+                # Structured output should never be garbled or cut short: ask once more before giving up
+                trace.parse_failure = trace.reprompted = True
+                with st.spinner('Straightening out my notes...'):
+                    response_text = get_gemini_response(REPROMPT_MESSAGE)
+                with trace.stage("parse"):
+                    record = drop_seen_titles(parse_response(response_text))
+                    ground_recommendations(record.recommendations)
+                if streamed is not None:
+                    streamed.empty() # The cut-off attempt's partial cards make way for the new reply
+                with st.chat_message("assistant", avatar=robot_img), trace.stage("render"):
+                    display_recommendations(record)
+        except GeminiError as e:
+            # The model call failed for good: apologise and keep the turn out of memory and the cache
+            apology = f"🤖 Bot Error: the critics' hotline is jammed right now ({e}). Please try again in a moment!"
+            with st.chat_message("assistant", avatar=robot_img):
+                st.error(apology)
+            rebuild_chat()
+            if flight_key is not None:
+                get_singleflight().abandon(flight_key)
+            st.session_state.messages.append({"role": "assistant", "content": apology, "record": parse_response(apology)})
+            trace.error = str(e)
+            finish_turn()
+            return
+
+        response = record.raw
+        # A repaired reply may be missing cards, so it is not worth serving again
+        clean = bool(response.strip()) and not record.error and not record.repaired
+        if is_first_request and local_record is None and clean:
+            response_cache.set(prompt, st.session_state.mood, response)
+        if flight_key is not None:
+            # Hand the reply to the replicas waiting on it, or let one of them try instead
+            if clean:
+                get_singleflight().complete(flight_key, response)
+            else:
+                get_singleflight().abandon(flight_key)
+
+        # Record the turn and keep the chat history inside the token budget (a fan-out turn
+        # whose title picks came back garbled only showed an apology, so it is left out)
+        if not (FANOUT_CARDS and record.error):
+            memory.add_turn(turn_prompt, response,
+                            titles=[rec.title for rec in record.recommendations],
+                            input_tokens=st.session_state.last_input_tokens, canned=trace.route == "canned")
+        # A locally answered turn never reached the chat object, a reprompted one left the
+        # garbled exchange in it and a fanned-out one only holds the title picks, so all of
+        # them have to be rebuilt from memory too
+        if memory.compact() or local_record is not None or trace.reprompted or FANOUT_CARDS:
+            rebuild_chat()
+
+        # 5. Add assistant message (full response text and its parsed record) to history
+        st.session_state.messages.append({"role": "assistant", "content": response, "record": record})
+
+        if SEEN_TITLES_ENABLED:
+            st.session_state.seen_titles.add(rec.title for rec in record.recommendations)
 
-        # 4. Show assistant’s message
-        with st.chat_message("assistant", avatar=robot_img):
-            display_recommendations(response)
+        if PREFETCH_FOLLOW_UPS and record.recommendations:
+            schedule_follow_ups(prompt, record)
 
-        # 5. Add assistant message (full response text) to history
-        st.session_state.messages.append({"role": "assistant", "content": response})
+        trace.parse_failure = trace.parse_failure or record.error is not None
+        finish_turn()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,187 @@
+import re
+from collections import defaultdict
+from pathlib import Path
+
+import pandas as pd
+
+# --- Text Helpers ---
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = {
+    "a", "an", "and", "the", "of", "to", "in", "on", "for", "with", "his", "her", "their",
+    "is", "are", "be", "as", "at", "by", "from", "into", "who", "that", "it", "its", "me",
+    "i", "im", "my", "you", "some", "something", "recommend", "want", "watch", "feeling",
+    "movie", "movies", "show", "shows", "film", "films", "like", "please", "good",
+}
+
+# Everyday words users type, mapped to the genre names used in the catalog
+GENRE_ALIASES = {
+    "sci fi": "Sci-Fi", "scifi": "Sci-Fi", "science fiction": "Sci-Fi",
+    "rom com": "Romance", "romcom": "Romance", "romantic": "Romance", "love story": "Romance",
+    "funny": "Comedy", "comedies": "Comedy", "scary": "Horror", "creepy": "Horror",
+    "animated": "Animation", "cartoon": "Animation", "kids": "Family",
+    "detective": "Mystery", "whodunit": "Mystery", "suspense": "Thriller",
+    "thrillers": "Thriller", "biopic": "Biography", "musical": "Music",
+}
+
+DECADE_PATTERN = re.compile(r"\b(?:19|20)?(\d)0'?s\b")
+YEAR_PATTERN = re.compile(r"\b(19\d\d|20\d\d)\b")
+
+
+def tokenize(text):
+    """Splits text into lowercase word tokens without stopwords."""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def normalize_title(title):
+    """Normalizes a title for lookups ("The Dark Knight!" -> "the dark knight")."""
+    return " ".join(TOKEN_PATTERN.findall(title.lower()))
+
+
+def parse_rating(value):
+    """Parses ratings such as 8.2, "8.2" or "8.2/10" into a float (None if unparseable)."""
+    match = re.search(r"\d+(?:\.\d+)?", str(value))
+    return float(match.group()) if match else None
+
+
+# --- Catalog ---
+
+
+class MovieCatalog:
+    """A local title dataset with genre, year, rating and synopsis indexes.
+
+    Expected columns: title, year, kind, genres ("|"-separated), imdb_rating, synopsis,
+    poster_url.
+    """
+
+    def __init__(self, frame):
+        frame = frame.reset_index(drop=True)
+        frame["genres"] = frame["genres"].fillna("")
+        frame["synopsis"] = frame["synopsis"].fillna("")
+        frame["poster_url"] = frame["poster_url"].fillna("")
+        frame["imdb_rating"] = frame["imdb_rating"].map(parse_rating)
+        self.frame = frame
+
+        self.genre_index = defaultdict(set)
+        self.year_index = defaultdict(set)
+        self.text_index = defaultdict(set)
+        self.title_index = {}
+        for row_id, row in enumerate(frame.itertuples(index=False)):
+            for genre in filter(None, row.genres.split("|")):
+                self.genre_index[genre].add(row_id)
+            self.year_index[int(row.year)].add(row_id)
+            for token in set(tokenize(f"{row.title} {row.synopsis}")):
+                self.text_index[token].add(row_id)
+            self.title_index[normalize_title(row.title)] = row_id
+
+        # Row ids ordered best-rated first, used to rank and for rating cut-offs
+        self.by_rating = frame["imdb_rating"].sort_values(ascending=False, na_position="last").index.tolist()
+        self._genre_lookup = {genre.lower(): genre for genre in self.genre_index}
+
+    @classmethod
+    def load(cls, path):
+        """Loads a catalog from a CSV or Parquet file."""
+        path = Path(path)
+        if path.suffix == ".parquet":
+            frame = pd.read_parquet(path)
+        else:
+            frame = pd.read_csv(path)
+        return cls(frame)
+
+    def __len__(self):
+        return len(self.frame)
+
+    # --- Queries ---
+
+    def detect_genres(self, text):
+        """Returns the catalog genres mentioned in free text."""
+        words = " ".join(TOKEN_PATTERN.findall(text.lower()))
+        found = []
+        for word, genre in list(self._genre_lookup.items()) + list(GENRE_ALIASES.items()):
+            canonical = self._genre_lookup.get(genre.lower(), genre)
+            if canonical in self.genre_index and re.search(rf"\b{re.escape(word)}s?\b", words) and canonical not in found:
+                found.append(canonical)
+        return found
+
+    def detect_years(self, text):
+        """Returns an inclusive (start, end) year range mentioned in free text, or None."""
+        year = YEAR_PATTERN.search(text)
+        if year:
+            return int(year.group(1)), int(year.group(1))
+        decade = DECADE_PATTERN.search(text.lower())
+        if decade:
+            digit = int(decade.group(1))
+            start = (1900 if digit >= 3 else 2000) + digit * 10
+            return start, start + 9
+        return None
+
+    def search(self, genres=(), years=None, min_rating=None, text="", limit=8):
+        """Returns the best matching titles as a DataFrame, ranked by text match then rating."""
+        candidates = None
+        for genre in genres:
+            rows = self.genre_index.get(genre, set())
+            candidates = set(rows) if candidates is None else candidates & rows
+        if years is not None:
+            rows = set()
+            for year in range(years[0], years[1] + 1):
+                rows |= self.year_index.get(year, set())
+            candidates = rows if candidates is None else candidates & rows
+
+        scores = defaultdict(int)
+        for token in tokenize(text):
+            for row_id in self.text_index.get(token, ()):
+                scores[row_id] += 1
+        if candidates is None:
+            candidates = set(scores)
+
+        ranked = []
+        for position, row_id in enumerate(self.by_rating):
+            if row_id not in candidates:
+                continue
+            rating = self.frame.at[row_id, "imdb_rating"]
+            if min_rating is not None and (pd.isna(rating) or rating < min_rating):
+                continue
+            ranked.append((-scores.get(row_id, 0), position, row_id))
+        ranked.sort()
+        return self.frame.loc[[row_id for _, _, row_id in ranked[:limit]]]
+
+    def candidates_for_prompt(self, prompt, limit=8):
+        """Pre-filters titles that fit a user request; empty when the request names no genre or era."""
+        genres = self.detect_genres(prompt)
+        years = self.detect_years(prompt)
+        if not genres and years is None:
+            return self.frame.iloc[0:0]
+        return self.search(genres=genres, years=years, text=prompt, limit=limit)
+
+    def lookup(self, title):
+        """Returns the catalog row for a title, or None if it isn't in the catalog."""
+        row_id = self.title_index.get(normalize_title(title))
+        return None if row_id is None else self.frame.loc[row_id]
+
+    def top_picks(self, count=3):
+        """Returns the newest, best-rated titles for the "now showing" sidebar, those with a poster first."""
+        ranked = self.frame.assign(has_poster=self.frame["poster_url"] != "")
+        return ranked.sort_values(["has_poster", "year", "imdb_rating"], ascending=False).head(count)[self.frame.columns]
+
+    def ground(self, rec):
+        """Replaces a recommendation's rating (and missing poster) with catalog data when known."""
+        row = self.lookup(rec.title)
+        if row is None:
+            return rec
+        if pd.notna(row["imdb_rating"]):
+            rec.imdb_rating = f"{row['imdb_rating']:.1f}/10"
+        if row["poster_url"] and not rec.poster_url:
+            rec.poster_url = row["poster_url"]
+        return rec
+
+
+def format_candidates(frame):
+    """Formats candidate titles as a short prompt section for Gemini."""
+    lines = [
+        "Candidate titles from our catalog (prefer these and use these IMDb ratings):",
+    ]
+    for row in frame.itertuples(index=False):
+        genres = row.genres.replace("|", ", ")
+        lines.append(f"- {row.title} ({row.year}, {row.kind}; {genres}) - IMDb {row.imdb_rating:.1f}/10")
+    return "\n".join(lines)
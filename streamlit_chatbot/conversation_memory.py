@@ -0,0 +1,143 @@
+from dataclasses import dataclass, field
+
+# Summary lines are trimmed, and only the latest ones kept, so the rolling summary itself stays small
+MAX_TASTE_CHARS = 160
+MAX_TASTES = 10
+MAX_RECOMMENDED_TITLES = 50
+
+# Per-turn input token counts kept for the developer panel
+MAX_TOKEN_COUNTS = 100
+
+
+def estimate_tokens(text):
+    """Cheap local token estimate (roughly four characters per token for English text)."""
+    return max(1, len(text) // 4)
+
+
+@dataclass(slots=True)
+class Turn:
+    """One user request and the model's reply, kept verbatim."""
+    user: str
+    model: str
+    titles: tuple = ()
+    input_tokens: int | None = None
+
+
+@dataclass
+class ConversationMemory:
+    """Keeps the chat history inside a token budget.
+
+    The last keep_turns turns are kept verbatim. Older turns are folded into a rolling
+    summary of the user's latest stated tastes and the titles already recommended, and the
+    Gemini chat history is rebuilt from the preamble, that summary and the recent turns.
+    model_turns counts the turns whose reply could depend on the conversation, i.e. all
+    but the canned ones (fixed greetings and thank-yous).
+    """
+    preamble: str
+    token_budget: int = 8000
+    keep_turns: int = 3
+    count_tokens: object = estimate_tokens
+    turns: list = field(default_factory=list)
+    tastes: list = field(default_factory=list)
+    recommended_titles: list = field(default_factory=list)
+    folded_turns: int = 0
+    turn_input_tokens: list = field(default_factory=list)
+    model_turns: int = 0
+
+    def add_turn(self, user_text, model_text, titles=(), input_tokens=None, canned=False):
+        """Records a finished turn along with the input tokens it cost, if known."""
+        self.turns.append(Turn(user_text, model_text, tuple(titles), input_tokens))
+        if not canned:
+            self.model_turns += 1
+        self.turn_input_tokens.append(input_tokens)
+        del self.turn_input_tokens[:-MAX_TOKEN_COUNTS]
+
+    def summary(self):
+        """Returns the rolling summary of folded turns, or an empty string."""
+        if not self.tastes and not self.recommended_titles:
+            return ""
+        lines = ["Summary of our earlier conversation:"]
+        if self.tastes:
+            lines.append("The user previously asked for:")
+            lines.extend(f"- {taste}" for taste in self.tastes)
+        if self.recommended_titles:
+            lines.append("Already recommended (do not repeat): " + ", ".join(self.recommended_titles))
+        return "\n".join(lines)
+
+    def history_tokens(self):
+        """Estimates the input tokens the rebuilt history would cost on the next turn."""
+        total = self.count_tokens(self.preamble) if self.preamble else 0
+        summary = self.summary()
+        if summary:
+            total += self.count_tokens(summary)
+        for turn in self.turns:
+            total += self.count_tokens(turn.user) + self.count_tokens(turn.model)
+        return total
+
+    def compact(self):
+        """Folds the oldest turns into the summary while over budget; returns True if any were folded."""
+        folded = False
+        while len(self.turns) > self.keep_turns and self.history_tokens() > self.token_budget:
+            self._fold(self.turns.pop(0))
+            folded = True
+        return folded
+
+    def _fold(self, turn):
+        taste = " ".join(turn.user.split())
+        if len(taste) > MAX_TASTE_CHARS:
+            taste = taste[:MAX_TASTE_CHARS - 3] + "..."
+        self.tastes.append(taste)
+        del self.tastes[:-MAX_TASTES]
+        for title in turn.titles:
+            if title not in self.recommended_titles:
+                self.recommended_titles.append(title)
+        del self.recommended_titles[:-MAX_RECOMMENDED_TITLES]
+        self.folded_turns += 1
+
+    def build_history(self):
+        """Returns the chat history (Gemini content dicts) to start a fresh chat from."""
+        # An empty preamble means the persona travels as the system instruction instead
+        opening = "\n\n".join(part for part in (self.preamble, self.summary()) if part)
+        history = []
+        if opening:
+            history = [
+                {"role": "user", "parts": [opening]},
+                {"role": "model", "parts": ["Understood. I'm ready for the user's next request."]},
+            ]
+        for turn in self.turns:
+            history.append({"role": "user", "parts": [turn.user]})
+            history.append({"role": "model", "parts": [turn.model]})
+        return history
+
+    def to_dict(self):
+        """Returns the compacted state (everything except the preamble) as plain JSON data."""
+        return {
+            "turns": [
+                {"user": t.user, "model": t.model, "titles": list(t.titles), "input_tokens": t.input_tokens}
+                for t in self.turns
+            ],
+            "tastes": list(self.tastes),
+            "recommended_titles": list(self.recommended_titles),
+            "folded_turns": self.folded_turns,
+            "turn_input_tokens": list(self.turn_input_tokens),
+            "model_turns": self.model_turns,
+        }
+
+    @classmethod
+    def from_dict(cls, data, preamble, **kwargs):
+        """Restores a memory saved with to_dict; the preamble comes from the current code."""
+        memory = cls(preamble, **kwargs)
+        memory.turns = [
+            Turn(t["user"], t["model"], tuple(t.get("titles", ())), t.get("input_tokens")) for t in data.get("turns", [])
+        ]
+        memory.tastes = list(data.get("tastes", []))
+        memory.recommended_titles = list(data.get("recommended_titles", []))
+        memory.folded_turns = data.get("folded_turns", 0)
+        memory.turn_input_tokens = list(data.get("turn_input_tokens", []))[-MAX_TOKEN_COUNTS:]
+        # Saves from before model_turns was tracked count every turn, to be safe
+        memory.model_turns = data.get("model_turns", len(memory.turns) + memory.folded_turns)
+        return memory
+
+    def input_token_counts(self):
+        """Returns the input tokens recorded for the latest turns (None where unknown), oldest first."""
+        return list(self.turn_input_tokens)
@@ -0,0 +1,194 @@
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+
+def connect(path):
+    """Opens a SQLite database for sharing between server processes (WAL, waits on locks)."""
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class _SharedTable:
+    """Base for state kept in a SQLite file that every replica on the host opens."""
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = connect(path)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so read-modify-write cycles from
+        # different processes can't interleave
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+
+# --- Rate Limiting ---
+
+
+class SharedTokenBucket(_SharedTable):
+    """A token bucket whose tokens live in SQLite, so every process drawing from it shares one quota.
+
+    Same interface as rate_limit.TokenBucket. Refills use wall-clock time, which is the
+    one clock all processes on a host agree on.
+    """
+
+    def __init__(self, path, name, rate, capacity=None, clock=time.time, sleep=time.sleep):
+        super().__init__(path)
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._clock = clock
+        self._sleep = sleep
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS token_buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "INSERT OR IGNORE INTO token_buckets (name, tokens, updated) VALUES (?, ?, ?)",
+            (name, self.capacity, clock()),
+        )
+
+    def _take(self, tokens):
+        """Takes tokens if available; returns 0 on success, else the seconds until they will be."""
+        with self._transaction() as conn:
+            available, updated = conn.execute(
+                "SELECT tokens, updated FROM token_buckets WHERE name = ?", (self.name,)
+            ).fetchone()
+            now = self._clock()
+            available = min(self.capacity, available + max(0.0, now - updated) * self.rate)
+            wait = 0.0
+            if available >= tokens:
+                available -= tokens
+            else:
+                wait = (tokens - available) / self.rate
+            conn.execute(
+                "UPDATE token_buckets SET tokens = ?, updated = ? WHERE name = ?", (available, now, self.name)
+            )
+        return wait
+
+    def try_acquire(self, tokens=1):
+        """Takes tokens if they are available right now; returns whether it did."""
+        return self._take(tokens) == 0
+
+    def acquire(self, tokens=1, timeout=None):
+        """Waits until tokens are available and takes them; returns False if timeout ran out first."""
+        deadline = None if timeout is None else self._clock() + timeout
+        while True:
+            wait = self._take(tokens)
+            if not wait:
+                return True
+            if deadline is not None and self._clock() + wait > deadline:
+                return False
+            self._sleep(wait)
+
+
+# --- Request Coalescing ---
+
+
+class Singleflight(_SharedTable):
+    """Coalesces identical in-flight requests across processes: one leader runs, the rest wait.
+
+    The first process to claim a key leads and must complete() it with the result (or
+    abandon() it on failure); the others poll for that result. A leader that dies without
+    doing either loses its claim after lease_seconds. Results stay readable for result_ttl
+    seconds, which covers followers that arrive just after the leader finished.
+    """
+
+    def __init__(self, path, lease_seconds=60, result_ttl=30, poll_interval=0.05, clock=time.time, sleep=time.sleep):
+        super().__init__(path)
+        self.lease_seconds = lease_seconds
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self.owner = uuid.uuid4().hex
+        self._clock = clock
+        self._sleep = sleep
+        self.led = 0
+        self.coalesced = 0
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS flights ("
+            "key TEXT PRIMARY KEY, owner TEXT NOT NULL, lease_until REAL NOT NULL, value TEXT, done_at REAL)"
+        )
+
+    def claim(self, key):
+        """Makes this process the leader for key unless another live leader or fresh result exists."""
+        with self._transaction() as conn:
+            now = self._clock()
+            conn.execute("DELETE FROM flights WHERE done_at < ?", (now - self.result_ttl,))
+            row = conn.execute("SELECT lease_until, value FROM flights WHERE key = ?", (key,)).fetchone()
+            if row is not None and (row[1] is not None or row[0] > now):
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO flights (key, owner, lease_until, value, done_at) VALUES (?, ?, ?, NULL, NULL)",
+                (key, self.owner, now + self.lease_seconds),
+            )
+        self.led += 1
+        return True
+
+    def complete(self, key, value):
+        """Publishes the leader's result to every waiting process."""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE flights SET value = ?, done_at = ? WHERE key = ? AND owner = ?",
+                (value, self._clock(), key, self.owner),
+            )
+
+    def abandon(self, key):
+        """Gives up the lead on key, so a waiting process can take over right away."""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM flights WHERE key = ? AND owner = ? AND value IS NULL", (key, self.owner))
+
+    def wait(self, key, timeout):
+        """Polls for another process's result; None if its leader went away or timeout ran out."""
+        deadline = self._clock() + timeout
+        while True:
+            with self._lock:
+                row = self._conn.execute("SELECT lease_until, value FROM flights WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[1] is not None:
+                self.coalesced += 1
+                return row[1]
+            now = self._clock()
+            if row is None or row[0] <= now or now >= deadline:
+                return None
+            self._sleep(min(self.poll_interval, deadline - now))
+
+    def join(self, key, timeout):
+        """Returns (is_leader, result): lead the request, or the result another process produced.
+
+        (False, None) means another leader is still running after timeout; the caller
+        should then just make the request itself.
+        """
+        deadline = self._clock() + timeout
+        while self._clock() < deadline:
+            if self.claim(key):
+                return True, None
+            value = self.wait(key, deadline - self._clock())
+            if value is not None:
+                return False, value
+        return False, None
+
+    def do(self, key, fn, timeout=60):
+        """Returns (fn() or the identical call's result from another process, whether it was shared)."""
+        leader, value = self.join(key, timeout)
+        if value is not None:
+            return value, True
+        if not leader:
+            return fn(), False
+        try:
+            value = fn()
+        except BaseException:
+            self.abandon(key)
+            raise
+        self.complete(key, value)
+        return value, False
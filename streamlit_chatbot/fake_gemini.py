@@ -0,0 +1,190 @@
+"""A deterministic, offline stand-in for google.generativeai models and chat sessions.
+
+It mimics the parts of the SDK the bot uses (start_chat, send_message, generate_content,
+streaming chunks and usage_metadata) so the client layer and benchmarks can run without
+network access or an API key.
+"""
+import hashlib
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+from conversation_memory import estimate_tokens
+
+FAKE_TITLES = [
+    ("Heat", "8.3/10"), ("Se7en", "8.6/10"), ("Zodiac", "7.7/10"), ("Prisoners", "8.1/10"),
+    ("Knives Out", "7.9/10"), ("Arrival", "7.9/10"), ("Paddington 2", "7.8/10"),
+    ("Coco", "8.4/10"), ("Get Out", "7.8/10"), ("Past Lives", "7.8/10"),
+    ("Fargo", "8.9/10"), ("The Bear", "8.5/10"),
+]
+
+# Response shapes: a five-title recommendation, a clarifying question, or broken JSON
+SHAPES = ("recommendations", "question", "garbled")
+
+
+class FakeAPIError(Exception):
+    """An API error carrying an HTTP status code, like google.api_core exceptions do."""
+
+    def __init__(self, code, message="fake API error"):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+def wants_json(generation_config):
+    """Returns True when a call asked for structured (JSON) output."""
+    return bool(generation_config) and generation_config.get("response_mime_type") == "application/json"
+
+
+def schema_fields(generation_config):
+    """Returns the field names of a call's response schema (empty without one)."""
+    schema = (generation_config or {}).get("response_schema")
+    return set(getattr(schema, "__annotations__", {}))
+
+
+def fake_reply(prompt, shape="recommendations", structured=False, fields=()):
+    """Builds a deterministic reply text for prompt in the given shape.
+
+    structured replies are a bare JSON object with "intro" and "recommendations", like
+    Gemini's response-schema mode; otherwise the intro is followed by a fenced JSON block.
+    A response schema with "titles" (title picks), "critic_review" (a single card) or
+    "reviews" (reviews for the "- Title — synopsis" lines of the prompt) gets a reply of that
+    shape instead.
+    """
+    intro = "Buckle up, here are five picks I'd bet my popcorn on:"
+    if shape == "question":
+        question = "Happy to help! Before I pick, what was the last movie you loved, and why?"
+        if structured:
+            return json.dumps({"intro": question, "recommendations": []})
+        return question
+
+    if "reviews" in fields:
+        titles = [line[2:].split(" — ")[0] for line in prompt.splitlines() if line.startswith("- ")]
+        return json.dumps({"reviews": [
+            {"title": title, "critic_review": f"{title} is the cinematic equivalent of a perfectly timed one-liner."}
+            for title in titles
+        ]})
+
+    seed = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16)
+    picks = [FAKE_TITLES[(seed + step * 5) % len(FAKE_TITLES)] for step in range(5)]
+    if "titles" in fields:
+        return json.dumps({"intro": intro, "titles": [{"title": t, "imdb_rating": r} for t, r in picks]})
+    if "critic_review" in fields:
+        return json.dumps({
+            "synopsis": "A gripping story that fits the request.",
+            "poster_url": "",
+            "critic_review": "The cinematic equivalent of a perfectly timed one-liner.",
+        })
+    recommendations = [
+        {
+            "title": title,
+            "imdb_rating": rating,
+            "synopsis": f"A gripping story that fits the request for {title}.",
+            "poster_url": "",
+            "critic_review": f"{title} is the cinematic equivalent of a perfectly timed one-liner.",
+        }
+        for title, rating in picks
+    ]
+    if structured:
+        payload = json.dumps({"intro": intro, "recommendations": recommendations})
+        return payload[: len(payload) // 2] if shape == "garbled" else payload
+
+    payload = json.dumps({"recommendations": recommendations}, indent=2)
+    if shape == "garbled":
+        payload = payload[: len(payload) // 2]
+    return f"{intro}\n```json\n{payload}\n```"
+
+
+class FakeResponse:
+    """A finished (or streamed) response with .text, chunk iteration and usage_metadata."""
+
+    def __init__(self, text, prompt_tokens, chunks=None, chunk_delay=0.0, token_delay=0.0):
+        self.text = text
+        self.usage_metadata = SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=estimate_tokens(text),
+            total_token_count=prompt_tokens + estimate_tokens(text),
+        )
+        self._chunks = chunks
+        self._chunk_delay = chunk_delay
+        self._token_delay = token_delay
+
+    def __iter__(self):
+        for chunk in self._chunks or [self.text]:
+            delay = self._chunk_delay + estimate_tokens(chunk) * self._token_delay
+            if delay:
+                time.sleep(delay)
+            yield SimpleNamespace(text=chunk, usage_metadata=self.usage_metadata)
+
+
+class FakeModel:
+    """Deterministic fake GenerativeModel.
+
+    latency is the delay before the first byte, plus token_latency per input token (prompt
+    processing time), and chunk_delay the delay between streamed chunks; output_token_latency
+    is the generation time per output token, so long replies take longer. The system
+    instruction counts as input on every call, like it does for the real API.
+
+    failures is a list of exceptions raised (in order) by the next calls, which lets tests
+    exercise retries.
+    """
+
+    def __init__(self, latency=0.0, chunk_delay=0.0, chunk_size=40, shape="recommendations", failures=None,
+                 system_instruction=None, token_latency=0.0, output_token_latency=0.0):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.output_token_latency = output_token_latency
+        self.chunk_delay = chunk_delay
+        self.chunk_size = chunk_size
+        self.shape = shape
+        self.failures = list(failures or [])
+        self.system_instruction = system_instruction
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def start_chat(self, history=None):
+        return FakeChat(self, history)
+
+    def count_tokens(self, contents):
+        text = contents if isinstance(contents, str) else json.dumps(contents, default=str)
+        return SimpleNamespace(total_tokens=estimate_tokens(text))
+
+    def _respond(self, prompt_text, context_tokens, stream, generation_config=None):
+        with self._lock:
+            self.calls += 1
+            failure = self.failures.pop(0) if self.failures else None
+        if self.system_instruction:
+            context_tokens += estimate_tokens(self.system_instruction)
+        if self.latency or self.token_latency:
+            time.sleep(self.latency + context_tokens * self.token_latency)
+        if failure is not None:
+            raise failure
+
+        text = fake_reply(
+            prompt_text, self.shape, structured=wants_json(generation_config), fields=schema_fields(generation_config)
+        )
+        chunks = None
+        if stream:
+            chunks = [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)]
+        elif self.output_token_latency:
+            time.sleep(estimate_tokens(text) * self.output_token_latency)
+        return FakeResponse(text, context_tokens, chunks, self.chunk_delay, self.output_token_latency)
+
+    def generate_content(self, contents, stream=False, request_options=None, generation_config=None, **kwargs):
+        prompt_text = contents if isinstance(contents, str) else json.dumps(contents, default=str)
+        return self._respond(prompt_text, estimate_tokens(prompt_text), stream, generation_config)
+
+
+class FakeChat:
+    """Fake ChatSession that records history like the real SDK."""
+
+    def __init__(self, model, history=None):
+        self.model = model
+        self.history = list(history or [])
+
+    def send_message(self, content, stream=False, request_options=None, generation_config=None, **kwargs):
+        context = "".join(str(part) for message in self.history for part in message["parts"])
+        response = self.model._respond(content, estimate_tokens(context + content), stream, generation_config)
+        self.history.append({"role": "user", "parts": [content]})
+        self.history.append({"role": "model", "parts": [response.text]})
+        return response
@@ -0,0 +1,76 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from prompts import CARD_GENERATION_CONFIG, TITLE_PICKS_GENERATION_CONFIG, TITLE_PICKS_INSTRUCTIONS, card_prompt
+from recommendations import Recommendation, repair_json
+
+# Shown instead of the raw reply when the title picks can't be parsed at all
+GARBLED_PICKS_INTRO = "Sorry, my notes got scrambled there. Could you tell me once more what you're in the mood for?"
+
+
+class FanOutGenerator:
+    """Generates recommendation cards with one short title-pick call and parallel per-card calls.
+
+    A single call writes the intro and all five cards in sequence, so its latency grows with
+    the output. Here the chat only picks the titles; each title's synopsis and review is then
+    written by its own call on a bounded pool, and cards can be shown as they complete.
+    Calls go through the shared GeminiClient, so they count against its in-flight cap.
+
+    The pick call has to finish before any card is started, so the first card arrives later
+    than a streamed single call's first card, in exchange for a faster whole reply and about
+    six model calls per turn instead of one (see bench_fanout.py).
+    """
+
+    def __init__(self, client, model, workers=5):
+        self.client = client
+        self.model = model
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fanout")
+
+    def pick(self, chat, prompt):
+        """Asks the chat to pick titles; returns (response, intro, recommendations with title and rating).
+
+        No titles means the model asked the user a question (the intro) instead. A reply that
+        isn't JSON at all has intro None, so the caller can tell it from a question; it should
+        show GARBLED_PICKS_INTRO rather than the raw reply.
+        """
+        response = self.client.send_message(
+            chat, prompt + "\n\n" + TITLE_PICKS_INSTRUCTIONS, generation_config=TITLE_PICKS_GENERATION_CONFIG
+        )
+        data = repair_json(response.text)
+        if not isinstance(data, dict):
+            return response, None, []
+        picks = [
+            Recommendation(title=str(item["title"]), imdb_rating=str(item.get("imdb_rating") or "N/A"))
+            for item in data.get("titles") or [] if isinstance(item, dict) and item.get("title")
+        ]
+        return response, str(data.get("intro") or ""), picks
+
+    def write_card(self, rec, request):
+        """Fills in one card's synopsis, poster and review; a failed call leaves the card bare."""
+        try:
+            response = self.client.generate_content(
+                self.model, card_prompt(rec.title, request), generation_config=CARD_GENERATION_CONFIG
+            )
+            data = repair_json(response.text)
+        except Exception:
+            return rec
+        if isinstance(data, dict):
+            for name in ("synopsis", "poster_url", "critic_review"):
+                if data.get(name):
+                    setattr(rec, name, str(data[name]))
+        return rec
+
+    def cards(self, recommendations, request):
+        """Writes all cards in parallel; yields (index, recommendation) as each one completes."""
+        futures = {
+            self._executor.submit(self.write_card, rec, request): index for index, rec in enumerate(recommendations)
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+    def generate(self, chat, prompt, request):
+        """Runs the whole fan-out; returns (intro, recommendations) in the single-call dict shape."""
+        _, intro, picks = self.pick(chat, prompt)
+        for _ in self.cards(picks, request):
+            pass
+        return GARBLED_PICKS_INTRO if intro is None else intro, picks
+
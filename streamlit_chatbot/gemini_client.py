@@ -0,0 +1,190 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+
+# HTTP status codes and google.api_core exception names worth retrying
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+RETRYABLE_ERROR_NAMES = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "DeadlineExceeded",
+    "InternalServerError", "GatewayTimeout", "Aborted", "Unavailable",
+}
+
+
+class GeminiError(Exception):
+    """Raised when a Gemini call fails for good (non-retryable error or retries exhausted)."""
+
+
+class GeminiBusyError(GeminiError):
+    """Raised when a call waited too long for a free in-flight slot."""
+
+
+def is_retryable(error):
+    """Returns True for rate limits, timeouts and transient server errors."""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    code = getattr(error, "code", None)
+    if callable(code):
+        code = None
+    code = code if code is not None else getattr(error, "status_code", None)
+    if isinstance(code, int) and code in RETRYABLE_STATUS_CODES:
+        return True
+    return type(error).__name__ in RETRYABLE_ERROR_NAMES
+
+
+def percentile(samples, pct):
+    """Returns the pct-th percentile of samples (0.0 when there are none)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class ClientMetrics:
+    """Counters plus recent queue-wait and call-latency samples (seconds)."""
+
+    def __init__(self, window=1000):
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.queue_wait = deque(maxlen=window)
+        self.latency = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, queue_wait=None, latency=None, retried=False, failed=False):
+        with self._lock:
+            if latency is not None:
+                self.calls += 1
+                self.latency.append(latency)
+            if queue_wait is not None:
+                self.queue_wait.append(queue_wait)
+            self.retries += retried
+            self.failures += failed
+
+    def summary(self):
+        """Returns counters and p50/p95 queue wait and latency in milliseconds."""
+        with self._lock:
+            waits, latencies = list(self.queue_wait), list(self.latency)
+            return {
+                "calls": self.calls,
+                "retries": self.retries,
+                "failures": self.failures,
+                "queue_wait_p50_ms": percentile(waits, 50) * 1000,
+                "queue_wait_p95_ms": percentile(waits, 95) * 1000,
+                "latency_p50_ms": percentile(latencies, 50) * 1000,
+                "latency_p95_ms": percentile(latencies, 95) * 1000,
+            }
+
+
+class GeminiClient:
+    """Wraps google.generativeai chat and model calls with deadlines, retries and a concurrency cap.
+
+    One client is meant to be shared per process, so its semaphore caps the number of
+    requests in flight across every session on a Streamlit server. Anything with the
+    send_message / generate_content interface works, including fake_gemini.FakeModel.
+    With a limiter (a rate_limit.TokenBucket, or a coordination.SharedTokenBucket shared by
+    every replica), each attempt, retries included, also takes a token from it first.
+    """
+
+    def __init__(self, max_in_flight=8, timeout=30.0, max_retries=3, base_delay=0.5, max_delay=8.0,
+                 queue_timeout=30.0, limiter=None, sleep=time.sleep):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.queue_timeout = queue_timeout
+        self.limiter = limiter
+        self.metrics = ClientMetrics()
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._sleep = sleep
+
+    def backoff(self, attempt):
+        """Returns the jittered exponential delay before retry number attempt (full jitter)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _acquire(self):
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self.metrics.record(failed=True)
+            raise GeminiBusyError("Too many Gemini requests in flight; please try again.")
+        self.metrics.record(queue_wait=time.perf_counter() - start)
+
+    def _take_quota(self):
+        if self.limiter is not None and not self.limiter.acquire(timeout=self.queue_timeout):
+            self.metrics.record(failed=True)
+            raise GeminiBusyError("The Gemini request quota is used up; please try again.")
+
+    def _call(self, fn, *args, **kwargs):
+        """Calls fn with a per-attempt deadline, retrying retryable errors with backoff."""
+        kwargs.setdefault("request_options", {"timeout": self.timeout})
+        self._acquire()
+        try:
+            for attempt in range(self.max_retries + 1):
+                self._take_quota()
+                start = time.perf_counter()
+                try:
+                    result = fn(*args, **kwargs)
+                except Exception as e:
+                    if attempt == self.max_retries or not is_retryable(e):
+                        self.metrics.record(failed=True)
+                        raise GeminiError(str(e)) from e
+                    self.metrics.record(retried=True)
+                    self._sleep(self.backoff(attempt))
+                else:
+                    self.metrics.record(latency=time.perf_counter() - start)
+                    return result
+        finally:
+            self._slots.release()
+
+    def send_message(self, chat, prompt, **kwargs):
+        """Sends a chat message and returns the full response."""
+        return self._call(chat.send_message, prompt, **kwargs)
+
+    def generate_content(self, model, prompt, **kwargs):
+        """Runs a single-shot generation and returns the full response."""
+        return self._call(model.generate_content, prompt, **kwargs)
+
+    def stream_message(self, chat, prompt, **kwargs):
+        """Yields response chunks of a streamed chat message.
+
+        Retries only happen before the first chunk arrives; once text has been shown a
+        failure is raised as GeminiError. The in-flight slot is held until the stream ends.
+        """
+        kwargs.setdefault("request_options", {"timeout": self.timeout})
+        self._acquire()
+        try:
+            for attempt in range(self.max_retries + 1):
+                self._take_quota()
+                start = time.perf_counter()
+                try:
+                    chunks = iter(chat.send_message(prompt, stream=True, **kwargs))
+                    first = next(chunks, None)
+                    break
+                except Exception as e:
+                    if attempt == self.max_retries or not is_retryable(e):
+                        self.metrics.record(failed=True)
+                        raise GeminiError(str(e)) from e
+                    self.metrics.record(retried=True)
+                    self._sleep(self.backoff(attempt))
+
+            try:
+                if first is not None:
+                    yield first
+                yield from chunks
+            except Exception as e:
+                self.metrics.record(failed=True)
+                raise GeminiError(str(e)) from e
+            self.metrics.record(latency=time.perf_counter() - start)
+        finally:
+            self._slots.release()
+
+    # --- Async variants ---
+
+    async def send_message_async(self, chat, prompt, **kwargs):
+        """Async send_message; runs on a worker thread so it shares the process-wide cap."""
+        return await asyncio.to_thread(self.send_message, chat, prompt, **kwargs)
+
+    async def generate_content_async(self, model, prompt, **kwargs):
+        """Async generate_content; runs on a worker thread so it shares the process-wide cap."""
+        return await asyncio.to_thread(self.generate_content, model, prompt, **kwargs)
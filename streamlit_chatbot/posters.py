@@ -0,0 +1,166 @@
+import hashlib
+import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+PLACEHOLDER_PATH = Path(__file__).parent / "assets" / "poster_placeholder.png"
+
+# Card-sized thumbnails: the cards show posters in a narrow column
+THUMBNAIL_SIZE = (300, 450)
+
+
+class PosterError(Exception):
+    """Raised when a poster URL can't be turned into a valid thumbnail."""
+
+
+class PosterCache:
+    """Fetches posters in parallel, validates and downsizes them, and caches thumbnails on disk.
+
+    Thumbnails are stored content-addressed (blobs/<sha256 of the JPEG>.jpg), so identical
+    posters behind different URLs are stored once; urls/<sha256 of the URL> points at the
+    blob. Failed URLs are remembered for failure_ttl seconds so they aren't refetched on every
+    rerun, and the least recently used blobs are evicted once the cache exceeds max_bytes.
+    """
+
+    def __init__(self, cache_dir, max_bytes=100 * 1024 * 1024, max_download_bytes=5 * 1024 * 1024,
+                 timeout=5, workers=8, failure_ttl=60 * 60, placeholder=PLACEHOLDER_PATH, offline=False):
+        self.cache_dir = Path(cache_dir)
+        self.blob_dir = self.cache_dir / "blobs"
+        self.url_dir = self.cache_dir / "urls"
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.url_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_download_bytes = max_download_bytes
+        self.timeout = timeout
+        self.failure_ttl = failure_ttl
+        self.placeholder = str(placeholder)
+        # Offline caches never touch the network: anything not on disk gets the placeholder
+        self.offline = offline
+        self.session = requests.Session()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="poster")
+        self._paths = {}
+        self._lock = threading.Lock()
+
+    # --- Lookups ---
+
+    def _url_entry(self, url):
+        return self.url_dir / hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def cached(self, url):
+        """Returns the cached thumbnail (or placeholder for a recent failure) without any network I/O.
+
+        Returns None when the URL hasn't been fetched yet.
+        """
+        if not url or not url.startswith(("http://", "https://")):
+            return self.placeholder
+        with self._lock:
+            path = self._paths.get(url)
+        if path is not None and (path == self.placeholder or os.path.exists(path)):
+            return path
+
+        entry = self._url_entry(url)
+        try:
+            pointer = entry.read_text().strip()
+        except FileNotFoundError:
+            return None
+        if pointer.startswith("failed "):
+            if time.time() - float(pointer.split()[1]) < self.failure_ttl:
+                return self._remember(url, self.placeholder)
+            return None
+        blob = self.blob_dir / f"{pointer}.jpg"
+        if not blob.exists():
+            return None
+        # Touch the blob so eviction sees it as recently used
+        os.utime(blob)
+        return self._remember(url, str(blob))
+
+    def _remember(self, url, path):
+        with self._lock:
+            self._paths[url] = path
+        return path
+
+    def get(self, url):
+        """Returns a local image path for a poster URL, fetching it on a cache miss."""
+        path = self.cached(url)
+        if path is not None:
+            return path
+        return self._fetch_or_placeholder(url)
+
+    def get_many(self, urls):
+        """Returns local image paths for many poster URLs, fetching all misses in parallel."""
+        paths = {url: self.cached(url) for url in urls}
+        misses = [url for url, path in paths.items() if path is None]
+        for url, path in zip(misses, self._executor.map(self._fetch_or_placeholder, misses)):
+            paths[url] = path
+        return [paths[url] for url in urls]
+
+    # --- Fetching ---
+
+    def _fetch_or_placeholder(self, url):
+        if self.offline:
+            return self.placeholder
+        try:
+            return self._remember(url, self._fetch(url))
+        except (PosterError, requests.RequestException, OSError):
+            self._url_entry(url).write_text(f"failed {time.time()}")
+            return self._remember(url, self.placeholder)
+
+    def _fetch(self, url):
+        with self.session.get(url, timeout=self.timeout, stream=True) as response:
+            if response.status_code != 200:
+                raise PosterError(f"HTTP {response.status_code}")
+            content_type = response.headers.get("Content-Type", "")
+            if not content_type.startswith("image/"):
+                raise PosterError(f"not an image: {content_type!r}")
+            declared = int(response.headers.get("Content-Length") or 0)
+            if declared > self.max_download_bytes:
+                raise PosterError(f"too large: {declared} bytes")
+            data = response.raw.read(self.max_download_bytes + 1, decode_content=True)
+            if len(data) > self.max_download_bytes:
+                raise PosterError("too large")
+
+        # Pillow is only needed on a cache miss, so warm caches never import it
+        from PIL import Image
+
+        try:
+            image = Image.open(io.BytesIO(data))
+            image.thumbnail(THUMBNAIL_SIZE)
+            buffer = io.BytesIO()
+            image.convert("RGB").save(buffer, format="JPEG", quality=85, optimize=True)
+        except Exception as e:
+            raise PosterError(f"unreadable image: {e}") from e
+
+        thumbnail = buffer.getvalue()
+        digest = hashlib.sha256(thumbnail).hexdigest()
+        blob = self.blob_dir / f"{digest}.jpg"
+        if not blob.exists():
+            partial = blob.with_suffix(f".{threading.get_ident()}.tmp")
+            partial.write_bytes(thumbnail)
+            os.replace(partial, blob)
+        self._url_entry(url).write_text(digest)
+        self.evict()
+        return str(blob)
+
+    def evict(self):
+        """Deletes the least recently used thumbnails until the cache fits in max_bytes."""
+        blobs = []
+        for blob in self.blob_dir.glob("*.jpg"):
+            try:
+                stat = blob.stat()
+            except FileNotFoundError:
+                continue
+            blobs.append((stat.st_mtime, stat.st_size, blob))
+        total = sum(size for _, size, _ in blobs)
+        for _, size, blob in sorted(blobs):
+            if total <= self.max_bytes:
+                break
+            blob.unlink(missing_ok=True)
+            total -= size
+        with self._lock:
+            self._paths = {url: path for url, path in self._paths.items()
+                           if path == self.placeholder or os.path.exists(path)}
@@ -0,0 +1,114 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from response_cache import make_cache_key
+
+# Mood steps of the sidebar slider, in order
+MOODS = ["Very Sad", "Sad", "Okay", "Happy", "Very Happy"]
+
+
+def follow_up_prompts(top_title=None):
+    """Returns the follow-ups users most often send after a list of cards (shown as suggestions)."""
+    prompts = ["Something lighter, please"]
+    if top_title:
+        prompts.append(f"More like {top_title}")
+    return prompts
+
+
+def predict_follow_ups(prompt, mood, top_title=None):
+    """Returns the (prompt, mood) pairs most likely to be sent next, most likely first.
+
+    Those are the suggested follow-ups in the current mood, then the same request one mood
+    step up and down (the slider moved and the request was resent).
+    """
+    predictions = [(follow_up, mood) for follow_up in follow_up_prompts(top_title)]
+    if mood in MOODS:
+        step = MOODS.index(mood)
+        predictions.extend((prompt, MOODS[i]) for i in (step + 1, step - 1) if 0 <= i < len(MOODS))
+    return predictions
+
+
+class PrefetchScheduler:
+    """Speculatively runs likely next requests in the background and holds their results briefly.
+
+    fetch is called on a worker thread with the arguments given to schedule() and must not
+    touch Streamlit session state. Each session may have at most budget prefetches per turn;
+    take() consumes one, and discard() drops the rest of a session's prefetches (counting
+    them as wasted) once its next turn has been answered.
+    """
+
+    def __init__(self, fetch, workers=4, budget=2, ttl_seconds=120):
+        self.fetch = fetch
+        self.budget = budget
+        self.ttl_seconds = ttl_seconds
+        self.scheduled = 0
+        self.hits = 0
+        self.misses = 0
+        self.wasted = 0
+        self.failed = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def schedule(self, session_id, prompt, mood, *args):
+        """Starts prefetching the reply to prompt in mood unless the session's budget is spent."""
+        key = make_cache_key(prompt, mood)
+        with self._lock:
+            pending = self._sessions.setdefault(session_id, {})
+            if key in pending or len(pending) >= self.budget:
+                return False
+            pending[key] = (time.time() + self.ttl_seconds, self._executor.submit(self.fetch, *args))
+            self.scheduled += 1
+        return True
+
+    def take(self, session_id, prompt, mood, timeout=None):
+        """Returns the prefetched reply for prompt in mood, or None on a miss.
+
+        A prefetch that is still running is waited for, since it started before the request did.
+        """
+        with self._lock:
+            entry = self._sessions.get(session_id, {}).pop(make_cache_key(prompt, mood), None)
+        result = None
+        if entry is not None and entry[0] > time.time():
+            try:
+                result = entry[1].result(timeout=timeout)
+            except Exception:
+                with self._lock:
+                    self.failed += 1
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+    def discard(self, session_id):
+        """Drops a session's remaining prefetches; those that ran count as wasted calls."""
+        with self._lock:
+            pending = self._sessions.pop(session_id, {})
+        for _, future in pending.values():
+            if future.cancel():
+                with self._lock:
+                    self.scheduled -= 1
+                continue
+            with self._lock:
+                self.wasted += 1
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        """Returns the hit/miss/wasted counters; wasted calls are prefetches nobody asked for."""
+        with self._lock:
+            return {
+                "scheduled": self.scheduled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "wasted": self.wasted,
+                "failed": self.failed,
+                "hit_rate": self.hit_rate,
+                "waste_rate": self.wasted / self.scheduled if self.scheduled else 0.0,
+            }
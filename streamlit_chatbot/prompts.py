@@ -0,0 +1,237 @@
+import functools
+from dataclasses import dataclass, field
+from typing import TypedDict
+
+from conversation_memory import estimate_tokens
+
+# --- Persona ---
+
+PERSONA = """
+You are a world-reknown film and TV show critic, whose success was built on thorough and holistic reviews of films and TV series. You are a creative person who speaks eloquently and has the sense of humour of Ryan Reynolds.
+
+Your main role is to recommend movies and TV shows to users based on their mood, preferred genre, film interests, and personality.
+
+"""
+
+# Persona and Instructions for Gemini - CRITICAL for structured output!
+persona_instructions = PERSONA + """Crucial Instruction for Recommendation Output:
+When providing recommendations (typically 5), you MUST first output a short, witty introductory sentence in plain text.
+Immediately following the introduction, you MUST output a JSON object containing a list of your recommendations.
+The JSON object must be enclosed in triple backticks (```json...```) and contain a single key: "recommendations".
+Each item in the "recommendations" list must be a dictionary with the following keys:
+- "title": The title of the movie or TV show.
+- "imdb_rating": The IMDb rating (e.g., "8.2/10").
+- "synopsis": A brief, engaging synopsis of the plot.
+- "poster_url": A public URL for the movie/show poster image.
+- "critic_review": Your own short, eloquent, and witty review (2-3 sentences).
+
+If you are unable to give a proper recommendation because of insufficient data on the user's film preferences, you should ask the user constructive questions in order to come to a more accurate list of recommendations, and you should NOT output a JSON block.
+"""
+
+# Persona for structured-output mode: the response schema defines the shape, so the
+# instructions only describe what goes into each field
+structured_persona_instructions = PERSONA + """Crucial Instruction for Recommendation Output:
+Always reply with a single JSON object that has two keys: "intro" and "recommendations".
+- "intro": a short, witty introductory sentence. If you need more information about the user's film preferences, put your constructive questions here instead.
+- "recommendations": your recommendations (typically 5), or an empty list when you are asking questions. Each item has a "title", an "imdb_rating" (e.g., "8.2/10"), a brief, engaging "synopsis", a public "poster_url" for the poster image, and your own short, eloquent, and witty "critic_review" (2-3 sentences).
+"""
+
+# Compact persona: the same rules in about a third of the tokens, since the persona is paid
+# for on every turn (as the system instruction or as the opening of the chat history)
+COMPACT_PERSONA = (
+    "You are a world-renowned film and TV critic with Ryan Reynolds' sense of humour. Recommend movies "
+    "and TV shows that fit the user's mood, genres, interests and personality. If you don't know enough "
+    "about their taste yet, ask constructive questions instead of recommending."
+)
+
+compact_persona_instructions = COMPACT_PERSONA + (
+    " When recommending (usually 5), write one witty intro sentence, then a ```json block with "
+    '{"recommendations": [...]}; each item has "title", "imdb_rating" (e.g. "8.2/10"), a brief "synopsis", '
+    'a public "poster_url" and your witty 2-3 sentence "critic_review". No JSON block when asking questions.'
+)
+
+compact_structured_persona_instructions = COMPACT_PERSONA + (
+    ' Reply with a JSON object: "intro" (one witty sentence, or your questions) and "recommendations" '
+    '(usually 5, empty when asking; each has "title", "imdb_rating" like "8.2/10", a brief "synopsis", '
+    'a public "poster_url" and your witty 2-3 sentence "critic_review").'
+)
+
+
+def select_persona(structured=True, compact=True):
+    """Returns the persona instructions for an output mode."""
+    if compact:
+        return compact_structured_persona_instructions if structured else compact_persona_instructions
+    return structured_persona_instructions if structured else persona_instructions
+
+
+# --- Response Schema ---
+
+
+class RecommendationSchema(TypedDict):
+    title: str
+    imdb_rating: str
+    synopsis: str
+    poster_url: str
+    critic_review: str
+
+
+class ReplySchema(TypedDict):
+    intro: str
+    recommendations: list[RecommendationSchema]
+
+
+# Passed as generation_config so Gemini emits JSON matching ReplySchema directly
+STRUCTURED_GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": ReplySchema,
+}
+
+
+class TitlePickSchema(TypedDict):
+    title: str
+    imdb_rating: str
+
+
+class TitlePicksSchema(TypedDict):
+    intro: str
+    titles: list[TitlePickSchema]
+
+
+class CardSchema(TypedDict):
+    synopsis: str
+    poster_url: str
+    critic_review: str
+
+
+class CriticReviewSchema(TypedDict):
+    title: str
+    critic_review: str
+
+
+class CriticReviewsSchema(TypedDict):
+    reviews: list[CriticReviewSchema]
+
+
+# Fan-out mode: a short call picks the titles, then one call per title writes its card
+TITLE_PICKS_GENERATION_CONFIG = {"response_mime_type": "application/json", "response_schema": TitlePicksSchema}
+CARD_GENERATION_CONFIG = {"response_mime_type": "application/json", "response_schema": CardSchema}
+# Reviews for cards assembled locally ("more like X")
+CRITIC_REVIEWS_GENERATION_CONFIG = {"response_mime_type": "application/json", "response_schema": CriticReviewsSchema}
+
+TITLE_PICKS_INSTRUCTIONS = (
+    "For this request, only pick the titles: reply with a JSON object with a short, witty \"intro\" and "
+    "\"titles\" (usually 5, each with \"title\" and \"imdb_rating\" like \"8.2/10\"). Leave \"titles\" empty "
+    "and put your questions in \"intro\" if you need to know more about the user's taste."
+)
+
+
+def card_prompt(title, request):
+    """Returns the prompt for one fan-out card."""
+    return (
+        "You are a world-renowned film and TV critic with Ryan Reynolds' sense of humour. "
+        f"For \"{title}\", recommended for this request: {request!r}, reply with a JSON object with a brief, "
+        "engaging \"synopsis\", a public \"poster_url\" for its poster and your own short, eloquent and witty "
+        "\"critic_review\" (2-3 sentences)."
+    )
+
+
+def critic_reviews_prompt(recommendations):
+    """Returns the prompt asking for the critic reviews of titles that were already picked."""
+    title_lines = "\n".join(f"- {rec.title} — {rec.synopsis}" for rec in recommendations)
+    return (
+        "You are a world-renowned film critic with the sense of humour of Ryan Reynolds. "
+        "Write a short, eloquent and witty review (2-3 sentences) for each title below. "
+        "Reply with a JSON object whose \"reviews\" list has a \"title\" (exactly as written below) and "
+        "a \"critic_review\" for each one.\n\n" + title_lines
+    )
+
+
+# Sent once when a structured reply still can't be parsed
+REPROMPT_MESSAGE = (
+    "Your last reply was not valid JSON. Reply again with only the JSON object, "
+    'with the keys "intro" and "recommendations".'
+)
+
+
+# --- Prompt Builder ---
+
+
+def model_token_counter(model):
+    """Returns a token counter backed by the model's own tokenizer (one API call per new text)."""
+    return lambda text: model.count_tokens(text).total_tokens
+
+
+@dataclass(slots=True)
+class BuiltPrompt:
+    """One turn's prompt: the request kept in memory, the text sent, and tokens per component."""
+    turn_prompt: str
+    text: str
+    tokens: dict = field(default_factory=dict)
+    trimmed_candidates: int = 0
+
+    @property
+    def total_tokens(self):
+        return sum(self.tokens.values())
+
+
+class PromptBuilder:
+    """Owns the persona text and assembles each turn's prompt within an input token budget.
+
+    With use_system_instruction the persona goes to the model once, as its system
+    instruction, instead of being pasted into the first message and carried along in the
+    chat history. Each component (system, history, persona, request, exclusions, candidates) is
+    counted with count_tokens; when a turn would go over input_budget, the lowest ranked
+    catalog candidates are dropped first.
+    """
+
+    def __init__(self, instructions, use_system_instruction=True, input_budget=6000, count_tokens=estimate_tokens):
+        self.instructions = instructions
+        self.use_system_instruction = use_system_instruction
+        self.input_budget = input_budget
+        # Repeated texts (the persona, candidate lines) are only counted once
+        self._count_cached = functools.lru_cache(maxsize=2048)(count_tokens)
+
+    def count_tokens(self, text):
+        return self._count_cached(text) if text else 0
+
+    @property
+    def system_instruction(self):
+        """Returns the text for the model's system-instruction channel, or None."""
+        return self.instructions if self.use_system_instruction else None
+
+    @property
+    def history_preamble(self):
+        """Returns the text opening a rebuilt chat history (empty when it is the system instruction)."""
+        return "" if self.use_system_instruction else self.instructions
+
+    def build(self, request, mood, candidates="", history_tokens=0, is_first_turn=False, exclude=()):
+        """Builds the prompt for one turn; candidates is a format_candidates section or ''.
+
+        exclude lists titles the user has already been shown, which the model is asked not to repeat.
+        """
+        turn_prompt = f"My current mood is '{mood}'. User request: {request}"
+        exclusions = f"Already recommended, don't repeat: {'; '.join(exclude)}" if exclude else ""
+        persona = ""
+        if is_first_turn and not self.use_system_instruction:
+            persona = self.instructions + "\n\n---START OF USER REQUEST---\n\n"
+
+        tokens = {
+            "system": self.count_tokens(self.system_instruction or ""),
+            "history": history_tokens,
+            "persona": self.count_tokens(persona),
+            "request": self.count_tokens(turn_prompt),
+            "exclusions": self.count_tokens(exclusions),
+        }
+        header, *lines = candidates.splitlines() if candidates else [""]
+        fixed = sum(tokens.values()) + self.count_tokens(header)
+        candidate_tokens = [self.count_tokens(line) for line in lines]
+        trimmed = 0
+        while lines and fixed + sum(candidate_tokens) > self.input_budget:
+            lines.pop()
+            candidate_tokens.pop()
+            trimmed += 1
+        section = "\n".join([header, *lines]) if lines else ""
+        tokens["candidates"] = self.count_tokens(section)
+
+        text = persona + turn_prompt + "".join("\n\n" + part for part in (exclusions, section) if part)
+        return BuiltPrompt(turn_prompt, text, tokens, trimmed)
@@ -0,0 +1,356 @@
+import json
+import re
+from dataclasses import dataclass, field
+
+JSON_FENCE = "```json"
+
+GARBLED_JSON_ERROR = "garbled"
+
+# Upper bound on how far repair_json backtracks through a truncated reply
+MAX_REPAIR_ATTEMPTS = 50
+
+TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+# --- JSON Repair ---
+
+
+def _close_json(text):
+    """Closes an unterminated string and any brackets left open at the end of text."""
+    closers = []
+    in_string = escape = False
+    for char in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "{":
+            closers.append("}")
+        elif char == "[":
+            closers.append("]")
+        elif char in "}]" and closers:
+            closers.pop()
+    if in_string:
+        if escape:
+            text = text[:-1]
+        text += '"'
+    return text.rstrip() + "".join(reversed(closers))
+
+
+def _last_separator(text):
+    """Returns the index of the last comma outside a string, or None."""
+    last = None
+    in_string = escape = False
+    for pos, char in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == ",":
+            last = pos
+    return last
+
+
+def repair_json(text):
+    """Best-effort parse of partial or slightly malformed JSON; returns the value or None.
+
+    Text before the first bracket and after a complete value is ignored. Trailing commas
+    are dropped, and a truncated value is cut back to the last complete element before
+    the open strings and brackets are closed.
+    """
+    starts = [pos for pos in (text.find("{"), text.find("[")) if pos != -1]
+    if not starts:
+        return None
+    candidate = text[min(starts):]
+    try:
+        return json.JSONDecoder().raw_decode(candidate)[0]
+    except json.JSONDecodeError:
+        pass
+
+    candidate = TRAILING_COMMA.sub(r"\1", candidate)
+    for _ in range(MAX_REPAIR_ATTEMPTS):
+        try:
+            return json.loads(_close_json(candidate))
+        except json.JSONDecodeError:
+            pass
+        cut = _last_separator(candidate)
+        if cut is None:
+            return None
+        candidate = candidate[:cut]
+    return None
+
+
+# --- Records ---
+
+
+@dataclass(slots=True)
+class Recommendation:
+    """A single movie or TV show card."""
+    title: str = "Unknown Title"
+    imdb_rating: str = "N/A"
+    synopsis: str = "No synopsis provided."
+    poster_url: str = ""
+    critic_review: str = "The critic remains silent... for now."
+
+    @classmethod
+    def from_dict(cls, data):
+        """Builds a card from a model-provided dict, ignoring unknown keys."""
+        values = {name: str(data[name]) for name in cls.__dataclass_fields__ if data.get(name) is not None}
+        return cls(**values)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__dataclass_fields__}
+
+
+@dataclass(slots=True)
+class RecommendationRecord:
+    """An assistant reply parsed once: intro text, cards, and the raw text as a fallback.
+
+    error is None for a clean parse, GARBLED_JSON_ERROR when the JSON block could not be
+    decoded, or the message of any other failure. repaired is True when the cards were
+    salvaged from malformed or truncated JSON, so some of them may be missing.
+    """
+    raw: str
+    intro: str = ""
+    recommendations: list = field(default_factory=list)
+    has_json: bool = False
+    error: str | None = None
+    repaired: bool = False
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuilds a record saved with to_dict."""
+        recommendations = [Recommendation.from_dict(rec) for rec in data.get("recommendations", [])]
+        return cls(data["raw"], data.get("intro", ""), recommendations, data.get("has_json", False), data.get("error"),
+                   data.get("repaired", False))
+
+    def to_dict(self):
+        return {
+            "raw": self.raw,
+            "intro": self.intro,
+            "recommendations": [rec.to_dict() for rec in self.recommendations],
+            "has_json": self.has_json,
+            "error": self.error,
+            "repaired": self.repaired,
+        }
+
+
+def build_record(intro, recommendations):
+    """Builds a record for locally assembled cards, with raw text in the model's reply format."""
+    payload = json.dumps({"recommendations": [rec.to_dict() for rec in recommendations]}, indent=2)
+    raw = f"{intro}\n{JSON_FENCE}\n{payload}\n```"
+    return RecommendationRecord(raw=raw, intro=intro, recommendations=list(recommendations), has_json=True)
+
+
+def parse_structured_response(text):
+    """Parses a structured-output reply (a JSON object with "intro" and "recommendations")."""
+    record = RecommendationRecord(raw=text)
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        data = repair_json(text)
+        record.repaired = True
+    if not isinstance(data, dict):
+        record.has_json = True
+        record.error = GARBLED_JSON_ERROR
+        return record
+    record.intro = str(data.get("intro") or "")
+    recommendations = data.get("recommendations") or []
+    record.recommendations = [Recommendation.from_dict(rec) for rec in recommendations if isinstance(rec, dict)]
+    # A reply without cards is a conversational message (e.g., asking a question)
+    record.has_json = bool(record.recommendations)
+    record.repaired = record.repaired and record.has_json
+    return record
+
+
+def parse_response(text):
+    """Parses a full assistant reply (fenced or structured output) into a RecommendationRecord."""
+    if text.lstrip().startswith("{"):
+        return parse_structured_response(text)
+
+    if JSON_FENCE not in text:
+        # If no JSON block, treat it as a conversational message (e.g., asking a question)
+        return RecommendationRecord(raw=text, intro=text)
+
+    # Split the text into the intro and the JSON block
+    intro_text, json_block = text.split(JSON_FENCE, 1)
+    json_string = json_block.split("```")[0].strip()
+    record = RecommendationRecord(raw=text, intro=intro_text, has_json=True)
+    try:
+        try:
+            data = json.loads(json_string)
+        except json.JSONDecodeError:
+            # Salvage what we can from truncated or slightly malformed JSON
+            data = repair_json(json_string)
+            if not isinstance(data, dict):
+                raise
+            record.repaired = True
+        record.recommendations = [Recommendation.from_dict(rec) for rec in data.get("recommendations", [])]
+    except json.JSONDecodeError:
+        record.error = GARBLED_JSON_ERROR
+    except Exception as e:
+        record.error = str(e)
+    return record
+
+
+# --- Streaming Parser ---
+
+# Matches the opening of the recommendations array inside the fenced block
+RECOMMENDATIONS_ARRAY = re.compile(r'"recommendations"\s*:\s*\[')
+
+
+def _partial_fence_length(text):
+    """Returns how many trailing characters of text could be the start of a ```json fence."""
+    for size in range(min(len(JSON_FENCE) - 1, len(text)), 0, -1):
+        if JSON_FENCE.startswith(text[-size:]):
+            return size
+    return 0
+
+
+class StreamingRecommendationParser:
+    """Incrementally splits a streamed reply into intro text and complete recommendation objects.
+
+    Each recommendation is emitted as soon as its closing brace arrives, so cards can be
+    rendered before the model has finished writing the rest of the JSON block. Replies
+    that start with "{" are treated as structured output, whose intro is read from the
+    partial JSON as it streams in.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.intro = ""
+        self.recommendations = []
+        self.has_json = False
+        self.structured = False
+        self.closed = False
+        self.repaired = False
+        self._json_start = None
+        self._scan_pos = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._obj_start = None
+
+    def feed(self, chunk):
+        """Adds a chunk of streamed text and returns the recommendations it completed."""
+        self.text += chunk
+
+        if not self.has_json and self.text.lstrip().startswith("{"):
+            self.structured = self.has_json = True
+            self._json_start = 0
+        if self.structured and self._scan_pos is None:
+            # The intro comes before the cards, so stop repairing once the array has started
+            data = repair_json(self.text)
+            if isinstance(data, dict) and isinstance(data.get("intro"), str):
+                self.intro = data["intro"]
+
+        if not self.has_json:
+            fence_at = self.text.find(JSON_FENCE)
+            if fence_at == -1:
+                # Hold back anything that might turn out to be the start of the fence
+                self.intro = self.text[:len(self.text) - _partial_fence_length(self.text)]
+                return []
+            self.intro = self.text[:fence_at]
+            self.has_json = True
+            self._json_start = fence_at + len(JSON_FENCE)
+
+        if self._scan_pos is None:
+            match = RECOMMENDATIONS_ARRAY.search(self.text, self._json_start)
+            if not match:
+                return []
+            self._scan_pos = match.end()
+
+        return self._scan()
+
+    def _scan(self):
+        """Walks the new characters of the array, tracking strings and brace depth."""
+        completed = []
+        text = self.text
+        pos = self._scan_pos
+
+        while pos < len(text) and not self.closed:
+            char = text[pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                if self._depth == 0:
+                    self._obj_start = pos
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        rec = json.loads(text[self._obj_start:pos + 1])
+                    except json.JSONDecodeError:
+                        rec = None
+                        self.repaired = True # A card was lost
+                    if isinstance(rec, dict):
+                        rec = Recommendation.from_dict(rec)
+                        self.recommendations.append(rec)
+                        completed.append(rec)
+            elif char == "]" and self._depth == 0:
+                self.closed = True
+            pos += 1
+
+        self._scan_pos = pos
+        return completed
+
+    def finish(self):
+        """Flushes held-back intro text and returns any recommendations only a full parse recovers."""
+        if not self.has_json:
+            self.intro = self.text
+            return []
+        if self.recommendations:
+            return []
+
+        # Nothing was emitted incrementally; fall back to repairing the whole block at once
+        json_string = self.text[self._json_start:]
+        if not self.structured:
+            json_string = json_string.split("```")[0]
+        data = repair_json(json_string)
+        if not isinstance(data, dict):
+            return []
+        try:
+            json.loads(json_string.strip())
+            self.closed = True # The whole block parsed, so no card is missing
+        except json.JSONDecodeError:
+            self.repaired = True
+        if self.structured and isinstance(data.get("intro"), str):
+            self.intro = data["intro"]
+        recommendations = [Recommendation.from_dict(rec) for rec in data.get("recommendations", [])]
+        self.recommendations.extend(recommendations)
+        return recommendations
+
+    def to_record(self):
+        """Returns the finished stream as a RecommendationRecord without re-parsing it."""
+        has_json = self.has_json
+        error = GARBLED_JSON_ERROR if has_json and not self.recommendations else None
+        if self.structured and not self.recommendations and isinstance(repair_json(self.text), dict):
+            # Structured output without cards is a conversational message, not a failure
+            has_json, error = False, None
+        # Cards emitted before the array was closed may be followed by ones that never arrived
+        repaired = bool(self.recommendations) and (self.repaired or not self.closed)
+        return RecommendationRecord(
+            raw=self.text,
+            intro=self.intro,
+            recommendations=list(self.recommendations),
+            has_json=has_json,
+            error=error,
+            repaired=repaired,
+        )
@@ -0,0 +1,142 @@
+import re
+import threading
+from collections import deque
+
+from gemini_client import percentile
+
+# --- Intent Classifier ---
+
+GREETING_PATTERN = re.compile(r"^(hi|hello|hey|heya|hiya|yo|howdy|good (morning|afternoon|evening))\b[\s!.,]*(there|bot)?[\s!.]*$")
+# The whole message has to be thanks (plus a few filler words), so "thanks, now a comedy" is a request
+THANKS_PATTERN = re.compile(
+    r"^((great|perfect|awesome|ok|okay),? )?(thanks|thank you|thx|cheers|ty)"
+    r"( (so|very) much| a lot| a bunch| again| mate| buddy| bot)*[\s!.,:)]*$"
+)
+RECOMMENDATION_PATTERN = re.compile(
+    r"\b(recommend\w*|suggest\w*|watch\w*|movies?|films?|shows?|series|tv|cinema|binge|"
+    r"more like|similar|something|anything|genre|comed\w*|drama\w*|thriller\w*|horror|sci-?fi|romance|romcom|"
+    r"action|animat\w*|documentar\w*|crime|mystery|fantasy|adventure|lighter|darker|funnier|scarier|"
+    r"pick|picks|options?|list|another|others?|again|lov\w*|liked|enjoy\w*|fan of|what else|mood|feel\w*|"
+    r"tonight|weekend|bored)\b"
+)
+
+# Lowercase words allowed inside a title written in title case ("Anatomy of a Fall")
+TITLE_SMALL_WORDS = {"a", "an", "and", "at", "for", "in", "of", "on", "the", "to", "vs"}
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+INTENTS = ("greeting", "thanks", "chit_chat", "recommendation")
+
+
+def normalize_text(text):
+    """Lowercases text down to its words, like catalog.normalize_title ("Dune: Part Two" -> "dune part two")."""
+    return " ".join(WORD_PATTERN.findall(text.lower()))
+
+
+def names_title(prompt, titles=frozenset()):
+    """True if a message names a known title, or looks like a title (quoted, or several words in title case)."""
+    padded = f" {normalize_text(prompt)} "
+    if any(f" {title} " in padded for title in titles):
+        return True
+    if re.search(r"[\"“].{2,}[\"”]", prompt):
+        return True
+    tokens = re.findall(r"[^\s:,.!?\-]+", prompt)
+    return len(tokens) >= 2 and all(
+        token[0].isupper() or token[0].isdigit() or token in TITLE_SMALL_WORDS for token in tokens
+    )
+
+
+def classify_intent(prompt, titles=frozenset()):
+    """Returns the intent of a user message: greeting, thanks, chit_chat or recommendation.
+
+    Anything that mentions titles, genres or asking for picks counts as a recommendation,
+    and so does anything ambiguous: sending a cheap turn to the main model only costs
+    money, while sending a recommendation to the cheap tier costs quality. titles holds
+    normalized catalog titles (see normalize_text), so a bare "Parasite" is a request too.
+    """
+    text = " ".join(prompt.lower().split())
+    if GREETING_PATTERN.match(text):
+        return "greeting"
+    if THANKS_PATTERN.match(text):
+        return "thanks"
+    if RECOMMENDATION_PATTERN.search(text) or names_title(prompt, titles):
+        return "recommendation"
+    if len(text.split()) <= 12:
+        return "chit_chat"
+    return "recommendation"
+
+
+# --- Routing ---
+
+# Where each intent goes: "canned" (a fixed reply, no model call), "lite" (the fast, cheap
+# model tier) or "main" (the full recommendation model)
+DEFAULT_ROUTES = {
+    "greeting": "canned",
+    "thanks": "canned",
+    "chit_chat": "lite",
+    "recommendation": "main",
+}
+
+CANNED_REPLIES = {
+    "greeting": "Well hello there! 🍿 Tell me what you're in the mood for, a genre you love, or the last thing "
+                "you watched, and I'll roll out the red carpet.",
+    "thanks": "Anytime! May your popcorn be buttery and your plot twists unguessable. Want more picks?",
+}
+
+# Approximate USD prices per million input / output tokens, for cost estimates only
+MODEL_PRICES = {
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+}
+
+
+class Router:
+    """Picks a route per turn from a routing table and keeps per-route latency and cost metrics."""
+
+    def __init__(self, routes=None, classify=classify_intent, model_names=None, prices=MODEL_PRICES, window=1000,
+                 titles=()):
+        self.routes = dict(DEFAULT_ROUTES, **(routes or {}))
+        self.classify = classify
+        self.titles = frozenset(normalize_text(title) for title in titles)
+        self.model_names = model_names or {"main": "gemini-2.5-flash", "lite": "gemini-2.5-flash-lite"}
+        self.prices = prices
+        self.window = window
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def route(self, prompt):
+        """Returns (intent, route) for a user message."""
+        intent = self.classify(prompt, self.titles)
+        return intent, self.routes.get(intent, "main")
+
+    def canned_reply(self, intent):
+        return CANNED_REPLIES[intent]
+
+    def cost(self, route, input_tokens, output_tokens):
+        """Returns the estimated USD cost of one call on a route."""
+        input_price, output_price = self.prices.get(self.model_names.get(route), (0.0, 0.0))
+        return ((input_tokens or 0) * input_price + (output_tokens or 0) * output_price) / 1_000_000
+
+    def record(self, route, latency, input_tokens=None, output_tokens=None):
+        """Records one routed turn's latency (seconds) and token usage."""
+        with self._lock:
+            metrics = self._metrics.setdefault(
+                route, {"turns": 0, "latency": deque(maxlen=self.window), "cost": 0.0, "tokens": 0}
+            )
+            metrics["turns"] += 1
+            metrics["latency"].append(latency)
+            metrics["tokens"] += (input_tokens or 0) + (output_tokens or 0)
+            metrics["cost"] += self.cost(route, input_tokens, output_tokens)
+
+    def stats(self):
+        """Returns turns, p50/p95 latency (ms), tokens and estimated cost per route."""
+        with self._lock:
+            return {
+                route: {
+                    "turns": metrics["turns"],
+                    "latency_p50_ms": percentile(metrics["latency"], 50) * 1000,
+                    "latency_p95_ms": percentile(metrics["latency"], 95) * 1000,
+                    "tokens": metrics["tokens"],
+                    "cost_usd": metrics["cost"],
+                }
+                for route, metrics in self._metrics.items()
+            }
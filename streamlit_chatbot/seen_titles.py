@@ -0,0 +1,139 @@
+import base64
+import hashlib
+import math
+from collections import deque
+
+from catalog import normalize_title
+
+
+class BloomFilter:
+    """A fixed-size set membership filter: no false negatives, false positives at about error_rate.
+
+    Sized for capacity items; it keeps answering past that, just with more false positives.
+    """
+
+    def __init__(self, capacity, error_rate=0.01, bits=None, hashes=None, data=None):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bits = bits or max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = hashes or max(1, round(self.bits / capacity * math.log(2)))
+        self.data = bytearray(data) if data is not None else bytearray((self.bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.bits for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.data[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.data[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def to_dict(self):
+        return {
+            "capacity": self.capacity,
+            "error_rate": self.error_rate,
+            "bits": self.bits,
+            "hashes": self.hashes,
+            "count": self.count,
+            "data": base64.b64encode(bytes(self.data)).decode("ascii"),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        bloom = cls(data["capacity"], data["error_rate"], data["bits"], data["hashes"], base64.b64decode(data["data"]))
+        bloom.count = data.get("count", 0)
+        return bloom
+
+
+class SeenTitles:
+    """The titles one user has already been shown, so later replies don't repeat them.
+
+    Titles are matched by their normalized form ("The Dark Knight!" == "the dark knight")
+    and kept as an exact set until there are more than max_exact of them; after that a
+    Bloom filter holds them in a few KB, at the cost of occasionally treating a new title
+    as seen. The last few display titles are kept separately for the prompt's exclusion
+    list, since a Bloom filter can't be listed.
+    """
+
+    def __init__(self, max_exact=1000, bloom_capacity=20000, error_rate=0.01, recent_limit=50):
+        self.max_exact = max_exact
+        self.bloom_capacity = bloom_capacity
+        self.error_rate = error_rate
+        self.exact = set()
+        self.bloom = None
+        self.recent = deque(maxlen=recent_limit)
+        self.filtered = 0
+        self.regenerations_saved = 0
+
+    def __len__(self):
+        return self.bloom.count if self.bloom is not None else len(self.exact)
+
+    def __contains__(self, title):
+        key = normalize_title(title)
+        return key in self.bloom if self.bloom is not None else key in self.exact
+
+    def add(self, titles):
+        """Marks titles as shown."""
+        for title in titles:
+            key = normalize_title(title)
+            if not key or key in self:
+                continue
+            if self.bloom is not None:
+                self.bloom.add(key)
+            else:
+                self.exact.add(key)
+                if len(self.exact) > self.max_exact:
+                    self._switch_to_bloom()
+            self.recent.append(title)
+
+    def _switch_to_bloom(self):
+        self.bloom = BloomFilter(self.bloom_capacity, self.error_rate)
+        for key in self.exact:
+            self.bloom.add(key)
+        self.exact = set()
+
+    def exclusions(self, limit=20):
+        """Returns the most recently shown titles, newest first, for the prompt's exclusion list."""
+        return list(reversed(self.recent))[:limit]
+
+    def drop_seen(self, recommendations):
+        """Returns (new recommendations, number of repeats dropped).
+
+        When every recommendation is a repeat they are all kept: a list of repeats is still
+        better than an empty one.
+        """
+        fresh = [rec for rec in recommendations if rec.title not in self]
+        dropped = len(recommendations) - len(fresh)
+        if not fresh:
+            return list(recommendations), 0
+        self.filtered += dropped
+        # The user got a usable list without rejecting it and asking again
+        self.regenerations_saved += dropped > 0
+        return fresh, dropped
+
+    def to_dict(self):
+        return {
+            "titles": sorted(self.exact),
+            "bloom": self.bloom.to_dict() if self.bloom is not None else None,
+            "recent": list(self.recent),
+            "filtered": self.filtered,
+            "regenerations_saved": self.regenerations_saved,
+        }
+
+    @classmethod
+    def from_dict(cls, data, **kwargs):
+        """Rebuilds an index saved with to_dict."""
+        seen = cls(**kwargs)
+        seen.exact = set(data.get("titles", []))
+        if data.get("bloom"):
+            seen.bloom = BloomFilter.from_dict(data["bloom"])
+        seen.recent.extend(data.get("recent", []))
+        seen.filtered = data.get("filtered", 0)
+        seen.regenerations_saved = data.get("regenerations_saved", 0)
+        return seen
@@ -0,0 +1,163 @@
+import json
+import sqlite3
+import threading
+import time
+
+from recommendations import RecommendationRecord
+
+
+class SessionStore:
+    """Persists chat sessions to SQLite so they survive browser refreshes and server restarts.
+
+    Writes are queued and flushed in batches by a background thread (write-behind), so a
+    chat turn never waits on the disk; flush() forces them out. Each session stores its
+    messages (with the parsed recommendation records), its mood and the compacted
+    conversation memory, which is enough to rebuild the Gemini chat without replaying
+    old turns through the model. Per-user data that outlives a single session (the titles
+    already shown to a user) is stored separately, keyed by user id.
+    """
+
+    def __init__(self, path="sessions.db", flush_interval=1.0, max_batch=50):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "session_id TEXT NOT NULL, seq INTEGER NOT NULL, role TEXT NOT NULL, content TEXT NOT NULL, "
+            "record TEXT, created_at REAL NOT NULL, PRIMARY KEY (session_id, seq))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, mood TEXT, memory TEXT, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS users (user_id TEXT PRIMARY KEY, seen_titles TEXT, updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._db_lock = threading.Lock()
+        self._pending_messages = []
+        self._pending_states = {}
+        self._pending_users = {}
+        self._pending_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._flusher = threading.Thread(target=self._flush_loop, name="session-store", daemon=True)
+        self._flusher.start()
+
+    # --- Writes (queued) ---
+
+    def append_message(self, session_id, seq, message):
+        """Queues message number seq of a session; message is a chat dict with an optional record."""
+        record = message.get("record")
+        row = (
+            session_id, seq, message["role"], message["content"],
+            json.dumps(record.to_dict()) if record is not None else None, time.time(),
+        )
+        with self._pending_lock:
+            self._pending_messages.append(row)
+            if len(self._pending_messages) >= self.max_batch:
+                self._wake.set()
+
+    def save_state(self, session_id, mood, memory):
+        """Queues a session's mood and memory state (the latest queued state wins)."""
+        with self._pending_lock:
+            self._pending_states[session_id] = (mood, json.dumps(memory), time.time())
+
+    def save_seen_titles(self, user_id, seen_titles):
+        """Queues a user's seen-titles index (a SeenTitles.to_dict() dict)."""
+        with self._pending_lock:
+            self._pending_users[user_id] = (json.dumps(seen_titles), time.time())
+
+    def flush(self):
+        """Writes every queued message and state in one transaction.
+
+        The database lock is held from taking the queues to writing them, so concurrent
+        flushes (the background one and a reader's) write their batches in queue order and
+        an older state can't overwrite a newer one.
+        """
+        with self._db_lock:
+            with self._pending_lock:
+                messages, self._pending_messages = self._pending_messages, []
+                states, self._pending_states = self._pending_states, {}
+                users, self._pending_users = self._pending_users, {}
+            if not messages and not states and not users:
+                return
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO messages (session_id, seq, role, content, record, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    messages,
+                )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO sessions (session_id, mood, memory, updated_at) VALUES (?, ?, ?, ?)",
+                    [(session_id, *state) for session_id, state in states.items()],
+                )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO users (user_id, seen_titles, updated_at) VALUES (?, ?, ?)",
+                    [(user_id, *state) for user_id, state in users.items()],
+                )
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        """Stops the background flusher and writes anything still queued."""
+        self._closed = True
+        self._wake.set()
+        self._flusher.join()
+        self.flush()
+        self._conn.close()
+
+    # --- Reads ---
+
+    def load_state(self, session_id):
+        """Returns (mood, memory dict) for a stored session, or None if it is unknown."""
+        self.flush()
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT mood, memory FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]) if row[1] else {}
+
+    def load_seen_titles(self, user_id):
+        """Returns a user's stored seen-titles dict, or None if there is none."""
+        self.flush()
+        with self._db_lock:
+            row = self._conn.execute("SELECT seen_titles FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def message_count(self, session_id):
+        """Returns the number of stored messages; the next message's seq."""
+        self.flush()
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT COALESCE(MAX(seq) + 1, 0) FROM messages WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row[0]
+
+    def load_messages(self, session_id, limit, before_seq=None):
+        """Returns up to limit (seq, message) pairs before before_seq, most recent page first.
+
+        The page itself is in chronological order, ready to prepend to the chat history.
+        """
+        self.flush()
+        if before_seq is None:
+            before_seq = self.message_count(session_id)
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT seq, role, content, record FROM messages WHERE session_id = ? AND seq < ? "
+                "ORDER BY seq DESC LIMIT ?",
+                (session_id, before_seq, limit),
+            ).fetchall()
+        return [
+            (seq, {"role": role, "content": content,
+                   "record": RecommendationRecord.from_dict(json.loads(record)) if record else None})
+            for seq, role, content, record in reversed(rows)
+        ]
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import re
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from catalog import MovieCatalog, normalize_title, tokenize
+
+EMBEDDING_DIM = 512
+
+# "more like Dune: Part Two", "something similar to Heat", "shows like Fargo"
+MORE_LIKE_PATTERN = re.compile(
+    r"\b(?:more|something|anything|stuff|movies?|films?|shows?|series)\s+(?:just\s+)?"
+    r"(?:like|similar\s+to)\s+(?P<title>.+)",
+    re.IGNORECASE,
+)
+
+# --- Embedders ---
+
+
+class HashingEmbedder:
+    """Offline embedder: TF-IDF weighted hashed bag of words, no network or model needed."""
+
+    name = "hashing"
+
+    def __init__(self, dim=EMBEDDING_DIM):
+        self.dim = dim
+
+    def _bucket(self, token):
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        return value % self.dim, 1.0 if value >> 63 else -1.0
+
+    def embed(self, texts):
+        token_lists = [tokenize(text) for text in texts]
+        document_freq = {}
+        for tokens in token_lists:
+            for token in set(tokens):
+                document_freq[token] = document_freq.get(token, 0) + 1
+
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, tokens in enumerate(token_lists):
+            for token in tokens:
+                bucket, sign = self._bucket(token)
+                idf = np.log((1 + len(texts)) / (1 + document_freq[token])) + 1.0
+                matrix[row, bucket] += sign * idf
+        return matrix
+
+
+class GeminiEmbedder:
+    """Embeds texts with the Gemini embedding endpoint, in batches."""
+
+    name = "gemini"
+
+    def __init__(self, model="models/text-embedding-004", batch_size=100):
+        self.model = model
+        self.batch_size = batch_size
+
+    def embed(self, texts):
+        import google.generativeai as genai
+
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            result = genai.embed_content(model=self.model, content=batch, task_type="retrieval_document")
+            vectors.extend(result["embedding"])
+        return np.asarray(vectors, dtype=np.float32)
+
+
+def catalog_documents(catalog):
+    """Returns the text embedded for each catalog row: title, genres and synopsis."""
+    return [
+        f"{row.title}. {row.genres.replace('|', ' ')}. {row.synopsis}"
+        for row in catalog.frame.itertuples(index=False)
+    ]
+
+
+# --- Index ---
+
+
+def build_embeddings(catalog, path, embedder=None):
+    """Embeds every catalog synopsis and saves the normalized matrix plus its metadata to disk."""
+    embedder = embedder or HashingEmbedder()
+    matrix = embedder.embed(catalog_documents(catalog))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.where(norms == 0, 1.0, norms)
+
+    path = Path(path)
+    np.save(path, matrix)
+    metadata = {"embedder": embedder.name, "titles": catalog.frame["title"].tolist()}
+    path.with_suffix(".json").write_text(json.dumps(metadata))
+    return path
+
+
+class SimilarityIndex:
+    """Cosine top-k search over a memory-mapped matrix of unit-length synopsis embeddings."""
+
+    def __init__(self, matrix, titles):
+        self.matrix = matrix
+        self.titles = titles
+        self.title_rows = {normalize_title(title): row for row, title in enumerate(titles)}
+
+    @classmethod
+    def load(cls, path):
+        """Opens an index written by build_embeddings without reading the matrix into memory."""
+        path = Path(path)
+        metadata = json.loads(path.with_suffix(".json").read_text())
+        return cls(np.load(path, mmap_mode="r"), metadata["titles"])
+
+    def find_title(self, text):
+        """Resolves free text to an indexed title: exact match first, then the longest title it contains."""
+        normalized = normalize_title(text)
+        if normalized in self.title_rows:
+            return self.titles[self.title_rows[normalized]]
+        padded = f" {normalized} "
+        contained = [title for title in self.title_rows if f" {title} " in padded]
+        if not contained:
+            return None
+        return self.titles[self.title_rows[max(contained, key=len)]]
+
+    def query(self, vectors, k=5, exclude=None):
+        """Returns (row ids, scores) of the k nearest rows for each query vector, best first.
+
+        vectors is a (batch, dim) array of unit-length queries; exclude optionally holds one
+        row id per query to leave out (the query title itself).
+        """
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        scores = vectors @ self.matrix.T
+        if exclude is not None:
+            scores[np.arange(len(scores)), exclude] = -np.inf
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+    def more_like(self, titles, k=5):
+        """Returns, for each title, the k most similar other titles as (title, score) pairs."""
+        rows = np.array([self.title_rows[normalize_title(title)] for title in titles])
+        top, scores = self.query(self.matrix[rows], k=k, exclude=rows)
+        return [
+            [(self.titles[row], float(score)) for row, score in zip(row_ids, row_scores)]
+            for row_ids, row_scores in zip(top, scores)
+        ]
+
+
+def parse_more_like(prompt):
+    """Returns the title text of a "more like X" request, or None."""
+    match = MORE_LIKE_PATTERN.search(prompt)
+    if not match:
+        return None
+    return match.group("title").strip(" .!?\"'")
+
+
+if __name__ == "__main__":
+    # Offline build step: python similarity.py [catalog.csv] [embeddings.npy] [hashing|gemini]
+    data_dir = Path(__file__).parent / "data"
+    catalog_path = sys.argv[1] if len(sys.argv) > 1 else data_dir / "movies.csv"
+    index_path = sys.argv[2] if len(sys.argv) > 2 else data_dir / "embeddings.npy"
+    embedder = HashingEmbedder()
+    if len(sys.argv) > 3 and sys.argv[3] == "gemini":
+        import os
+
+        import google.generativeai as genai
+
+        genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
+        embedder = GeminiEmbedder()
+    catalog = MovieCatalog.load(catalog_path)
+    print(f"Wrote {build_embeddings(catalog, index_path, embedder)} ({len(catalog)} titles, {embedder.name})")
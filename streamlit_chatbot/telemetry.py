@@ -0,0 +1,157 @@
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+
+# Histogram buckets (seconds) for per-stage timings
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class TurnTrace:
+    """Stage timings, token counts and outcome flags for one chat turn."""
+
+    def __init__(self, session_id):
+        self.turn_id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.started_at = time.time()
+        self.stages = {}
+        self.input_tokens = None
+        self.output_tokens = None
+        self.prompt_tokens = {}
+        self.route = None
+        self.cache_hit = False
+        self.warm_hit = False
+        self.prefetch_hit = False
+        self.parse_failure = False
+        self.reprompted = False
+        self.repeats_filtered = 0
+        self.regeneration_saved = False
+        self.coalesced = False
+        self.error = None
+
+    def add(self, stage, seconds):
+        """Adds seconds to a stage (stages can be entered several times per turn)."""
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name):
+        """Times the enclosed block as part of stage name."""
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def record_usage(self, response):
+        """Copies input/output token counts from a Gemini response's usage metadata."""
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return
+        self.input_tokens = getattr(usage, "prompt_token_count", None)
+        self.output_tokens = getattr(usage, "candidates_token_count", None)
+
+    def to_dict(self):
+        return {
+            "turn_id": self.turn_id,
+            "session_id": self.session_id,
+            "started_at": self.started_at,
+            "stages_ms": {stage: round(seconds * 1000, 3) for stage, seconds in self.stages.items()},
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "prompt_tokens": self.prompt_tokens,
+            "route": self.route,
+            "cache_hit": self.cache_hit,
+            "warm_hit": self.warm_hit,
+            "prefetch_hit": self.prefetch_hit,
+            "parse_failure": self.parse_failure,
+            "reprompted": self.reprompted,
+            "repeats_filtered": self.repeats_filtered,
+            "regeneration_saved": self.regeneration_saved,
+            "coalesced": self.coalesced,
+            "error": self.error,
+        }
+
+
+class Telemetry:
+    """Collects turn traces into a JSONL log and Prometheus-style counters and histograms.
+
+    The Prometheus text is rewritten to prometheus_path after every turn, so it can be
+    scraped by a node-exporter textfile collector or simply read by hand.
+    """
+
+    def __init__(self, log_path=None, prometheus_path=None, recent=50):
+        self.log_path = Path(log_path) if log_path else None
+        self.prometheus_path = Path(prometheus_path) if prometheus_path else None
+        self.recent = deque(maxlen=recent)
+        self.counters = {
+            "turns_total": 0,
+            "cache_hits_total": 0,
+            "warm_hits_total": 0,
+            "prefetch_hits_total": 0,
+            "parse_failures_total": 0,
+            "reprompts_total": 0,
+            "repeats_filtered_total": 0,
+            "regenerations_saved_total": 0,
+            "coalesced_total": 0,
+            "errors_total": 0,
+            "input_tokens_total": 0,
+            "output_tokens_total": 0,
+        }
+        self.stage_buckets = {}
+        self.stage_sums = {}
+        self.stage_counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, trace):
+        """Logs a finished turn and folds it into the aggregates."""
+        entry = trace.to_dict()
+        with self._lock:
+            self.recent.append(entry)
+            self.counters["turns_total"] += 1
+            self.counters["cache_hits_total"] += trace.cache_hit
+            self.counters["warm_hits_total"] += trace.warm_hit
+            self.counters["prefetch_hits_total"] += trace.prefetch_hit
+            self.counters["parse_failures_total"] += trace.parse_failure
+            self.counters["reprompts_total"] += trace.reprompted
+            self.counters["repeats_filtered_total"] += trace.repeats_filtered
+            self.counters["regenerations_saved_total"] += trace.regeneration_saved
+            self.counters["coalesced_total"] += trace.coalesced
+            self.counters["errors_total"] += trace.error is not None
+            self.counters["input_tokens_total"] += trace.input_tokens or 0
+            self.counters["output_tokens_total"] += trace.output_tokens or 0
+            for stage, seconds in trace.stages.items():
+                buckets = self.stage_buckets.setdefault(stage, [0] * len(STAGE_BUCKETS))
+                for i, bound in enumerate(STAGE_BUCKETS):
+                    if seconds <= bound:
+                        buckets[i] += 1
+                self.stage_sums[stage] = self.stage_sums.get(stage, 0.0) + seconds
+                self.stage_counts[stage] = self.stage_counts.get(stage, 0) + 1
+
+            if self.log_path:
+                with self.log_path.open("a", encoding="utf-8") as log:
+                    log.write(json.dumps(entry) + "\n")
+            if self.prometheus_path:
+                self.prometheus_path.write_text(self._prometheus_text())
+
+    def prometheus_text(self):
+        """Returns the aggregates in the Prometheus text exposition format."""
+        with self._lock:
+            return self._prometheus_text()
+
+    def _prometheus_text(self):
+        lines = []
+        for name, value in self.counters.items():
+            lines.append(f"# TYPE blockbuster_{name} counter")
+            lines.append(f"blockbuster_{name} {value}")
+
+        lines.append("# TYPE blockbuster_stage_seconds histogram")
+        for stage, buckets in self.stage_buckets.items():
+            for bound, count in zip(STAGE_BUCKETS, buckets):
+                lines.append(f'blockbuster_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'blockbuster_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {self.stage_counts[stage]}')
+            lines.append(f'blockbuster_stage_seconds_sum{{stage="{stage}"}} {self.stage_sums[stage]:.6f}')
+            lines.append(f'blockbuster_stage_seconds_count{{stage="{stage}"}} {self.stage_counts[stage]}')
+        return "\n".join(lines) + "\n"
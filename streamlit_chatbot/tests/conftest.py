@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The bot's modules are flat files imported as siblings, like the app itself does
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
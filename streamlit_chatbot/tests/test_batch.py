@@ -0,0 +1,103 @@
+import json
+
+from batch import BatchRunner, compact_checkpoint, completed_ids, latest_results, normalize_row
+from fake_gemini import FakeAPIError, FakeModel
+from prompts import PromptBuilder, select_persona
+
+PROMPTS = ["Recommend a crime thriller!", "Something lighter please", "Any good sci-fi?"]
+
+
+def write_lines(path, results):
+    path.write_text("".join(json.dumps(result) + "\n" for result in results), encoding="utf-8")
+
+
+def make_runner(failures=None, shape="recommendations", concurrency=1, rpm=60_000):
+    builder = PromptBuilder(select_persona(structured=True))
+    model = FakeModel(failures=failures, shape=shape, system_instruction=builder.system_instruction)
+    return BatchRunner(model, builder, concurrency=concurrency, rpm=rpm)
+
+
+def run_batch(rows, checkpoint, failures=None, shape="recommendations"):
+    with checkpoint.open("a", encoding="utf-8") as out:
+        return make_runner(failures, shape).run(rows, out)
+
+
+def test_failed_rows_are_not_completed(tmp_path):
+    checkpoint = tmp_path / "results.jsonl"
+    write_lines(checkpoint, [
+        {"id": "a", "recommendations": [], "error": None},
+        {"id": "b", "recommendations": [], "error": "400 fake API error"},
+    ])
+    with checkpoint.open("a", encoding="utf-8") as f:
+        f.write('{"id": "c", "recom') # Cut short by an interrupted run
+    assert completed_ids(checkpoint) == {"a"}
+
+
+def test_repaired_rows_are_not_completed(tmp_path):
+    checkpoint = tmp_path / "results.jsonl"
+    write_lines(checkpoint, [
+        {"id": "a", "intro": "clean", "error": None, "repaired": False},
+        {"id": "b", "intro": "clean", "error": None, "repaired": False},
+        {"id": "b", "intro": "cut off", "error": None, "repaired": True},
+        {"id": "c", "intro": "cut off", "error": None, "repaired": True},
+    ])
+    assert completed_ids(checkpoint) == {"a", "b"}
+    assert latest_results(checkpoint)["b"]["intro"] == "clean"
+
+
+def test_latest_successful_row_wins(tmp_path):
+    checkpoint = tmp_path / "results.jsonl"
+    write_lines(checkpoint, [
+        {"id": "a", "intro": "first", "error": None},
+        {"id": "b", "intro": "failed", "error": "garbled"},
+        {"id": "b", "intro": "retried", "error": None},
+        {"id": "a", "intro": "second", "error": None},
+        {"id": "b", "intro": "failed again", "error": "garbled"},
+        {"id": "c", "intro": "failed", "error": "garbled"},
+        {"id": "c", "intro": "failed later", "error": "garbled"},
+    ])
+    results = latest_results(checkpoint)
+    assert {row_id: result["intro"] for row_id, result in results.items()} == {
+        "a": "second", "b": "retried", "c": "failed later",
+    }
+
+
+def test_resume_retries_only_failures_and_compacts_the_output(tmp_path):
+    checkpoint = tmp_path / "results.jsonl"
+    rows = [normalize_row({"prompt": prompt}) for prompt in PROMPTS]
+
+    # The first prompt fails for good (400 is not retried)
+    assert run_batch(rows, checkpoint, failures=[FakeAPIError(400)]) == 3
+    failed_id = rows[0]["id"]
+    assert completed_ids(checkpoint) == {row["id"] for row in rows[1:]}
+
+    pending = [row for row in rows if row["id"] not in completed_ids(checkpoint)]
+    assert [row["id"] for row in pending] == [failed_id]
+    run_batch(pending, checkpoint)
+    assert completed_ids(checkpoint) == {row["id"] for row in rows}
+
+    results = compact_checkpoint(checkpoint)
+    lines = [json.loads(line) for line in checkpoint.read_text(encoding="utf-8").splitlines()]
+    assert [result["id"] for result in lines] == list(results) and len(lines) == 3
+    assert all(result["error"] is None and result["recommendations"] for result in lines)
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_a_cut_off_reply_is_run_again(tmp_path):
+    checkpoint = tmp_path / "results.jsonl"
+    rows = [normalize_row({"prompt": PROMPTS[0]})]
+    run_batch(rows, checkpoint, shape="garbled")
+    [result] = latest_results(checkpoint).values()
+    assert result["repaired"] and result["recommendations"]
+    assert completed_ids(checkpoint) == set()
+
+    run_batch(rows, checkpoint)
+    assert completed_ids(checkpoint) == {rows[0]["id"]}
+
+
+def test_retries_take_a_token_from_the_rate_limit():
+    runner = make_runner(failures=[FakeAPIError(503)], concurrency=2, rpm=6)
+    assert runner.client.limiter is runner.limiter
+    result = runner.run_one(normalize_row({"prompt": PROMPTS[0]}))
+    # Both attempts drew from the two-token burst, and tokens come back at one per ten seconds
+    assert result["error"] is None and runner.limiter.tokens < 1
@@ -0,0 +1,38 @@
+from pathlib import Path
+
+import pandas as pd
+
+from catalog import MovieCatalog
+
+DATA_PATH = Path(__file__).resolve().parent.parent / "data" / "movies.csv"
+
+
+def make_catalog(rows):
+    frame = pd.DataFrame(rows, columns=["title", "year", "kind", "genres", "imdb_rating", "synopsis", "poster_url"])
+    return MovieCatalog(frame)
+
+
+def test_top_picks_are_the_newest_best_rated_titles():
+    catalog = make_catalog([
+        ("Old", 1995, "Movie", "Crime", 8.3, "", "https://posters.example/old.jpg"),
+        ("New", 2024, "Movie", "Drama", 7.1, "", "https://posters.example/new.jpg"),
+        ("Better", 2024, "Movie", "Drama", 8.0, "", "https://posters.example/better.jpg"),
+    ])
+    assert catalog.top_picks(2)["title"].tolist() == ["Better", "New"]
+
+
+def test_top_picks_prefer_titles_with_a_poster():
+    catalog = make_catalog([
+        ("No Poster", 2024, "Movie", "Drama", 8.5, "", None),
+        ("Poster", 2010, "Movie", "Crime", 7.0, "", "https://posters.example/poster.jpg"),
+    ])
+    picks = catalog.top_picks(2)
+    assert picks["title"].tolist() == ["Poster", "No Poster"]
+    assert list(picks.columns) == list(catalog.frame.columns)
+
+
+def test_sidebar_picks_from_the_bundled_catalog_have_posters():
+    catalog = MovieCatalog.load(DATA_PATH)
+    with_posters = (catalog.frame["poster_url"] != "").sum()
+    picks = catalog.top_picks(3)
+    assert (picks["poster_url"] != "").sum() == min(3, with_posters)
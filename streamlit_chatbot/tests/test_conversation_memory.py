@@ -0,0 +1,97 @@
+from conversation_memory import (
+    MAX_RECOMMENDED_TITLES, MAX_TASTES, MAX_TOKEN_COUNTS, ConversationMemory, estimate_tokens,
+)
+
+
+def make_memory(**kwargs):
+    return ConversationMemory("You are a film critic.", **kwargs)
+
+
+def add_turns(memory, count, reply_size=400):
+    for i in range(count):
+        memory.add_turn(f"request {i}", "x" * reply_size, titles=[f"Title {i}"], input_tokens=100 + i)
+
+
+def test_memory_under_budget_keeps_every_turn():
+    memory = make_memory(token_budget=10_000, keep_turns=2)
+    add_turns(memory, 5)
+    assert not memory.compact()
+    assert len(memory.turns) == 5 and memory.folded_turns == 0
+
+
+def test_compact_folds_oldest_turns_into_the_summary():
+    memory = make_memory(token_budget=300, keep_turns=2)
+    add_turns(memory, 6)
+    assert memory.compact()
+    assert [turn.user for turn in memory.turns][-2:] == ["request 4", "request 5"]
+    assert memory.folded_turns == 6 - len(memory.turns)
+    summary = memory.summary()
+    assert "request 0" in summary and "Title 0" in summary
+    assert memory.history_tokens() <= 300 or len(memory.turns) == 2
+
+
+def test_compact_never_folds_the_kept_turns():
+    memory = make_memory(token_budget=1, keep_turns=3)
+    add_turns(memory, 5)
+    memory.compact()
+    assert len(memory.turns) == 3
+
+
+def test_build_history_opens_with_preamble_and_summary():
+    memory = make_memory(token_budget=300, keep_turns=1)
+    add_turns(memory, 4)
+    memory.compact()
+    history = memory.build_history()
+    assert history[0]["role"] == "user"
+    assert history[0]["parts"][0].startswith("You are a film critic.")
+    assert "Summary of our earlier conversation" in history[0]["parts"][0]
+    assert history[-1] == {"role": "model", "parts": [memory.turns[-1].model]}
+
+
+def test_empty_preamble_without_summary_skips_the_opening_pair():
+    memory = ConversationMemory("")
+    memory.add_turn("hi", "hello")
+    assert memory.build_history() == [{"role": "user", "parts": ["hi"]}, {"role": "model", "parts": ["hello"]}]
+
+
+def test_summary_lists_and_token_counts_are_capped():
+    memory = make_memory(token_budget=1, keep_turns=1)
+    for i in range(MAX_TOKEN_COUNTS + 20):
+        memory.add_turn(f"request {i}", "reply", titles=[f"Title {i}"], input_tokens=i)
+        memory.compact()
+    assert len(memory.tastes) == MAX_TASTES
+    assert len(memory.recommended_titles) == MAX_RECOMMENDED_TITLES
+    counts = memory.input_token_counts()
+    assert len(counts) == MAX_TOKEN_COUNTS and counts[-1] == MAX_TOKEN_COUNTS + 19
+
+
+def test_to_dict_round_trip_restores_the_compacted_state():
+    memory = make_memory(token_budget=300, keep_turns=2)
+    add_turns(memory, 6)
+    memory.compact()
+    restored = ConversationMemory.from_dict(memory.to_dict(), memory.preamble, token_budget=300, keep_turns=2)
+    assert restored.build_history() == memory.build_history()
+    assert restored.input_token_counts() == memory.input_token_counts()
+
+
+def test_estimate_tokens_is_never_zero():
+    assert estimate_tokens("") == 1
+    assert estimate_tokens("a" * 40) == 10
+
+
+def test_model_turns_skip_canned_replies():
+    memory = make_memory(token_budget=150, keep_turns=1)
+    memory.add_turn("hi", "Hello! What are you in the mood for?", canned=True)
+    assert memory.model_turns == 0
+    memory.add_turn("I had a terrible day", "Oh no! Want something uplifting?")
+    assert memory.model_turns == 1
+    restored = ConversationMemory.from_dict(memory.to_dict(), memory.preamble)
+    assert restored.model_turns == 1
+
+
+def test_old_saves_count_every_turn_as_a_model_turn():
+    memory = make_memory()
+    memory.add_turn("hi", "Hello!", canned=True)
+    data = memory.to_dict()
+    del data["model_turns"]
+    assert ConversationMemory.from_dict(data, memory.preamble).model_turns == 1
@@ -0,0 +1,47 @@
+import multiprocessing
+import time
+
+import pytest
+
+import bench_coordination
+from response_cache import ResponseCache, SQLiteBackend
+
+PROCESSES = 3
+RATE = 20.0
+CAPACITY = 5.0
+
+
+@pytest.fixture(scope="module")
+def pool():
+    """Replica processes, spawned so each opens the databases from scratch like a separate server would."""
+    with multiprocessing.get_context("spawn").Pool(PROCESSES) as pool:
+        yield pool
+
+
+def test_busiest_window():
+    assert bench_coordination.busiest_window([], 1.0) == 0
+    assert bench_coordination.busiest_window([0.0, 0.2, 0.4, 1.1, 1.2, 1.3], 1.0) == 4
+
+
+def test_replicas_share_one_quota(pool, tmp_path):
+    seconds = 2.0
+    start_at = time.time() + 1.0 # Lets every process finish starting up first
+    job = (str(tmp_path / "quota.db"), "shared", RATE, CAPACITY, 2, seconds, 0.01, start_at)
+    stamps = [stamp for replica in pool.starmap(bench_coordination.hammer, [job] * PROCESSES) for stamp in replica]
+    assert stamps
+    for window in (1.0, seconds):
+        # One request of slack for clock granularity
+        assert bench_coordination.busiest_window(stamps, window) <= CAPACITY + RATE * window + 1
+
+
+def test_identical_requests_across_replicas_run_once(pool, tmp_path):
+    job = (str(tmp_path / "singleflight.db"), time.time() + 1.0)
+    results = pool.starmap(bench_coordination.lead_or_follow, [job] * PROCESSES)
+    assert sum(not shared for _, shared in results) == 1
+    assert len({value for value, _ in results}) == 1
+
+
+def test_a_reply_cached_by_one_replica_is_a_hit_in_another(pool, tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    pool.apply(bench_coordination.cache_reply, (db_path,))
+    assert ResponseCache(SQLiteBackend(db_path)).get("recommend a crime thriller", "okay") is not None
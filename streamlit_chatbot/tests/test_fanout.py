@@ -0,0 +1,40 @@
+import json
+from types import SimpleNamespace
+
+from fanout import GARBLED_PICKS_INTRO, FanOutGenerator
+
+
+class ReplyingClient:
+    """Answers every pick call with the same text."""
+
+    def __init__(self, text):
+        self.text = text
+
+    def send_message(self, chat, prompt, **kwargs):
+        return SimpleNamespace(text=self.text)
+
+
+def pick(text):
+    _, intro, picks = FanOutGenerator(ReplyingClient(text), model=None, workers=1).pick(chat=None, prompt="Heist films")
+    return intro, picks
+
+
+def test_pick_reads_intro_and_titles():
+    intro, picks = pick(json.dumps({"intro": "Grab the popcorn.", "titles": [
+        {"title": "Heat", "imdb_rating": "8.3/10"}, {"title": "Inside Man"}, {"imdb_rating": "9/10"},
+    ]}))
+    assert intro == "Grab the popcorn."
+    assert [(rec.title, rec.imdb_rating) for rec in picks] == [("Heat", "8.3/10"), ("Inside Man", "N/A")]
+
+
+def test_pick_without_titles_is_a_question():
+    assert pick(json.dumps({"intro": "Older or newer films?", "titles": []})) == ("Older or newer films?", [])
+
+
+def test_garbled_pick_is_told_apart_from_a_question():
+    assert pick("titles: Heat, Ronin") == (None, [])
+
+
+def test_generate_apologises_for_garbled_picks():
+    generator = FanOutGenerator(ReplyingClient("titles: Heat, Ronin"), model=None, workers=1)
+    assert generator.generate(chat=None, prompt="Heist films", request="Heist films") == (GARBLED_PICKS_INTRO, [])
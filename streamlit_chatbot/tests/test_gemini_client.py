@@ -0,0 +1,230 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from fake_gemini import FakeAPIError, FakeModel
+from gemini_client import GeminiBusyError, GeminiClient, GeminiError, is_retryable, percentile
+from rate_limit import TokenBucket
+
+PROMPT = "Recommend a crime thriller!"
+
+
+def make_client(**kwargs):
+    """A client whose backoff sleeps are recorded instead of slept."""
+    sleeps = []
+    kwargs.setdefault("base_delay", 0.5)
+    client = GeminiClient(sleep=sleeps.append, **kwargs)
+    return client, sleeps
+
+
+class CountingLimiter:
+    def __init__(self):
+        self.taken = 0
+
+    def acquire(self, tokens=1, timeout=None):
+        self.taken += tokens
+        return True
+
+
+class ConcurrencyProbe:
+    """A model that records how many calls run at once."""
+
+    def __init__(self, latency=0.05):
+        self.latency = latency
+        self.running = 0
+        self.most = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, **kwargs):
+        with self._lock:
+            self.running += 1
+            self.most = max(self.most, self.running)
+        time.sleep(self.latency)
+        with self._lock:
+            self.running -= 1
+        return prompt
+
+
+class BrokenStreamChat:
+    """A chat whose stream fails after its first chunk."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def send_message(self, prompt, stream=False, **kwargs):
+        self.calls += 1
+
+        def chunks():
+            yield "Buckle up"
+            raise FakeAPIError(503)
+
+        return chunks()
+
+
+# --- Retries ---
+
+
+@pytest.mark.parametrize("error, retryable", [
+    (FakeAPIError(429), True),
+    (FakeAPIError(503), True),
+    (FakeAPIError(400), False),
+    (TimeoutError(), True),
+    (ConnectionError(), True),
+    (ValueError("bad request"), False),
+])
+def test_is_retryable(error, retryable):
+    assert is_retryable(error) is retryable
+
+
+def test_retryable_errors_are_retried_with_backoff():
+    model = FakeModel(failures=[FakeAPIError(429), FakeAPIError(503)])
+    client, sleeps = make_client(max_retries=3)
+    response = client.generate_content(model, PROMPT)
+    assert response.text and model.calls == 3
+    assert len(sleeps) == 2 and 0 <= sleeps[0] <= 0.5 and 0 <= sleeps[1] <= 1.0
+    summary = client.metrics.summary()
+    assert summary["calls"] == 1 and summary["retries"] == 2 and summary["failures"] == 0
+
+
+def test_non_retryable_errors_fail_at_once():
+    model = FakeModel(failures=[FakeAPIError(400)])
+    client, sleeps = make_client()
+    with pytest.raises(GeminiError) as raised:
+        client.generate_content(model, PROMPT)
+    assert isinstance(raised.value.__cause__, FakeAPIError)
+    assert model.calls == 1 and sleeps == [] and client.metrics.failures == 1
+
+
+def test_retries_give_up_after_max_retries():
+    model = FakeModel(failures=[FakeAPIError(503)] * 5)
+    client, sleeps = make_client(max_retries=2)
+    with pytest.raises(GeminiError):
+        client.generate_content(model, PROMPT)
+    assert model.calls == 3 and len(sleeps) == 2
+
+
+def test_backoff_is_capped():
+    client, _ = make_client(base_delay=1.0, max_delay=4.0)
+    assert all(0 <= client.backoff(attempt) <= 4.0 for attempt in range(10) for _ in range(20))
+
+
+def test_calls_carry_a_deadline():
+    seen = {}
+
+    class Model:
+        def generate_content(self, prompt, **kwargs):
+            seen.update(kwargs)
+            return prompt
+
+    client, _ = make_client(timeout=12.0)
+    client.generate_content(Model(), PROMPT)
+    assert seen["request_options"] == {"timeout": 12.0}
+
+
+def test_chat_messages_are_retried_too():
+    model = FakeModel(failures=[FakeAPIError(503)])
+    chat = model.start_chat()
+    client, _ = make_client()
+    assert client.send_message(chat, PROMPT).text
+    assert len(chat.history) == 2
+
+
+# --- Concurrency and quota ---
+
+
+def test_in_flight_calls_never_exceed_the_cap():
+    probe = ConcurrencyProbe()
+    client, _ = make_client(max_in_flight=2)
+    threads = [threading.Thread(target=client.generate_content, args=(probe, PROMPT)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert probe.most == 2 and client.metrics.calls == 8
+
+
+def test_waiting_too_long_for_a_slot_raises_busy():
+    client, _ = make_client(max_in_flight=1, queue_timeout=0.05)
+    busy = threading.Thread(target=client.generate_content, args=(ConcurrencyProbe(latency=0.5), PROMPT))
+    busy.start()
+    time.sleep(0.05)
+    with pytest.raises(GeminiBusyError):
+        client.generate_content(FakeModel(), PROMPT)
+    busy.join()
+    # The slot is released again afterwards
+    assert client.generate_content(FakeModel(), PROMPT).text
+
+
+def test_every_attempt_takes_a_quota_token():
+    limiter = CountingLimiter()
+    client, _ = make_client(limiter=limiter)
+    client.generate_content(FakeModel(failures=[FakeAPIError(503), FakeAPIError(503)]), PROMPT)
+    assert limiter.taken == 3
+
+
+def test_an_exhausted_quota_raises_busy():
+    limiter = TokenBucket(rate=0.01, capacity=1)
+    client, _ = make_client(limiter=limiter, queue_timeout=0.05)
+    client.generate_content(FakeModel(), PROMPT)
+    with pytest.raises(GeminiBusyError):
+        client.generate_content(FakeModel(), PROMPT)
+
+
+# --- Streaming ---
+
+
+def test_stream_retries_before_the_first_chunk():
+    model = FakeModel(failures=[FakeAPIError(503)], chunk_size=10)
+    client, sleeps = make_client()
+    chunks = [chunk.text for chunk in client.stream_message(model.start_chat(), PROMPT)]
+    assert len(chunks) > 1 and model.calls == 2 and len(sleeps) == 1
+    assert client.metrics.calls == 1
+
+
+def test_stream_failure_after_the_first_chunk_is_not_retried():
+    chat = BrokenStreamChat()
+    client, sleeps = make_client()
+    received = []
+    with pytest.raises(GeminiError):
+        for chunk in client.stream_message(chat, PROMPT):
+            received.append(chunk)
+    assert received == ["Buckle up"] and chat.calls == 1 and sleeps == []
+
+
+def test_stream_holds_its_slot_until_it_ends():
+    client, _ = make_client(max_in_flight=1, queue_timeout=0.05)
+    stream = client.stream_message(FakeModel(chunk_size=10).start_chat(), PROMPT)
+    next(stream)
+    with pytest.raises(GeminiBusyError):
+        client.generate_content(FakeModel(), PROMPT)
+    list(stream)
+    assert client.generate_content(FakeModel(), PROMPT).text
+
+
+# --- Async variants ---
+
+
+def test_async_calls_share_the_cap():
+    probe = ConcurrencyProbe()
+    client, _ = make_client(max_in_flight=3)
+
+    async def run():
+        return await asyncio.gather(*(client.generate_content_async(probe, f"{PROMPT} {n}") for n in range(9)))
+
+    results = asyncio.run(run())
+    assert len(results) == 9 and probe.most == 3
+
+
+def test_async_send_message_retries():
+    model = FakeModel(failures=[FakeAPIError(429)])
+    client, _ = make_client()
+    response = asyncio.run(client.send_message_async(model.start_chat(), PROMPT))
+    assert response.text and model.calls == 2
+
+
+def test_percentile():
+    assert percentile([], 50) == 0.0
+    assert percentile([3, 1, 2, 4], 50) == 3
+    assert percentile(range(100), 95) == 95
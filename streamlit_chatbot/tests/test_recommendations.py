@@ -0,0 +1,169 @@
+import json
+
+from recommendations import (
+    GARBLED_JSON_ERROR, Recommendation, RecommendationRecord, StreamingRecommendationParser, build_record,
+    parse_response, repair_json,
+)
+
+CARDS = [
+    {"title": "Heat", "imdb_rating": "8.3/10", "synopsis": "Cops and robbers.", "poster_url": "", "critic_review": "Tense."},
+    {"title": "Se7en", "imdb_rating": "8.6/10", "synopsis": "Seven sins.", "poster_url": "", "critic_review": "Bleak."},
+    {"title": "Zodiac", "imdb_rating": "7.7/10", "synopsis": "A cipher.", "poster_url": "", "critic_review": "Obsessive."},
+]
+
+
+def fenced_reply(cards, intro="Here you go!"):
+    return f"{intro}\n```json\n{json.dumps({'recommendations': cards}, indent=2)}\n```"
+
+
+def structured_reply(cards, intro="Here you go!"):
+    return json.dumps({"intro": intro, "recommendations": cards})
+
+
+# --- repair_json ---
+
+
+def test_repair_json_parses_valid_json_and_ignores_surrounding_text():
+    assert repair_json('Sure! {"a": [1, 2]} trailing words') == {"a": [1, 2]}
+
+
+def test_repair_json_drops_trailing_commas():
+    assert repair_json('{"a": [1, 2,], "b": 3,}') == {"a": [1, 2], "b": 3}
+
+
+def test_repair_json_cuts_a_truncated_reply_back_to_complete_elements():
+    text = structured_reply(CARDS)
+    data = repair_json(text[:text.index("Zodiac") + 3])
+    assert data["intro"] == "Here you go!"
+    assert [card["title"] for card in data["recommendations"][:2]] == ["Heat", "Se7en"]
+
+
+def test_repair_json_closes_an_open_string():
+    assert repair_json('{"intro": "Hello th') == {"intro": "Hello th"}
+
+
+def test_repair_json_without_json_returns_none():
+    assert repair_json("No brackets here at all") is None
+
+
+# --- parse_response ---
+
+
+def test_parse_response_fenced_reply():
+    record = parse_response(fenced_reply(CARDS))
+    assert record.has_json and record.error is None
+    assert record.intro.strip() == "Here you go!"
+    assert [rec.title for rec in record.recommendations] == ["Heat", "Se7en", "Zodiac"]
+
+
+def test_parse_response_structured_reply():
+    record = parse_response(structured_reply(CARDS))
+    assert record.error is None
+    assert record.recommendations[1] == Recommendation.from_dict(CARDS[1])
+
+
+def test_parse_response_conversational_reply_has_no_json():
+    record = parse_response("What kind of mood are you in?")
+    assert not record.has_json and record.recommendations == [] and record.error is None
+
+
+def test_parse_response_structured_reply_without_cards_is_conversational():
+    record = parse_response(json.dumps({"intro": "Tell me more about what you like?"}))
+    assert not record.has_json and record.error is None
+
+
+def test_parse_response_unrecoverable_block_is_garbled():
+    record = parse_response("Intro\n```json\nnot json at all\n```")
+    assert record.error == GARBLED_JSON_ERROR
+
+
+def test_build_record_round_trips_through_parse_response():
+    recommendations = [Recommendation.from_dict(card) for card in CARDS]
+    record = parse_response(build_record("Loved it?", recommendations).raw)
+    assert record.recommendations == recommendations
+
+
+# --- StreamingRecommendationParser ---
+
+
+def feed_in_chunks(text, size):
+    parser = StreamingRecommendationParser()
+    emitted = []
+    for start in range(0, len(text), size):
+        emitted.append([rec.title for rec in parser.feed(text[start:start + size])])
+    parser.finish()
+    return parser, emitted
+
+
+def test_streaming_parser_emits_each_card_once_as_it_completes():
+    parser, emitted = feed_in_chunks(fenced_reply(CARDS), 7)
+    flat = [title for batch in emitted for title in batch]
+    assert flat == ["Heat", "Se7en", "Zodiac"]
+    # The first card arrives before the stream is over
+    assert emitted.index(["Heat"]) < len(emitted) - 1
+    record = parser.to_record()
+    assert record.error is None and record.intro.strip() == "Here you go!"
+
+
+def test_streaming_parser_holds_back_a_partial_fence():
+    parser = StreamingRecommendationParser()
+    parser.feed("Intro text ``")
+    assert parser.intro == "Intro text "
+    parser.feed("`json\n")
+    assert parser.has_json and parser.intro == "Intro text "
+
+
+def test_streaming_parser_handles_braces_inside_strings():
+    cards = [dict(CARDS[0], synopsis="A {weird} \"quoted\" synopsis }")]
+    parser, emitted = feed_in_chunks(fenced_reply(cards), 5)
+    assert parser.recommendations[0].synopsis == cards[0]["synopsis"]
+
+
+def test_streaming_parser_reads_the_structured_intro_before_the_cards():
+    parser = StreamingRecommendationParser()
+    text = structured_reply(CARDS, intro="Popcorn time.")
+    parser.feed(text[:text.index("recommendations")])
+    assert parser.intro == "Popcorn time."
+    parser.feed(text[text.index("recommendations"):])
+    parser.finish()
+    assert len(parser.recommendations) == 3 and parser.to_record().error is None
+
+
+def test_streaming_parser_without_any_card_is_garbled():
+    parser, _ = feed_in_chunks("Intro\n```json\n{\"recommendations\": [ {\"title\": ", 6)
+    assert parser.to_record().error == GARBLED_JSON_ERROR
+
+
+# --- Repaired records ---
+
+
+def test_clean_replies_are_not_marked_repaired():
+    assert not parse_response(fenced_reply(CARDS)).repaired
+    assert not parse_response(structured_reply(CARDS)).repaired
+    parser, _ = feed_in_chunks(structured_reply(CARDS), 9)
+    assert not parser.to_record().repaired
+
+
+def test_truncated_structured_reply_is_marked_repaired():
+    text = structured_reply(CARDS)
+    record = parse_response(text[:text.index("Zodiac")])
+    assert record.error is None and record.repaired
+    assert [rec.title for rec in record.recommendations][:2] == ["Heat", "Se7en"]
+
+
+def test_repaired_fenced_reply_is_marked_repaired():
+    record = parse_response(fenced_reply(CARDS).replace('"critic_review": "Bleak."', '"critic_review": "Bleak.",'))
+    assert record.error is None and record.repaired and len(record.recommendations) == 3
+
+
+def test_streamed_reply_cut_off_mid_card_is_marked_repaired():
+    text = fenced_reply(CARDS)
+    parser, _ = feed_in_chunks(text[:text.index("Zodiac")], 11)
+    record = parser.to_record()
+    assert record.repaired and [rec.title for rec in record.recommendations] == ["Heat", "Se7en"]
+
+
+def test_repaired_flag_survives_to_dict():
+    text = structured_reply(CARDS)
+    record = parse_response(text[:text.index("Zodiac")])
+    assert RecommendationRecord.from_dict(record.to_dict()) == record
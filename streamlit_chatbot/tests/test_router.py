@@ -0,0 +1,54 @@
+import pytest
+
+from router import Router, classify_intent, normalize_text
+
+TITLES = frozenset(normalize_text(title) for title in ["Parasite", "Dune: Part Two", "Heat", "When Harry Met Sally..."])
+
+
+@pytest.mark.parametrize("prompt", ["hi", "Hello there!", "hey bot", "Good morning"])
+def test_greetings(prompt):
+    assert classify_intent(prompt, TITLES) == "greeting"
+
+
+@pytest.mark.parametrize("prompt", ["thanks", "Thank you so much!", "thx", "Cheers mate", "great, thanks!", "Thank You"])
+def test_thanks(prompt):
+    assert classify_intent(prompt, TITLES) == "thanks"
+
+
+@pytest.mark.parametrize("prompt", [
+    "thanks, now a comedy please",
+    "cheers, show me a horror one",
+    "thank you so much, something darker",
+    "thanks! what about sci-fi?",
+    "hi, can you recommend a thriller?",
+    "More like number two",
+])
+def test_requests_after_thanks_or_greetings_reach_the_model(prompt):
+    assert classify_intent(prompt, TITLES) == "recommendation"
+
+
+@pytest.mark.parametrize("prompt", ["Parasite", "parasite", "Dune: Part Two", "dune part two?", "when harry met sally"])
+def test_known_titles_are_requests(prompt):
+    assert classify_intent(prompt, TITLES) == "recommendation"
+
+
+@pytest.mark.parametrize("prompt", ["The Wild Robot", "Past Lives", '"bottoms"'])
+def test_unknown_titles_that_look_like_titles_are_requests(prompt):
+    assert classify_intent(prompt) == "recommendation"
+
+
+@pytest.mark.parametrize("prompt", ["how are you?", "I had a terrible day", "ok", "lol that's wild", "Nice"])
+def test_small_talk_is_chit_chat(prompt):
+    assert classify_intent(prompt, TITLES) == "chit_chat"
+
+
+def test_long_messages_default_to_recommendation():
+    prompt = "so my sister is visiting this week and we never agree on anything at all, what do we do"
+    assert classify_intent(prompt) == "recommendation"
+
+
+def test_router_passes_catalog_titles_to_the_classifier():
+    router = Router(titles=["Parasite"])
+    assert router.route("Parasite") == ("recommendation", "main")
+    assert router.route("thanks!") == ("thanks", "canned")
+    assert Router().route("Parasite") == ("chit_chat", "lite")
@@ -0,0 +1,64 @@
+import threading
+
+import pytest
+
+from session_store import SessionStore
+
+
+class GatedLock:
+    """A lock whose first user is held at the gate, before taking it, until the gate opens."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._first = True
+        self.waiting = threading.Event()
+        self.gate = threading.Event()
+
+    def __enter__(self):
+        if self._first:
+            self._first = False
+            self.waiting.set()
+            self.gate.wait(5)
+        self._lock.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._lock.release()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SessionStore(tmp_path / "sessions.db", flush_interval=60)
+    yield store
+    store.close()
+
+
+def test_messages_and_state_survive_a_reopen(tmp_path):
+    store = SessionStore(tmp_path / "sessions.db", flush_interval=60)
+    store.append_message("s", 0, {"role": "user", "content": "Recommend a crime thriller!"})
+    store.append_message("s", 1, {"role": "assistant", "content": "Heat."})
+    store.save_state("s", "Happy", {"turns": []})
+    store.close()
+
+    reopened = SessionStore(tmp_path / "sessions.db", flush_interval=60)
+    assert reopened.message_count("s") == 2
+    assert [message["content"] for _, message in reopened.load_messages("s", limit=10)] == [
+        "Recommend a crime thriller!", "Heat.",
+    ]
+    assert reopened.load_state("s") == ("Happy", {"turns": []})
+    reopened.close()
+
+
+def test_a_stalled_flush_cannot_overwrite_a_newer_state(store):
+    store._db_lock = GatedLock()
+    store.save_state("s", "Happy", {"version": 1})
+    stalled = threading.Thread(target=store.flush)
+    stalled.start()
+    assert store._db_lock.waiting.wait(5)
+
+    # A reader's flush writes the newer state while the first flush is held up
+    store.save_state("s", "Sad", {"version": 2})
+    store.flush()
+    store._db_lock.gate.set()
+    stalled.join()
+    assert store.load_state("s") == ("Sad", {"version": 2})
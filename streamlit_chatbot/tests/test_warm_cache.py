@@ -0,0 +1,59 @@
+import json
+
+from coordination import Singleflight
+from recommendations import Recommendation, build_record
+from warm_cache import WarmCache
+
+GENRES = ["Comedy", "Horror"]
+MOODS = ["Happy", "Sad"]
+
+
+class CountingFetch:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, prompt, mood):
+        self.calls += 1
+        return build_record(f"{mood} picks", [Recommendation(title=f"{prompt} ({mood})")])
+
+
+def make_cache(tmp_path, fetch, **kwargs):
+    return WarmCache(fetch, GENRES, path=tmp_path / "warm.json", moods=MOODS, **kwargs)
+
+
+def test_refresh_fills_every_slot_and_serves_it(tmp_path):
+    fetch = CountingFetch()
+    cache = make_cache(tmp_path, fetch)
+    assert cache.refresh() == 4 and fetch.calls == 4
+    assert cache.get("recommend a comedy", "Happy").recommendations[0].title == "Recommend a comedy title! (Happy)"
+    assert cache.get("recommend a western", "Happy") is None
+    assert not list(tmp_path.glob("*.tmp"))
+    assert len(json.loads((tmp_path / "warm.json").read_text(encoding="utf-8"))) == 4
+
+
+def test_failed_and_repaired_records_are_not_stored(tmp_path):
+    def fetch(prompt, mood):
+        record = CountingFetch()(prompt, mood)
+        record.repaired = mood == "Sad"
+        return record
+
+    cache = make_cache(tmp_path, fetch)
+    assert cache.refresh() == 2 and cache.failed == 2
+    assert cache.get("recommend a comedy", "Sad") is None
+
+
+def test_only_the_lease_holder_calls_the_model(tmp_path):
+    db = str(tmp_path / "coordination.db")
+    first_fetch, second_fetch = CountingFetch(), CountingFetch()
+    first = make_cache(tmp_path, first_fetch, singleflight=Singleflight(db))
+    second = make_cache(tmp_path, second_fetch, singleflight=Singleflight(db))
+
+    # While the first replica holds the lease the second one only reads the file
+    assert first.singleflight.claim(WarmCache.REFRESH_KEY)
+    assert second.refresh_shared() == 0 and second_fetch.calls == 0
+    first.singleflight.abandon(WarmCache.REFRESH_KEY)
+
+    assert first.refresh_shared() == 4 and first_fetch.calls == 4
+    # The next owner reloads the file first, so nothing is due and nothing is regenerated
+    assert second.refresh_shared() == 0 and second_fetch.calls == 0
+    assert second.get("recommend some horror", "Sad") is not None
@@ -0,0 +1,187 @@
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+from prefetch import MOODS
+from recommendations import RecommendationRecord
+from response_cache import normalize_prompt
+
+# "recommend a comedy", "suggest some horror movies please", "I want a sci-fi film", ...
+SIMPLE_REQUEST_PATTERN = re.compile(
+    r"^(?:please )?(?:recommend|suggest|give me|show me|i want|find)(?: me)?"
+    r"(?: a| an| some| something)?(?: good)? (?P<genre>[a-z][a-z\- ]*?)"
+    r"(?: movies?| films?| shows?| series| titles?)?(?: please)?$"
+)
+
+
+def warm_prompt(genre):
+    """Returns the prompt a warm entry is generated from."""
+    return f"Recommend a {genre.lower()} title!"
+
+
+class WarmCache:
+    """Precomputed recommendation records for every mood x genre, refreshed in the background.
+
+    fetch(prompt, mood) returns a RecommendationRecord (or None on failure) and is called on
+    the refresh thread. Entries older than max_age are never served; the refresh job
+    regenerates entries once they are older than refresh_age, a few per pass, so the warm set
+    stays fresh without bursts of model calls. Entries are persisted to a JSON file so a
+    restart starts warm.
+
+    Replicas sharing the file should pass a coordination.Singleflight: each pass then reloads
+    the file, and only the replica holding the refresh lease calls the model, so the warm set
+    is generated once rather than once per replica.
+    """
+
+    # The Singleflight key the refreshing replica holds while it runs a pass
+    REFRESH_KEY = "warm-cache-refresh"
+
+    def __init__(self, fetch, genres, path=None, moods=MOODS, max_age=24 * 60 * 60, refresh_age=12 * 60 * 60,
+                 refresh_interval=60, refresh_batch=5, singleflight=None):
+        self.fetch = fetch
+        self.genres = {genre.lower().replace("-", " "): genre for genre in genres}
+        self.moods = list(moods)
+        self.path = Path(path) if path else None
+        self.max_age = max_age
+        self.refresh_age = refresh_age
+        self.refresh_interval = refresh_interval
+        self.refresh_batch = refresh_batch
+        self.singleflight = singleflight
+        self.lookups = 0
+        self.served = 0
+        self.refreshed = 0
+        self.failed = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._load()
+
+    # --- Serving ---
+
+    def match_genre(self, prompt):
+        """Returns the configured genre a simple "recommend a <genre>" prompt asks for, or None."""
+        match = SIMPLE_REQUEST_PATTERN.match(normalize_prompt(prompt))
+        if not match:
+            return None
+        text = match.group("genre").replace("-", " ")
+        return self.genres.get(text) or self.genres.get(text.removesuffix("s"))
+
+    def get(self, prompt, mood):
+        """Returns a fresh warm record for a first-turn prompt in mood, or None."""
+        genre = self.match_genre(prompt)
+        with self._lock:
+            self.lookups += 1
+            entry = self._entries.get((mood, genre)) if genre else None
+            if entry is None or time.time() - entry[0] > self.max_age:
+                return None
+            self.served += 1
+        return RecommendationRecord.from_dict(entry[1])
+
+    @property
+    def served_rate(self):
+        return self.served / self.lookups if self.lookups else 0.0
+
+    def stats(self):
+        """Returns how often first turns were served from the warm set, and its size and freshness."""
+        now = time.time()
+        with self._lock:
+            fresh = sum(now - generated_at <= self.max_age for generated_at, _ in self._entries.values())
+            return {
+                "lookups": self.lookups,
+                "served": self.served,
+                "served_rate": self.served_rate,
+                "fresh_entries": fresh,
+                "total_slots": len(self.moods) * len(self.genres),
+                "refreshed": self.refreshed,
+                "failed": self.failed,
+            }
+
+    # --- Refreshing ---
+
+    def due(self, now=None):
+        """Returns the (mood, genre) slots that are missing or older than refresh_age, oldest first."""
+        now = now if now is not None else time.time()
+        with self._lock:
+            ages = {
+                (mood, genre): now - self._entries[(mood, genre)][0] if (mood, genre) in self._entries else float("inf")
+                for mood in self.moods for genre in self.genres.values()
+            }
+        return sorted((slot for slot, age in ages.items() if age > self.refresh_age), key=ages.get, reverse=True)
+
+    def refresh(self, limit=None):
+        """Regenerates up to limit due slots (all of them by default); returns how many succeeded."""
+        done = 0
+        for mood, genre in self.due()[:limit]:
+            try:
+                record = self.fetch(warm_prompt(genre), mood)
+            except Exception:
+                record = None
+            with self._lock:
+                if record is None or record.error or record.repaired or not record.recommendations:
+                    self.failed += 1
+                    continue
+                self._entries[(mood, genre)] = (time.time(), record.to_dict())
+                self.refreshed += 1
+            done += 1
+        if done:
+            self._save()
+        return done
+
+    def start(self):
+        """Starts the background refresh job (once)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._refresh_loop, name="warm-cache", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def refresh_shared(self, limit=None):
+        """Runs one refresh pass if this replica wins the lease; returns how many slots it refreshed."""
+        if self.singleflight is None:
+            return self.refresh(limit)
+        if not self.singleflight.claim(self.REFRESH_KEY):
+            self._load() # Another replica is refreshing; serve what it has saved so far
+            return 0
+        try:
+            self._load() # Picks up the previous owner's work, so its slots are not redone
+            return self.refresh(limit)
+        finally:
+            self.singleflight.abandon(self.REFRESH_KEY)
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            self.refresh_shared(self.refresh_batch)
+            self._stop.wait(self.refresh_interval)
+
+    # --- Persistence ---
+
+    def _load(self):
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            rows = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return # A corrupt file just means starting cold
+        with self._lock:
+            for row in rows:
+                slot = (row["mood"], row["genre"])
+                if slot not in self._entries or self._entries[slot][0] < row["generated_at"]:
+                    self._entries[slot] = (row["generated_at"], row["record"])
+
+    def _save(self):
+        if self.path is None:
+            return
+        with self._lock:
+            rows = [
+                {"mood": mood, "genre": genre, "generated_at": generated_at, "record": record}
+                for (mood, genre), (generated_at, record) in self._entries.items()
+            ]
+        # Written next to the file and renamed over it, so readers never see a partial file
+        partial = self.path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        partial.write_text(json.dumps(rows), encoding="utf-8")
+        os.replace(partial, self.path)